@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from fixtures import generate, PRESETS
+from replay_server import ReplayServer, FaultInjector
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, 'src', 'main.py')
+
+def _etl_env(base_url: str, output_dir: str, environment_id: str, extra: dict) -> dict:
+    env = {
+        **os.environ,
+        'INVOLVES_USERNAME': 'benchmark', 'INVOLVES_PASSWORD': 'benchmark',
+        'INVOLVES_BASE_URL': base_url, 'INVOLVES_ENVIRONMENT_ID': environment_id,
+        'INVOLVES_OUTPUT_DIR': output_dir, 'INVOLVES_CACHE_PATH': '',
+        'INVOLVES_METRICS_DIR': os.path.join(output_dir, '.metrics'),
+    }
+    env.update(extra)
+    return env
+
+def _stage_throughput(report: dict) -> dict:
+    stages = {}
+    for counter in report.get('counters', []):
+        if counter['name'] in ('etl_stage_seconds_total', 'etl_stage_rows_total'):
+            stages.setdefault(counter['labels']['stage'], {})[counter['name']] = counter['value']
+    return {
+        stage: {
+            'seconds': round(values.get('etl_stage_seconds_total', 0), 3),
+            'rows': values.get('etl_stage_rows_total', 0),
+            'rows_per_second': round(values.get('etl_stage_rows_total', 0) / values['etl_stage_seconds_total'], 1)
+            if values.get('etl_stage_seconds_total') else None,
+        }
+        for stage, values in sorted(stages.items())
+    }
+
+def _http_summary(report: dict) -> dict:
+    summary = {'requests': 0, 'retries': 0, 'bytes': 0}
+    names = {'http_requests_total': 'requests', 'http_retries_total': 'retries', 'http_response_bytes_total': 'bytes'}
+    for counter in report.get('counters', []):
+        if counter['name'] in names:
+            summary[names[counter['name']]] += counter['value']
+    return summary
+
+def run_benchmark(fixtures_path: str, environment_id: str, etl_args: list, etl_env: dict, faults: FaultInjector) -> dict:
+    with ReplayServer(fixtures_path, faults=faults) as server, tempfile.TemporaryDirectory(prefix='involves-bench-') as output_dir:
+        env = _etl_env(server.base_url, output_dir, environment_id, etl_env)
+        started = time.perf_counter()
+        completed = subprocess.run([sys.executable, MAIN, *etl_args], cwd=output_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        elapsed = time.perf_counter() - started
+        if completed.returncode != 0:
+            raise RuntimeError(f"A ETL terminou com código {completed.returncode}:\n{completed.stderr[-4000:]}")
+
+        metrics_dir = env['INVOLVES_METRICS_DIR']
+        report_files = sorted(name for name in os.listdir(metrics_dir) if name.endswith('.json'))
+        with open(os.path.join(metrics_dir, report_files[-1]), encoding='utf-8') as report_file:
+            report = json.load(report_file)
+
+        return {
+            'seconds': round(elapsed, 3),
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+            'http': _http_summary(report),
+            'stages': _stage_throughput(report),
+            'server': server.stats,
+        }
+
+def compare(result: dict, baseline_path: str, max_regression: float) -> list:
+    with open(baseline_path, encoding='utf-8') as baseline_file:
+        baseline = json.load(baseline_file)
+    regressions = []
+    for metric in ('seconds', 'peak_rss_mb'):
+        previous, current = baseline.get(metric), result.get(metric)
+        if previous and current and current > previous * (1 + max_regression):
+            regressions.append(f"{metric}: {previous} -> {current} (+{(current / previous - 1) * 100:.0f}%)")
+    return regressions
+
+def print_result(result: dict):
+    print(f"\nTempo total: {result['seconds']:.1f}s | Pico de memória: {result['peak_rss_mb']:.0f} MiB | "
+          f"Requisições: {result['http']['requests']} | Retentativas: {result['http']['retries']} | "
+          f"{result['http']['bytes'] / 1_048_576:.1f} MiB recebidos")
+    for stage, values in result['stages'].items():
+        throughput = f"{values['rows_per_second']:.0f} linhas/s" if values['rows_per_second'] else '-'
+        print(f"  > {stage}: {values['seconds']:.1f}s, {values['rows']} linhas, {throughput}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Mede a ETL de ponta a ponta contra o servidor de replay.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default='small', help="Tamanho do tenant sintético (padrão: small).")
+    parser.add_argument("--fixtures", default=None, help="Arquivo de fixtures existente; se omitido, um tenant sintético é gerado.")
+    parser.add_argument("--environment-id", default='1')
+    parser.add_argument("--format", dest="output_format", default='parquet')
+    parser.add_argument("--only", default=None, help="Entidades a executar, como em main.py --only.")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--throttle-rate", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--env", action="append", default=[], metavar="NOME=VALOR",
+                        help="Variável de ambiente extra para a ETL (por exemplo INVOLVES_HTTP_MAX_CONCURRENCY=50). Pode ser repetida.")
+    parser.add_argument("--output", default=None, help="Grava o resultado em JSON neste arquivo.")
+    parser.add_argument("--baseline", default=None, help="Resultado JSON anterior para comparação.")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Regressão tolerada em relação ao baseline antes de falhar (padrão: 0.2 = 20%%).")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    etl_env = {'INVOLVES_RATE_LIMIT_RPS': '0', **dict(item.split('=', 1) for item in args.env)}
+    etl_args = ['--format', args.output_format] + (['--only', args.only] if args.only else [])
+    faults = FaultInjector(args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rate, seed=args.seed)
+
+    with tempfile.TemporaryDirectory(prefix='involves-fixtures-') as fixtures_dir:
+        fixtures_path = args.fixtures
+        if fixtures_path is None:
+            fixtures_path = os.path.join(fixtures_dir, f"{args.preset}.sqlite")
+            print(f"Gerando tenant sintético '{args.preset}'...")
+            generate(fixtures_path, args.preset, args.seed, args.environment_id)
+        result = run_benchmark(fixtures_path, args.environment_id, etl_args, etl_env, faults)
+
+    result['preset'] = None if args.fixtures else args.preset
+    print_result(result)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(result, output_file, ensure_ascii=False, indent=2)
+    if args.baseline:
+        regressions = compare(result, args.baseline, args.max_regression)
+        if regressions:
+            print("\nRegressões acima do limite:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
@@ -0,0 +1,203 @@
+import argparse
+import json
+import os
+import random
+import sqlite3
+
+PRESETS = {
+    'small': {'skus': 500, 'point_of_sales': 300, 'employees': 50, 'surveys': 1000, 'answers_per_survey': 8,
+              'forms': 20, 'leaves': 100, 'visits_per_employee': 40, 'itinerary_per_day': 200, 'noshow_rate': 0.05},
+    'medium': {'skus': 5000, 'point_of_sales': 3000, 'employees': 400, 'surveys': 20000, 'answers_per_survey': 10,
+               'forms': 80, 'leaves': 1000, 'visits_per_employee': 150, 'itinerary_per_day': 2000, 'noshow_rate': 0.05},
+    'large': {'skus': 50000, 'point_of_sales': 20000, 'employees': 2000, 'surveys': 200000, 'answers_per_survey': 12,
+              'forms': 300, 'leaves': 8000, 'visits_per_employee': 400, 'itinerary_per_day': 10000, 'noshow_rate': 0.05},
+}
+
+ITINERARY_DAYS = 97
+ENVIRONMENT_ID = '1'
+
+STATES = ['São Paulo', 'Minas Gerais', 'Paraná', 'Santa Catarina', 'Bahia']
+NOSHOW_STATUSES = ['APPROVED', 'REJECTED', 'PENDING']
+QUESTION_TYPES = ['TEXT', 'NUMBER', 'SINGLE_CHOICE', 'PHOTO', 'BOOLEAN']
+
+class FixtureWriter:
+    def __init__(self, path: str):
+        if os.path.exists(path):
+            os.remove(path)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.execute("CREATE TABLE responses (key TEXT PRIMARY KEY, body TEXT)")
+        self._db.execute("CREATE TABLE metadata (name TEXT PRIMARY KEY, value TEXT)")
+
+    def put(self, key: str, body):
+        self._db.execute("INSERT OR REPLACE INTO responses (key, body) VALUES (?, ?)", (key, json.dumps(body)))
+
+    def put_metadata(self, name: str, value):
+        self._db.execute("INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)", (name, json.dumps(value)))
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+
+def _named(prefix: str, count: int, start: int = 1, **extra) -> list:
+    return [{'id': start + index, 'name': f"{prefix} {start + index}", **extra} for index in range(count)]
+
+def _ref(rng: random.Random, items: list):
+    return {'id': rng.choice(items)['id']} if items else None
+
+def generate(path: str, preset: str = 'small', seed: int = 42, environment_id: str = ENVIRONMENT_ID, **overrides) -> dict:
+    sizes = {**PRESETS[preset], **{name: value for name, value in overrides.items() if value is not None}}
+    rng = random.Random(seed)
+    env = f"/v3/environments/{environment_id}"
+    writer = FixtureWriter(path)
+
+    supercategories = _named('Supercategoria', 10)
+    categories = [{**category, 'supercategory': _ref(rng, supercategories)} for category in _named('Categoria', 100, start=1001)]
+    brands = _named('Marca', 40, start=2001)
+    productlines = [
+        {'id': 3001 + index, 'name': f"Linha {index}", 'barCode': 7890000000000 + index, 'externalCode': f"LP{index}",
+         'active': rng.random() > 0.1, 'approved': True, 'origin': 'WEB', 'updatedAt': '2024-01-01T00:00:00',
+         'brand': _ref(rng, brands), 'category': _ref(rng, categories), 'customFields': []}
+        for index in range(200)
+    ]
+    skus = [
+        {'id': 100001 + index, 'name': f"Produto {index}", 'active': rng.random() > 0.05, 'barCode': 7891000000000 + index,
+         'integrationCode': f"P{index}", 'productLine': _ref(rng, productlines), 'brand': _ref(rng, brands),
+         'category': _ref(rng, categories), 'supercategory': _ref(rng, supercategories),
+         'customFields': [{'label': 'Sabor', 'value': rng.choice(['A', 'B', 'C'])}] if rng.random() < 0.3 else []}
+        for index in range(sizes['skus'])
+    ]
+    writer.put(f"{env}/supercategories", supercategories)
+    writer.put(f"{env}/categories", categories)
+    writer.put(f"{env}/brands", brands)
+    writer.put(f"{env}/productlines", productlines)
+    writer.put(f"{env}/skus", skus)
+
+    macroregionals = _named('Macrorregional', 5, start=4001)
+    regionals = [{**regional, 'macroregional': _ref(rng, macroregionals)} for regional in _named('Regional', 25, start=4101)]
+    chains = [{**chain, 'code': f"R{chain['id']}"} for chain in _named('Rede', 60, start=4201)]
+    banners = [{**banner, 'chain': _ref(rng, chains)} for banner in _named('Banner', 120, start=4301)]
+    channels = _named('Canal', 8, start=4501)
+    pos_types = _named('Tipo', 6, start=4601)
+    pos_profiles = _named('Perfil', 6, start=4701)
+    point_of_sales = [
+        {'id': 200001 + index, 'legalBusinessName': f"Empresa {index} LTDA", 'tradeName': f"Loja {index}",
+         'code': 50000 + index, 'companyRegistrationNumber': f"{10000000000000 + index}", 'active': rng.random() > 0.05,
+         'macroregional': _ref(rng, macroregionals), 'regional': _ref(rng, regionals), 'banner': _ref(rng, banners),
+         'type': _ref(rng, pos_types), 'profile': _ref(rng, pos_profiles), 'channel': _ref(rng, channels)}
+        for index in range(sizes['point_of_sales'])
+    ]
+    writer.put(f"{env}/macroregionals", macroregionals)
+    writer.put(f"{env}/regionals", regionals)
+    writer.put(f"{env}/banners", banners)
+    writer.put("/v3/chains", chains)
+    writer.put("/v3/pointofsalechannels", channels)
+    writer.put("/v1/pointofsaletype/find", pos_types)
+    writer.put(f"/v1/{environment_id}/pointofsaleprofile/find", pos_profiles)
+    writer.put(f"{env}/pointofsales", point_of_sales)
+
+    leaders = list(range(300001, 300001 + max(1, sizes['employees'] // 10)))
+    employees = []
+    for index in range(sizes['employees']):
+        employee_id = 300001 + index
+        employees.append({
+            'id': employee_id, 'name': f"Colaborador {index}", 'role': 'PROMOTOR', 'login': f"user{index}",
+            'email': f"user{index}@example.com", 'workPhone': '1130000000', 'nationalIdCard1': 100000 + index,
+            'nationalIdCard2': f"{10000000000 + index}", 'fatherName': None, 'motherName': None, 'enabled': rng.random() > 0.1,
+            'userGroup': {'id': 1, 'name': 'Campo'}, 'profile': {'id': 2, 'name': 'Promotor'},
+            'employeeEnvironmentLeader': {'id': rng.choice(leaders)} if employee_id not in leaders else None,
+            'address': {'address': 'Rua A', 'number': index, 'complement': None, 'neighborhood': 'Centro', 'zipCode': 1000000 + index,
+                        'city': {'name': 'Cidade', 'state': {'name': rng.choice(STATES)}}},
+        })
+    writer.put(f"/v1/{environment_id}/employeeenvironment", employees)
+
+    writer.put(f"{env}/leaves", [
+        {'id': 400001 + index, 'startDate': '2024-03-01', 'endDate': '2024-03-10', 'reason': 'Férias', 'note': None,
+         'employee': _ref(rng, employees), 'registeredBy': _ref(rng, employees), 'substitute': _ref(rng, employees)}
+        for index in range(sizes['leaves'])
+    ])
+
+    visit_id = 500001
+    for employee in employees:
+        visits = []
+        for _ in range(sizes['visits_per_employee']):
+            day = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            visits.append({'id': visit_id, 'pointOfSale': _ref(rng, point_of_sales), 'visitDate': day,
+                           'expectedStart': f"{day}T08:00:00", 'expectedEnd': f"{day}T09:00:00", 'visited': rng.random() > 0.2})
+            visit_id += 1
+        writer.put(f"{env}/employees/{employee['id']}/scheduledvisits", visits)
+
+    forms = []
+    for index in range(sizes['forms']):
+        form_id = 600001 + index
+        forms.append({
+            'id': form_id, 'name': f"Formulário {index}", 'description': None, 'formPurpose': 'RESEARCH', 'active': True,
+            'formFields': [
+                {'id': form_id * 100 + order, 'information': {'label': f"Pergunta {order}", 'informationType': rng.choice(QUESTION_TYPES)},
+                 'order': order, 'required': order == 1, 'hidden': False, 'system': False}
+                for order in range(1, sizes['answers_per_survey'] + 1)
+            ],
+        })
+    writer.put(f"/v1/{environment_id}/form", forms)
+
+    summaries, answer_id = [], 700001
+    for index in range(sizes['surveys']):
+        form = rng.choice(forms)
+        answers = []
+        for field in form['formFields']:
+            answers.append({'id': answer_id, 'value': str(rng.randint(0, 100)), 'score': rng.choice([None, 1.0, 0.5]),
+                            'question': {'id': field['id'], 'type': field['information']['informationType']},
+                            'item': _ref(rng, skus) if rng.random() < 0.3 else None})
+            answer_id += 1
+        summary = {
+            'id': 800001 + index, 'label': f"Pesquisa {index}", 'status': 'ANSWERED', 'expirationDate': '2024-12-31',
+            'responseDate': '2024-06-01T10:00:00', 'projectId': 1, 'pointOfSaleId': rng.choice(point_of_sales)['id'],
+            'ownerId': rng.choice(employees)['id'], 'form': {'id': form['id']},
+        }
+        summaries.append(summary)
+        writer.put(f"{env}/surveys/{summary['id']}", {**summary, 'answers': answers})
+    writer.put(f"{env}/surveys", summaries)
+
+    itinerary_id, noshows = 900001, 0
+    for offset in range(ITINERARY_DAYS):
+        day_items = []
+        for order in range(sizes['itinerary_per_day']):
+            employee, point_of_sale = rng.choice(employees), rng.choice(point_of_sales)
+            day_items.append({
+                'itineraryId': itinerary_id, 'employeeId': employee['id'], 'employeeName': employee['name'],
+                'pointOfSaleId': point_of_sale['id'], 'pointOfSaleName': point_of_sale['tradeName'],
+                'pointOfSaleTaxPayerCode': point_of_sale['companyRegistrationNumber'], 'visitOrder': order + 1,
+            })
+            if rng.random() < sizes['noshow_rate']:
+                writer.put(f"{env}/visits/{itinerary_id}/noshow", {
+                    'id': 950001 + noshows, 'excuseId': rng.randint(1, 5), 'date': '2024-06-01', 'excuse': 'Loja fechada',
+                    'note': None, 'status': rng.choice(NOSHOW_STATUSES), 'employee': {'id': employee['id']},
+                })
+                noshows += 1
+            itinerary_id += 1
+        writer.put(f"/v2/environments/{environment_id}/itinerary?date=+{offset}", day_items)
+
+    writer.put_metadata('environment_id', environment_id)
+    writer.put_metadata('preset', preset)
+    writer.put_metadata('sizes', sizes)
+    writer.close()
+    return sizes
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Gera um tenant sintético da API Involves para o servidor de replay.")
+    parser.add_argument("output", help="Arquivo SQLite de fixtures a ser criado.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default='small', help="Tamanho do tenant (padrão: small).")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--environment-id", default=ENVIRONMENT_ID)
+    for name in PRESETS['small']:
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name, type=float if name == 'noshow_rate' else int, default=None,
+                            help="Sobrescreve o valor do preset.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = vars(parse_args())
+    output, preset, seed, environment_id = args.pop('output'), args.pop('preset'), args.pop('seed'), args.pop('environment_id')
+    sizes = generate(output, preset, seed, environment_id, **args)
+    print(f"Fixtures '{preset}' gravadas em '{output}': {json.dumps(sizes)}")
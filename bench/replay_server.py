@@ -0,0 +1,218 @@
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from urllib.parse import urlsplit, parse_qsl
+from aiohttp import web
+
+PAGING_PARAMS = {'page', 'size'}
+IGNORED_PARAMS = PAGING_PARAMS | {'startDate', 'endDate', 'ignoreInactive'}
+API_PREFIX = re.compile(r'/v\d+/.*')
+
+def fixture_key(url: str) -> str:
+    parts = urlsplit(url)
+    match = API_PREFIX.search(parts.path)
+    path = match.group(0) if match else parts.path
+    return f"{path}?{parts.query}" if parts.query else path
+
+class FaultInjector:
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0, throttle_rate: float = 0,
+                 retry_after: float = 1, seed: int = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+
+    async def delay(self):
+        latency = self.latency_ms + self._rng.uniform(0, self.jitter_ms)
+        if latency > 0:
+            await asyncio.sleep(latency / 1000)
+
+    def fault(self):
+        roll = self._rng.random()
+        if roll < self.throttle_rate:
+            return web.json_response({'message': 'Too Many Requests'}, status=429, headers={'Retry-After': str(self.retry_after)})
+        if roll < self.throttle_rate + self.error_rate:
+            return web.json_response({'message': 'Service Unavailable'}, status=503)
+        return None
+
+class FixtureStore:
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._collections = {}
+        self._indexes = {}
+
+    def _body(self, key: str):
+        with self._lock:
+            row = self._db.execute("SELECT body FROM responses WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def collection(self, key: str):
+        if key not in self._collections:
+            body = self._body(key)
+            self._collections[key] = body if isinstance(body, list) else None
+        return self._collections[key]
+
+    def item(self, collection_key: str, item_id: str):
+        if collection_key not in self._indexes:
+            items = self.collection(collection_key)
+            if items is None:
+                return None
+            self._indexes[collection_key] = {str(item.get('id')): item for item in items if isinstance(item, dict)}
+        return self._indexes[collection_key].get(item_id)
+
+    def lookup(self, path: str, query: list, today: date):
+        exact = self._body(f"{path}?{'&'.join(f'{name}={value}' for name, value in query)}" if query else path)
+        if exact is not None:
+            return exact
+
+        params = dict(query)
+        significant = [(name, value) for name, value in query if name not in IGNORED_PARAMS]
+        candidates = [f"{path}?{'&'.join(f'{name}={value}' for name, value in significant)}" if significant else path]
+        if 'date' in params:
+            try:
+                requested = datetime.strptime(params['date'], '%Y-%m-%d').date()
+            except ValueError:
+                requested = None
+            if requested is not None:
+                offset = (requested - (today - timedelta(days=today.weekday()))).days
+                candidates.append(f"{path}?date=+{offset}")
+        for key in candidates:
+            items = self.collection(key)
+            if items is not None:
+                if 'page' not in params:
+                    return items
+                return self._page(items, int(params['page']), int(params.get('size', 100)))
+
+        parent, _, last = path.rpartition('/')
+        if last.isdigit() and parent:
+            return self.item(parent, last)
+        return None
+
+    @staticmethod
+    def _page(items: list, page: int, size: int) -> dict:
+        start = (page - 1) * size
+        return {
+            'items': items[start:start + size], 'page': page, 'size': size,
+            'totalItems': len(items), 'totalPages': max(1, math.ceil(len(items) / size)),
+        }
+
+def create_app(fixtures_path: str, faults: FaultInjector = None) -> web.Application:
+    store = FixtureStore(fixtures_path)
+    faults = faults or FaultInjector()
+    stats = {'requests': 0, 'not_found': 0, 'faults': 0}
+
+    async def handle(request: web.Request):
+        stats['requests'] += 1
+        await faults.delay()
+        fault = faults.fault()
+        if fault is not None:
+            stats['faults'] += 1
+            return fault
+        match = API_PREFIX.search(request.path)
+        path = match.group(0) if match else request.path
+        body = store.lookup(path, parse_qsl(request.query_string, keep_blank_values=True), date.today())
+        if body is None:
+            stats['not_found'] += 1
+            return web.json_response({'message': 'Not Found'}, status=404)
+        return web.json_response(body)
+
+    app = web.Application()
+    app['stats'] = stats
+    app.router.add_get('/{tail:.*}', handle)
+    return app
+
+class ReplayServer:
+    def __init__(self, fixtures_path: str, host: str = '127.0.0.1', port: int = 0, faults: FaultInjector = None):
+        self.fixtures_path = fixtures_path
+        self.host = host
+        self.port = port
+        self.faults = faults
+        self.app = None
+        self._loop = None
+        self._runner = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def stats(self) -> dict:
+        return dict(self.app['stats']) if self.app else {}
+
+    async def _start(self):
+        self.app = create_app(self.fixtures_path, self.faults)
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="replay-server", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+def import_response_cache(cache_path: str, fixtures_path: str) -> int:
+    source = sqlite3.connect(cache_path)
+    target = sqlite3.connect(fixtures_path)
+    target.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, body TEXT)")
+    target.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)")
+    rows = [(fixture_key(url), body) for url, body in source.execute("SELECT url, body FROM responses") if body is not None]
+    target.executemany("INSERT OR REPLACE INTO responses (key, body) VALUES (?, ?)", rows)
+    target.commit()
+    target.close()
+    source.close()
+    return len(rows)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Servidor local que reproduz respostas gravadas da API Involves.")
+    parser.add_argument("fixtures", help="Arquivo SQLite de fixtures (gerado por fixtures.py ou importado com --import-cache).")
+    parser.add_argument("--host", default='127.0.0.1')
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Latência fixa de cada resposta.")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Latência adicional aleatória (0 a N ms).")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fração das requisições respondidas com 503.")
+    parser.add_argument("--throttle-rate", type=float, default=0, help="Fração das requisições respondidas com 429.")
+    parser.add_argument("--retry-after", type=float, default=1, help="Valor do cabeçalho Retry-After das respostas 429.")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--import-cache", metavar="CACHE_PATH", default=None,
+                        help="Importa as respostas de um cache persistente (INVOLVES_CACHE_PATH) para o arquivo de fixtures e sai.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.import_cache:
+        count = import_response_cache(args.import_cache, args.fixtures)
+        print(f"{count} respostas importadas de '{args.import_cache}' para '{args.fixtures}'.")
+    else:
+        faults = FaultInjector(args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rate, args.retry_after, args.seed)
+        print(f"Servindo '{args.fixtures}' em http://{args.host}:{args.port}")
+        web.run_app(create_app(args.fixtures, faults), host=args.host, port=args.port, access_log=None, print=None)
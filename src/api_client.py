@@ -1,49 +1,178 @@
-import requests
-import time
+import asyncio
 import json
-from config import HEADERS
+import threading
+import time
+import aiohttp
+import metrics
+import concurrency_limiter
+from config import HEADERS, HTTP_MAX_CONCURRENCY, HTTP_TIMEOUT, HTTP_KEEPALIVE_TIMEOUT, HTTP_MAX_RETRIES
+from rate_limiter import get_rate_limiter, backoff_delay, parse_retry_after
+from response_cache import get_response_cache
 
-_cache = {}
+_cache = get_response_cache()
 
-def get_api_data(url: str, suppress_404: bool = False):
-    if url in _cache:
-        return _cache[url]
+_loop = None
+_loop_thread = None
+_loop_lock = threading.Lock()
+_session = None
+_semaphore = None
+
+def _get_loop():
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="involves-http", daemon=True)
+            _loop_thread.start()
+    return _loop
+
+def run(coro):
+    loop = _get_loop()
+    if threading.current_thread() is _loop_thread:
+        raise RuntimeError("run() não pode ser chamado de dentro do loop HTTP; use 'await' diretamente.")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+async def _get_session():
+    global _session, _semaphore
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_MAX_CONCURRENCY,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300
+        )
+        _session = aiohttp.ClientSession(
+            headers=HEADERS,
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT)
+        )
+        _semaphore = asyncio.Semaphore(HTTP_MAX_CONCURRENCY)
+    return _session
 
-    max_retries = 3
+def _observe_latency(concurrency, endpoint: str, started: float):
+    seconds = time.perf_counter() - started
+    metrics.observe('http_request_seconds', seconds, endpoint=endpoint)
+    concurrency.on_success(seconds)
+
+async def fetch_api_data(url: str, suppress_404: bool = False, not_found=None):
+    endpoint = metrics.endpoint_label(url)
+    cached = _cache.get(url)
+    if cached is not None and _cache.is_fresh(url, cached):
+        metrics.inc('http_cache_hits_total', endpoint=endpoint)
+        return cached.data
+
+    conditional_headers = {}
+    if cached is not None:
+        if cached.etag:
+            conditional_headers['If-None-Match'] = cached.etag
+        if cached.last_modified:
+            conditional_headers['If-Modified-Since'] = cached.last_modified
+
+    session = await _get_session()
+    rate_limiter = get_rate_limiter()
+    concurrency = concurrency_limiter.get_limit(url)
+    max_retries = HTTP_MAX_RETRIES
     for attempt in range(max_retries):
         try:
-            response = requests.get(url, headers=HEADERS, timeout=30)
-            response.raise_for_status()
+            async with concurrency.slot() as generation, _semaphore:
+                await rate_limiter.acquire()
+                started = time.perf_counter()
+                async with session.get(url, headers=conditional_headers) as response:
+                    metrics.inc('http_requests_total', endpoint=endpoint, status=response.status)
+                    if response.status == 304 and cached is not None:
+                        _observe_latency(concurrency, endpoint, started)
+                        metrics.inc('http_cache_revalidations_total', endpoint=endpoint)
+                        _cache.revalidated(url, cached)
+                        return cached.data
 
-            if response.status_code == 204:
-                _cache[url] = None
-                return None
+                    response.raise_for_status()
 
-            data = response.json()
-            _cache[url] = data
+                    if response.status == 204:
+                        _observe_latency(concurrency, endpoint, started)
+                        _cache.set(url, None)
+                        return None
+
+                    body = await response.read()
+                    _observe_latency(concurrency, endpoint, started)
+                    metrics.inc('http_response_bytes_total', len(body), endpoint=endpoint)
+                    data = json.loads(body) if body.strip() else None
+                    etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+            _cache.set(url, data, etag, last_modified)
             return data
 
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 404:
+        except aiohttp.ClientResponseError as e:
+            if e.status == 429 or e.status >= 500:
+                metrics.observe('http_request_seconds', time.perf_counter() - started, endpoint=endpoint)
+                concurrency.on_error(generation, f"HTTP {e.status}")
+            else:
+                _observe_latency(concurrency, endpoint, started)
+            if e.status == 404:
+                metrics.inc('http_not_found_total', endpoint=endpoint)
                 if not suppress_404:
                     print(f"\n[INFO] Recurso não encontrado (404) na URL: {url}")
-                break
+                return not_found
+            if attempt < max_retries - 1:
+                metrics.inc('http_retries_total', endpoint=endpoint, reason=e.status)
+            if e.status == 429:
+                retry_after = parse_retry_after(e.headers.get('Retry-After') if e.headers else None)
+                wait_seconds = retry_after if retry_after is not None else backoff_delay(attempt)
+                print(f"\n[Tentativa {attempt + 1}/{max_retries}] Limite de requisições atingido (429) na URL {url}. Pausando todas as requisições por {wait_seconds:.1f}s.")
+                if attempt < max_retries - 1:
+                    rate_limiter.pause(wait_seconds)
+                else:
+                    print(f"  > Desistindo após {max_retries} tentativas.")
             else:
-                print(f"\n[Tentativa {attempt + 1}/{max_retries}] Erro HTTP {e.response.status_code} na requisição para a URL {url}")
+                print(f"\n[Tentativa {attempt + 1}/{max_retries}] Erro HTTP {e.status} na requisição para a URL {url}")
                 if attempt < max_retries - 1:
-                    time.sleep(attempt + 1)
+                    await asyncio.sleep(backoff_delay(attempt))
                 else:
                     print(f"  > Desistindo após {max_retries} tentativas.")
 
-        except requests.exceptions.RequestException as e:
-            print(f"\n[Tentativa {attempt + 1}/{max_retries}] Erro de conexão para a URL {url}: {e}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            metrics.inc('http_requests_total', endpoint=endpoint, status='error')
+            concurrency.on_error(generation, type(e).__name__)
             if attempt < max_retries - 1:
-                time.sleep(attempt + 1)
+                metrics.inc('http_retries_total', endpoint=endpoint, reason=type(e).__name__)
+            print(f"\n[Tentativa {attempt + 1}/{max_retries}] Erro de conexão para a URL {url}: {e!r}")
+            if attempt < max_retries - 1:
+                await asyncio.sleep(backoff_delay(attempt))
             else:
                 print(f"  > Desistindo após {max_retries} tentativas.")
-        
+
         except Exception as exc:
             print(f"Ocorreu um erro inesperado durante a requisição para {url}: {exc}")
             break
 
-    return None
\ No newline at end of file
+    metrics.inc('http_failures_total', endpoint=endpoint)
+    return None
+
+def is_shared(url: str) -> bool:
+    return _cache.is_shared(url)
+
+def get_api_data(url: str, suppress_404: bool = False):
+    return run(fetch_api_data(url, suppress_404=suppress_404))
+
+def fetch_all(urls: list, suppress_404: bool = False, on_result=None, concurrency: int = None, not_found=None, transform=None) -> list:
+    async def fetch_one(url, limiter):
+        if limiter is not None:
+            async with limiter:
+                result = await fetch_api_data(url, suppress_404=suppress_404, not_found=not_found)
+        else:
+            result = await fetch_api_data(url, suppress_404=suppress_404, not_found=not_found)
+        if transform is not None and result is not None and result is not not_found:
+            result = transform(result)
+        if on_result:
+            on_result(url, result)
+        return result
+
+    async def fetch_batch():
+        limiter = asyncio.Semaphore(concurrency) if concurrency else None
+        return await asyncio.gather(*(fetch_one(url, limiter) for url in urls))
+
+    return run(fetch_batch())
+
+def close():
+    global _session
+    if _session is not None and not _session.closed:
+        run(_session.close())
+    _session = None
+    _cache.close()
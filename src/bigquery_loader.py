@@ -0,0 +1,248 @@
+import os
+import time
+import pandas as pd
+from file_handler import (
+    CHANGE_TRACKED_DATASETS, DATE_PARTITION_COLUMNS, OPERATION_COLUMN,
+    dataset_exists, dataset_mtime, delta_paths, deltas_pruned_since, read_delta, read_dataset, read_dataset_since
+)
+from state_store import transaction
+from schemas import apply_dtypes
+from config import (
+    OUTPUT_DIR, CHANGE_DETECTION, PARQUET_COMPRESSION,
+    BIGQUERY_TARGET, BIGQUERY_PROJECT, BIGQUERY_DATASET, BIGQUERY_LOCATION, BIGQUERY_LOCAL_DIR
+)
+
+FULL_LOAD_DATASETS = [
+    'involves_marcas', 'involves_supercategorias', 'involves_linhas_de_produto', 'involves_categorias', 'involves_produtos',
+    'involves_pdv', 'involves_macroregionais', 'involves_regionais', 'involves_redes', 'involves_banners',
+    'involves_tipos_pdv', 'involves_perfis_pdv', 'involves_canais', 'involves_colaboradores', 'involves_supervisores',
+    'involves_afastamentos', 'involves_visitas_agendadas', 'involves_roteiros',
+]
+INCREMENTAL_DATASETS = [
+    'involves_pesquisas', 'involves_respostas', 'involves_formularios', 'involves_formularios_campos',
+    'involves_justificativas_falta',
+]
+STAGING_SUFFIX = '__staging'
+
+_SCHEMA_READY = False
+
+def _ensure_schema(connection):
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS bigquery_loads ("
+        "dataset TEXT PRIMARY KEY, source_mtime REAL, loaded_at REAL)"
+    )
+    _SCHEMA_READY = True
+
+def _last_loaded_mtime(dataset: str):
+    with transaction() as connection:
+        _ensure_schema(connection)
+        row = connection.execute("SELECT source_mtime FROM bigquery_loads WHERE dataset = ?", (dataset,)).fetchone()
+        return row[0] if row else None
+
+def _mark_loaded(dataset: str, source_mtime: float):
+    with transaction() as connection:
+        _ensure_schema(connection)
+        connection.execute(
+            "INSERT OR REPLACE INTO bigquery_loads (dataset, source_mtime, loaded_at) VALUES (?, ?, ?)",
+            (dataset, source_mtime, time.time())
+        )
+
+def _bigquery_type(dtype) -> str:
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'BOOL'
+    if pd.api.types.is_integer_dtype(dtype):
+        return 'INT64'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'FLOAT64'
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'TIMESTAMP'
+    return 'STRING'
+
+def _prepare_frame(df: pd.DataFrame, partition_field: str = None):
+    df = df.copy()
+    for column in df.columns:
+        if df[column].dtype == object:
+            df[column] = df[column].astype('string')
+    schema = [(column, _bigquery_type(df[column].dtype)) for column in df.columns]
+    if partition_field and partition_field in df.columns:
+        df[partition_field] = pd.to_datetime(df[partition_field].astype('string').str[:10], errors='coerce', format='%Y-%m-%d').dt.date
+        schema = [(column, 'DATE' if column == partition_field else field_type) for column, field_type in schema]
+    return df, schema
+
+def _write_staging_file(df: pd.DataFrame, table: str) -> str:
+    staging_dir = os.path.join(OUTPUT_DIR, '.bigquery')
+    os.makedirs(staging_dir, exist_ok=True)
+    path = os.path.join(staging_dir, f"{table}.parquet")
+    df.to_parquet(path, index=False, compression=PARQUET_COMPRESSION, engine='pyarrow')
+    return path
+
+def merge_sql(target: str, staging: str, key_column: str, columns: list, delete_column: str = None) -> str:
+    data_columns = [column for column in columns if column != delete_column]
+    updates = ", ".join(f"`{column}` = S.`{column}`" for column in data_columns if column != key_column)
+    inserts = ", ".join(f"`{column}`" for column in data_columns)
+    values = ", ".join(f"S.`{column}`" for column in data_columns)
+    clauses = [f"MERGE `{target}` T USING `{staging}` S ON T.`{key_column}` = S.`{key_column}`"]
+    if delete_column:
+        clauses.append(f"WHEN MATCHED AND S.`{delete_column}` = 'DELETE' THEN DELETE")
+    if updates:
+        clauses.append(f"WHEN MATCHED THEN UPDATE SET {updates}")
+    not_matched = f" AND S.`{delete_column}` != 'DELETE'" if delete_column else ""
+    clauses.append(f"WHEN NOT MATCHED{not_matched} THEN INSERT ({inserts}) VALUES ({values})")
+    return "\n".join(clauses)
+
+class BigQueryTarget:
+    name = 'bigquery'
+
+    def __init__(self, project: str, dataset: str, location: str = None, client=None, bigquery=None, not_found=None):
+        if bigquery is None:
+            from google.cloud import bigquery
+        if not_found is None:
+            from google.api_core.exceptions import NotFound as not_found
+        self._bigquery = bigquery
+        self._not_found = not_found
+        self.client = client or bigquery.Client(project=project or None, location=location or None)
+        self.dataset = f"{self.client.project}.{dataset}"
+
+    def table_id(self, table: str) -> str:
+        return f"{self.dataset}.{table}"
+
+    def table_exists(self, table: str) -> bool:
+        try:
+            self.client.get_table(self.table_id(table))
+            return True
+        except self._not_found:
+            return False
+
+    def load(self, path: str, table: str, schema: list, partition_field: str = None, cluster_field: str = None):
+        bigquery = self._bigquery
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.PARQUET,
+            write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+            schema=[bigquery.SchemaField(name, field_type) for name, field_type in schema],
+        )
+        if partition_field:
+            job_config.time_partitioning = bigquery.TimePartitioning(type_=bigquery.TimePartitioningType.DAY, field=partition_field)
+        if cluster_field:
+            job_config.clustering_fields = [cluster_field]
+        with open(path, 'rb') as source:
+            self.client.load_table_from_file(source, self.table_id(table), job_config=job_config).result()
+
+    def merge(self, table: str, staging_table: str, key_column: str, columns: list, delete_column: str = None):
+        sql = merge_sql(self.table_id(table), self.table_id(staging_table), key_column, columns, delete_column)
+        self.client.query(sql).result()
+
+    def drop(self, table: str):
+        self.client.delete_table(self.table_id(table), not_found_ok=True)
+
+class LocalTarget:
+    name = 'local'
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, table: str) -> str:
+        return os.path.join(self.directory, f"{table}.parquet")
+
+    def table_exists(self, table: str) -> bool:
+        return os.path.exists(self._path(table))
+
+    def load(self, path: str, table: str, schema: list, partition_field: str = None, cluster_field: str = None):
+        df = pd.read_parquet(path, engine='pyarrow')
+        missing = [name for name, _ in schema if name not in df.columns]
+        if missing:
+            raise ValueError(f"Colunas do schema ausentes no arquivo de carga de '{table}': {', '.join(missing)}.")
+        df.to_parquet(self._path(table), index=False, engine='pyarrow')
+
+    def merge(self, table: str, staging_table: str, key_column: str, columns: list, delete_column: str = None):
+        staging = pd.read_parquet(self._path(staging_table), engine='pyarrow')
+        target = pd.read_parquet(self._path(table), engine='pyarrow')
+        deleted = pd.Series([], dtype='string')
+        if delete_column:
+            deleted = staging.loc[staging[delete_column] == 'DELETE', key_column]
+            staging = staging[staging[delete_column] != 'DELETE'].drop(columns=[delete_column])
+        kept = target[~target[key_column].isin(staging[key_column]) & ~target[key_column].isin(deleted)]
+        merged = pd.concat([kept, staging.reindex(columns=target.columns)], ignore_index=True)
+        merged.to_parquet(self._path(table), index=False, engine='pyarrow')
+
+    def drop(self, table: str):
+        if os.path.exists(self._path(table)):
+            os.remove(self._path(table))
+
+def get_target(target_name: str = None):
+    target_name = (target_name or BIGQUERY_TARGET).lower()
+    if target_name == 'local':
+        return LocalTarget(BIGQUERY_LOCAL_DIR)
+    if target_name == 'bigquery':
+        if not BIGQUERY_DATASET:
+            raise ValueError("Defina INVOLVES_BIGQUERY_DATASET para carregar os datasets no BigQuery.")
+        return BigQueryTarget(BIGQUERY_PROJECT, BIGQUERY_DATASET, BIGQUERY_LOCATION)
+    raise ValueError(f"Destino de carga '{target_name}' não suportado. Opções: bigquery, local.")
+
+def _load_frame(target, df: pd.DataFrame, table: str, partition_field: str = None, cluster_field: str = None, partitioned: bool = True):
+    df, schema = _prepare_frame(df, partition_field)
+    path = _write_staging_file(df, table)
+    try:
+        partition_field = partition_field if partitioned and partition_field in df.columns else None
+        target.load(path, table, schema, partition_field, cluster_field)
+    finally:
+        os.remove(path)
+    return len(df)
+
+def _merge_frame(target, df: pd.DataFrame, table: str, key_column: str, partition_field: str = None, delete_column: str = None):
+    staging_table = f"{table}{STAGING_SUFFIX}"
+    _load_frame(target, df, staging_table, partition_field, partitioned=False)
+    try:
+        target.merge(table, staging_table, key_column, list(df.columns), delete_column)
+    finally:
+        target.drop(staging_table)
+    return len(df)
+
+def load_dataset(target, filename: str, output_format: str = None, force: bool = False):
+    if not dataset_exists(filename, output_format):
+        return
+    source_mtime = dataset_mtime(filename, output_format)
+    deltas = delta_paths(filename, output_format) if filename in CHANGE_TRACKED_DATASETS else []
+    last_loaded = _last_loaded_mtime(filename)
+    if not force and last_loaded is not None and source_mtime <= last_loaded and not deltas:
+        print(f"'{filename}' sem alterações desde a última carga; ignorado.")
+        return
+
+    partition_field = DATE_PARTITION_COLUMNS.get(filename)
+    table_exists = target.table_exists(filename)
+
+    if filename in INCREMENTAL_DATASETS and table_exists and not force:
+        df = read_dataset_since(filename, last_loaded, output_format=output_format)
+        if df is None or df.empty:
+            print(f"'{filename}' sem segmentos novos desde a última carga; ignorado.")
+        else:
+            df = apply_dtypes(df, filename)
+            rows = _merge_frame(target, df, filename, df.columns[0], partition_field)
+            print(f"✅ '{filename}': MERGE de {rows} registros novos ou alterados em '{target.name}'.")
+    elif deltas and table_exists and last_loaded is not None and CHANGE_DETECTION and not force \
+            and not deltas_pruned_since(filename, last_loaded):
+        rows = 0
+        for delta_path in deltas:
+            delta_df = apply_dtypes(read_delta(delta_path, output_format), filename)
+            rows += _merge_frame(target, delta_df, filename, delta_df.columns[0], partition_field, delete_column=OPERATION_COLUMN)
+        print(f"✅ '{filename}': {len(deltas)} delta(s) aplicados com MERGE ({rows} operações) em '{target.name}'.")
+    else:
+        df = apply_dtypes(read_dataset(filename, output_format=output_format), filename)
+        rows = _load_frame(target, df, filename, partition_field, cluster_field=df.columns[0])
+        print(f"✅ '{filename}': carga completa de {rows} registros em '{target.name}'.")
+
+    for delta_path in deltas:
+        os.remove(delta_path)
+    _mark_loaded(filename, source_mtime)
+
+def load_datasets(output_format: str = None, target_name: str = None, force: bool = False):
+    target = get_target(target_name)
+    print(f"\n--- CARREGANDO DATASETS NO DESTINO '{target.name}' ---")
+    for filename in FULL_LOAD_DATASETS + INCREMENTAL_DATASETS:
+        try:
+            load_dataset(target, filename, output_format=output_format, force=force)
+        except Exception as e:
+            print(f"Erro ao carregar '{filename}' em '{target.name}': {e}")
@@ -0,0 +1,78 @@
+import json
+import time
+from state_store import transaction
+from config import CHECKPOINTS
+
+_SCHEMA_READY = False
+_READ_CHUNK_SIZE = 500
+
+def _ensure_schema(connection):
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS stage_checkpoints ("
+        "stage TEXT NOT NULL, key TEXT NOT NULL, payload TEXT, PRIMARY KEY (stage, key)) WITHOUT ROWID"
+    )
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS task_checkpoints (task TEXT PRIMARY KEY, completed_at REAL) WITHOUT ROWID"
+    )
+    _SCHEMA_READY = True
+
+def completed_keys(stage: str) -> set:
+    if not CHECKPOINTS:
+        return set()
+    with transaction() as connection:
+        _ensure_schema(connection)
+        return {key for (key,) in connection.execute("SELECT key FROM stage_checkpoints WHERE stage = ?", (stage,))}
+
+def iter_payloads(stage: str):
+    last_key = ''
+    while True:
+        with transaction() as connection:
+            _ensure_schema(connection)
+            rows = connection.execute(
+                "SELECT key, payload FROM stage_checkpoints WHERE stage = ? AND key > ? ORDER BY key LIMIT ?",
+                (stage, last_key, _READ_CHUNK_SIZE)
+            ).fetchall()
+        if not rows:
+            return
+        for key, payload in rows:
+            yield key, json.loads(payload)
+        last_key = rows[-1][0]
+
+def enabled() -> bool:
+    return CHECKPOINTS
+
+def save_encoded_payloads(stage: str, payloads: dict):
+    if not CHECKPOINTS or not payloads:
+        return
+    with transaction() as connection:
+        _ensure_schema(connection)
+        connection.executemany(
+            "INSERT OR REPLACE INTO stage_checkpoints (stage, key, payload) VALUES (?, ?, ?)",
+            ((stage, str(key), payload) for key, payload in payloads.items())
+        )
+
+def save_payloads(stage: str, payloads: dict):
+    save_encoded_payloads(stage, {key: json.dumps(payload) for key, payload in payloads.items()})
+
+def completed_tasks() -> set:
+    if not CHECKPOINTS:
+        return set()
+    with transaction() as connection:
+        _ensure_schema(connection)
+        return {task for (task,) in connection.execute("SELECT task FROM task_checkpoints")}
+
+def mark_task_completed(task: str):
+    if not CHECKPOINTS:
+        return
+    with transaction() as connection:
+        _ensure_schema(connection)
+        connection.execute("INSERT OR REPLACE INTO task_checkpoints (task, completed_at) VALUES (?, ?)", (task, time.time()))
+
+def clear():
+    with transaction() as connection:
+        _ensure_schema(connection)
+        connection.execute("DELETE FROM stage_checkpoints")
+        connection.execute("DELETE FROM task_checkpoints")
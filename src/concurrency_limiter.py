@@ -0,0 +1,86 @@
+import asyncio
+from contextlib import asynccontextmanager
+import metrics
+from config import (
+    HTTP_ADAPTIVE_CONCURRENCY, HTTP_MIN_CONCURRENCY, HTTP_INITIAL_CONCURRENCY, HTTP_MAX_CONCURRENCY, HTTP_LATENCY_TOLERANCE
+)
+from response_cache import endpoint_family
+
+ERROR_BACKOFF = 0.5
+LATENCY_BACKOFF = 0.8
+BASELINE_DRIFT = 1.05
+
+class AdaptiveLimit:
+    def __init__(self, family: str, initial: int, minimum: int, maximum: int):
+        self.family = family
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(self.maximum, max(self.minimum, initial))
+        self.peak = self.limit
+        self.decreases = 0
+        self.baseline = None
+        self.in_flight = 0
+        self._generation = 0
+        self._window = []
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        try:
+            yield self._generation
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                self._condition.notify(max(1, self.limit - self.in_flight))
+
+    def on_success(self, seconds: float):
+        self._window.append(seconds)
+        if len(self._window) < self.limit:
+            return
+        average = sum(self._window) / len(self._window)
+        self._window = []
+        self.baseline = average if self.baseline is None else min(average, self.baseline * BASELINE_DRIFT)
+        if average > self.baseline * HTTP_LATENCY_TOLERANCE:
+            self._decrease(LATENCY_BACKOFF, f"latência média {average:.2f}s")
+        elif self.limit < self.maximum:
+            self.limit += 1
+            self.peak = max(self.peak, self.limit)
+
+    def on_error(self, generation: int, reason: str):
+        if generation == self._generation:
+            self._window = []
+            self._decrease(ERROR_BACKOFF, reason)
+
+    def _decrease(self, factor: float, reason: str):
+        limit = max(self.minimum, int(self.limit * factor))
+        if limit == self.limit:
+            return
+        print(f"\n  > Concorrência de '{self.family}' reduzida de {self.limit} para {limit} ({reason}).")
+        metrics.inc('http_concurrency_decreases_total', family=self.family)
+        self.limit = limit
+        self.decreases += 1
+        self._generation += 1
+
+_limits = {}
+
+def get_limit(url: str) -> AdaptiveLimit:
+    family = endpoint_family(url) or 'outros'
+    limit = _limits.get(family)
+    if limit is None:
+        if HTTP_ADAPTIVE_CONCURRENCY:
+            limit = AdaptiveLimit(family, HTTP_INITIAL_CONCURRENCY, HTTP_MIN_CONCURRENCY, HTTP_MAX_CONCURRENCY)
+        else:
+            limit = AdaptiveLimit(family, HTTP_MAX_CONCURRENCY, HTTP_MAX_CONCURRENCY, HTTP_MAX_CONCURRENCY)
+        _limits[family] = limit
+    return limit
+
+def print_summary():
+    if not HTTP_ADAPTIVE_CONCURRENCY or not _limits:
+        return
+    print("Concorrência adaptativa por família de endpoint:")
+    for family, limit in sorted(_limits.items()):
+        baseline = f", latência base {limit.baseline:.2f}s" if limit.baseline is not None else ""
+        print(f"  > {family}: limite final {limit.limit} (pico {limit.peak}, {limit.decreases} redução(ões){baseline})")
@@ -16,4 +16,77 @@ HEADERS = {
     "Authorization": f"Basic {_base64_auth_string}",
     "X-AGILE-CLIENT": "EXTERNAL_APP",
     "Accept-Version": "2020-02-26"
-}
\ No newline at end of file
+}
+
+HTTP_MAX_CONCURRENCY = int(os.getenv("INVOLVES_HTTP_MAX_CONCURRENCY", "20"))
+HTTP_TIMEOUT = int(os.getenv("INVOLVES_HTTP_TIMEOUT", "30"))
+HTTP_KEEPALIVE_TIMEOUT = int(os.getenv("INVOLVES_HTTP_KEEPALIVE_TIMEOUT", "60"))
+HTTP_ADAPTIVE_CONCURRENCY = os.getenv("INVOLVES_HTTP_ADAPTIVE_CONCURRENCY", "true").lower() in ("1", "true", "yes")
+HTTP_MIN_CONCURRENCY = int(os.getenv("INVOLVES_HTTP_MIN_CONCURRENCY", "2"))
+HTTP_INITIAL_CONCURRENCY = int(os.getenv("INVOLVES_HTTP_INITIAL_CONCURRENCY", "8"))
+HTTP_LATENCY_TOLERANCE = float(os.getenv("INVOLVES_HTTP_LATENCY_TOLERANCE", "2.0"))
+
+PAGINATION_MODE = os.getenv("INVOLVES_PAGINATION_MODE", "concurrent").lower()
+PAGINATION_CONCURRENCY = int(os.getenv("INVOLVES_PAGINATION_CONCURRENCY", "8"))
+PAGINATION_PAGE_RETRIES = int(os.getenv("INVOLVES_PAGINATION_PAGE_RETRIES", "2"))
+
+RATE_LIMIT_RPS = float(os.getenv("INVOLVES_RATE_LIMIT_RPS", "20"))
+RATE_LIMIT_BURST = int(os.getenv("INVOLVES_RATE_LIMIT_BURST", "40"))
+HTTP_MAX_RETRIES = int(os.getenv("INVOLVES_HTTP_MAX_RETRIES", "5"))
+BACKOFF_BASE_SECONDS = float(os.getenv("INVOLVES_BACKOFF_BASE_SECONDS", "0.5"))
+BACKOFF_MAX_SECONDS = float(os.getenv("INVOLVES_BACKOFF_MAX_SECONDS", "30"))
+
+CACHE_MAX_ENTRIES = int(os.getenv("INVOLVES_CACHE_MAX_ENTRIES", "2000"))
+CACHE_PATH = os.getenv("INVOLVES_CACHE_PATH", "")
+CACHE_TTL_DIMENSIONS = int(os.getenv("INVOLVES_CACHE_TTL_DIMENSIONS", str(7 * 24 * 3600)))
+CACHE_TTL_DEFAULT = int(os.getenv("INVOLVES_CACHE_TTL_DEFAULT", "0"))
+CACHE_TTL_VOLATILE = int(os.getenv("INVOLVES_CACHE_TTL_VOLATILE", "0"))
+SHARED_CACHE_PATH = os.getenv("INVOLVES_SHARED_CACHE_PATH", "")
+
+OUTPUT_DIR = os.getenv("INVOLVES_OUTPUT_DIR", "dataset")
+OUTPUT_FORMAT = os.getenv("INVOLVES_OUTPUT_FORMAT", "excel").lower()
+PARQUET_COMPRESSION = os.getenv("INVOLVES_PARQUET_COMPRESSION", "zstd")
+PARQUET_PARTITION_BY_DATE = os.getenv("INVOLVES_PARQUET_PARTITION_BY_DATE", "false").lower() in ("1", "true", "yes")
+
+INCREMENTAL_STORAGE = os.getenv("INVOLVES_INCREMENTAL_STORAGE", "segments").lower()
+COMPACTION_MAX_SEGMENTS = int(os.getenv("INVOLVES_COMPACTION_MAX_SEGMENTS", "30"))
+
+STATE_PATH = os.getenv("INVOLVES_STATE_PATH", os.path.join(OUTPUT_DIR, ".state", "etl_state.sqlite"))
+CHECKPOINTS = os.getenv("INVOLVES_CHECKPOINTS", "true").lower() in ("1", "true", "yes")
+
+DETAIL_BATCH_SIZE = int(os.getenv("INVOLVES_DETAIL_BATCH_SIZE", "1000"))
+PAGE_FETCH_WINDOW = int(os.getenv("INVOLVES_PAGE_FETCH_WINDOW", "200"))
+STREAM_BATCH_SIZE = int(os.getenv("INVOLVES_STREAM_BATCH_SIZE", "5000"))
+WRITER_PROCESSES = int(os.getenv("INVOLVES_WRITER_PROCESSES", "0"))
+WRITER_MAX_PENDING = int(os.getenv("INVOLVES_WRITER_MAX_PENDING", "4"))
+
+TRANSFORM_MODE = os.getenv("INVOLVES_TRANSFORM_MODE", "columnar").lower()
+
+ETL_MAX_PARALLEL_TASKS = int(os.getenv("INVOLVES_ETL_MAX_PARALLEL_TASKS", "4"))
+
+ENVIRONMENTS = [environment_id.strip() for environment_id in os.getenv("INVOLVES_ENVIRONMENTS", "").split(",") if environment_id.strip()]
+ENVIRONMENTS_FILE = os.getenv("INVOLVES_ENVIRONMENTS_FILE", "")
+ENVIRONMENTS_MAX_PARALLEL = int(os.getenv("INVOLVES_ENVIRONMENTS_MAX_PARALLEL", "4"))
+
+SCHEDULED_VISITS_SKIP_INACTIVE = os.getenv("INVOLVES_SCHEDULED_VISITS_SKIP_INACTIVE", "false").lower() in ("1", "true", "yes")
+SCHEDULED_VISITS_ONLY_WITH_ITINERARY = os.getenv("INVOLVES_SCHEDULED_VISITS_ONLY_WITH_ITINERARY", "false").lower() in ("1", "true", "yes")
+
+NOSHOW_OPEN_STATUSES = {status.strip().upper() for status in os.getenv("INVOLVES_NOSHOW_OPEN_STATUSES", "PENDING,OPEN,WAITING_APPROVAL,IN_ANALYSIS").split(",") if status.strip()}
+NOSHOW_RECHECK_DAYS = int(os.getenv("INVOLVES_NOSHOW_RECHECK_DAYS", "7"))
+
+SURVEYS_SINCE_PARAM = os.getenv("INVOLVES_SURVEYS_SINCE_PARAM", "")
+SURVEYS_WATERMARK_OVERLAP_DAYS = int(os.getenv("INVOLVES_SURVEYS_WATERMARK_OVERLAP_DAYS", "2"))
+
+CHANGE_DETECTION = os.getenv("INVOLVES_CHANGE_DETECTION", "true").lower() in ("1", "true", "yes")
+DELTA_RETENTION = int(os.getenv("INVOLVES_DELTA_RETENTION", "30"))
+
+DIMENSION_DETAIL_MAX_IDS = int(os.getenv("INVOLVES_DIMENSION_DETAIL_MAX_IDS", "10"))
+
+BIGQUERY_TARGET = os.getenv("INVOLVES_BIGQUERY_TARGET", "bigquery").lower()
+BIGQUERY_PROJECT = os.getenv("INVOLVES_BIGQUERY_PROJECT", "")
+BIGQUERY_DATASET = os.getenv("INVOLVES_BIGQUERY_DATASET", "")
+BIGQUERY_LOCATION = os.getenv("INVOLVES_BIGQUERY_LOCATION", "")
+BIGQUERY_LOCAL_DIR = os.getenv("INVOLVES_BIGQUERY_LOCAL_DIR", os.path.join(OUTPUT_DIR, ".warehouse"))
+
+METRICS_DIR = os.getenv("INVOLVES_METRICS_DIR", os.path.join(OUTPUT_DIR, ".metrics"))
+METRICS_PROMETHEUS = os.getenv("INVOLVES_METRICS_PROMETHEUS", "false").lower() in ("1", "true", "yes")
@@ -1,29 +1,102 @@
-import time
+import hashlib
 import json
+import time
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from config import INVOLVES_BASE_URL, INVOLVES_ENVIRONMENT_ID
-from api_client import get_api_data
+from config import (
+    INVOLVES_BASE_URL, INVOLVES_ENVIRONMENT_ID, PAGINATION_MODE, PAGINATION_CONCURRENCY, PAGINATION_PAGE_RETRIES, DETAIL_BATCH_SIZE, PAGE_FETCH_WINDOW,
+    SCHEDULED_VISITS_SKIP_INACTIVE, NOSHOW_OPEN_STATUSES, NOSHOW_RECHECK_DAYS,
+    DIMENSION_DETAIL_MAX_IDS, TRANSFORM_MODE, SURVEYS_SINCE_PARAM, SURVEYS_WATERMARK_OVERLAP_DAYS
+)
+from api_client import get_api_data, fetch_all, is_shared
+import key_index
+import row_hashes
+import watermarks
+import noshow_state
+import checkpoints
+import metrics
+import schemas
+
+ITINERARIES_DATASET = 'involves_roteiros'
+NOSHOWS_DATASET = 'involves_justificativas_falta'
+SURVEYS_DATASET = 'involves_pesquisas'
+SURVEY_FINGERPRINTS = 'involves_pesquisas.resumo'
+SURVEY_FINGERPRINT_FIELDS = ('status', 'responseDate', 'updatedAt', 'expirationDate')
+
+_NOT_FOUND = object()
+
+PAGE_SIZE = 100
+
+def _paginated_url(base_url: str, page_num: int) -> str:
+    separator = '&' if '?' in base_url else '?'
+    return f"{base_url}{separator}page={page_num}&size={PAGE_SIZE}"
+
+def _fetch_with_retries(urls: list, endpoint_name: str, verbose: bool = True, concurrency: int = None, transform=None):
+    fetched = {}
+    pending = list(urls)
+
+    for retry_round in range(PAGINATION_PAGE_RETRIES + 1):
+        if not pending:
+            break
+        if retry_round > 0 and verbose:
+            print(f"  > Tentando novamente {len(pending)} página(s) com falha (rodada {retry_round}/{PAGINATION_PAGE_RETRIES})...")
+
+        results = fetch_all(pending, concurrency=concurrency, transform=transform)
+        failed = []
+        for url, response_data in zip(pending, results):
+            if response_data is None:
+                failed.append(url)
+            else:
+                fetched[url] = response_data
+        pending = failed
+
+    return fetched, pending
 
-def _fetch_paginated_data(base_url: str) -> list:
-    all_items = []
-    page_num = 1
+def _fetch_remaining_pages(base_url: str, page_numbers: list, endpoint_name: str) -> dict:
+    verbose = 'itinerary' not in endpoint_name
+    url_to_page = {_paginated_url(base_url, page_num): page_num for page_num in page_numbers}
+    fetched, failed = _fetch_with_retries(list(url_to_page), endpoint_name, verbose, concurrency=PAGINATION_CONCURRENCY)
+
+    for url in failed:
+        print(f"  > Falha ao buscar a página {url_to_page[url]} de '{endpoint_name}' após {PAGINATION_PAGE_RETRIES} novas tentativas. Página ignorada.")
+    return {url_to_page[url]: response_data for url, response_data in fetched.items()}
+
+def _page_key(page_num: int) -> str:
+    return f"{page_num:06d}"
+
+def _iter_paginated_data(base_url: str, concurrent: bool = None, start_page: int = 1, checkpoint: str = None):
+    if concurrent is None:
+        concurrent = PAGINATION_MODE == 'concurrent'
+
+    total_items = 0
+    page_num = start_page
     total_pages = None
+    checkpoint = checkpoint if checkpoints.enabled() else None
+    resumed = set()
 
     endpoint_name = base_url.split('/')[-1] if '?' not in base_url else base_url.split('/')[-1].split('?')[0]
     
     if 'itinerary' not in endpoint_name:
         print(f"\n--- Iniciando extração para: '{endpoint_name}' ---")
 
+    if checkpoint:
+        for key, items in checkpoints.iter_payloads(checkpoint):
+            resumed.add(int(key))
+            total_items += len(items)
+            yield items
+        if resumed:
+            print(f"  > '{endpoint_name}': {len(resumed)} página(s) retomadas do checkpoint.")
+
     while True:
         if total_pages is not None and page_num > total_pages:
             if 'itinerary' not in endpoint_name:
                 print(f"Atingido o número total de páginas ({total_pages}).")
             break
 
-        separator = '&' if '?' in base_url else '?'
-        paginated_url = f"{base_url}{separator}page={page_num}&size=100"
-        response_data = get_api_data(paginated_url)
+        if page_num in resumed:
+            page_num += 1
+            continue
+
+        response_data = get_api_data(_paginated_url(base_url, page_num))
 
         if not response_data:
             if total_pages is not None and page_num < total_pages:
@@ -47,219 +120,408 @@ def _fetch_paginated_data(base_url: str) -> list:
         if not items_on_page:
             break
 
-        all_items.extend(items_on_page)
+        total_items += len(items_on_page)
+        yield items_on_page
+        if checkpoint:
+            checkpoints.save_payloads(checkpoint, {_page_key(page_num): items_on_page})
         if 'itinerary' not in endpoint_name:
-            print(f"  > Página {page_num} processada. Total de {len(all_items)} itens acumulados.")
+            print(f"  > Página {page_num} processada. Total de {total_items} itens acumulados.")
         page_num += 1
-        time.sleep(0.2)
+
+        if concurrent and total_pages and page_num <= total_pages:
+            pending = [number for number in range(page_num, total_pages + 1) if number not in resumed]
+            for window_start in range(0, len(pending), PAGE_FETCH_WINDOW):
+                window = pending[window_start:window_start + PAGE_FETCH_WINDOW]
+                remaining_pages = _fetch_remaining_pages(base_url, window, endpoint_name)
+                settled = {}
+                for remaining_page_num in sorted(remaining_pages):
+                    page_data = remaining_pages[remaining_page_num]
+                    if isinstance(page_data, dict) and page_data.get('items'):
+                        total_items += len(page_data['items'])
+                        yield page_data['items']
+                        settled[_page_key(remaining_page_num)] = page_data['items']
+                if checkpoint:
+                    checkpoints.save_payloads(checkpoint, settled)
+            if 'itinerary' not in endpoint_name:
+                print(f"  > Páginas {page_num} a {total_pages} processadas em paralelo. Total de {total_items} itens acumulados.")
+            break
     
     if 'itinerary' not in endpoint_name:
-        print(f"Extração de '{endpoint_name}' finalizada. Total de {len(all_items)} itens encontrados.")
-    return all_items
-
-
-def _fetch_details_in_parallel(url_template: str, ids: set, endpoint_name_for_log: str, attach_id_field_name: str = None, suppress_404: bool = False) -> list:
-    valid_ids = {item_id for item_id in ids if item_id}
+        print(f"Extração de '{endpoint_name}' finalizada. Total de {total_items} itens encontrados.")
+
+def _page_items(response_data) -> list:
+    if isinstance(response_data, list):
+        return response_data
+    if isinstance(response_data, dict):
+        return response_data.get('items') or []
+    return []
+
+def _projected(items: list, projection: dict = None) -> list:
+    return schemas.project(items, projection) if projection else items
+
+def _page_projector(projection: dict = None):
+    if not projection:
+        return None
+    def project_page(response_data):
+        if isinstance(response_data, dict) and isinstance(response_data.get('items'), list):
+            return {**response_data, 'items': schemas.project(response_data['items'], projection)}
+        if isinstance(response_data, list):
+            return schemas.project(response_data, projection)
+        return response_data
+    return project_page
+
+def _detail_projector(projection: dict = None):
+    if not projection:
+        return None
+    return lambda result: schemas.project([result], projection)[0] if isinstance(result, dict) else result
+
+def _encoded_pages(pages: list) -> str:
+    return '[' + ','.join(page[1:-1] for page in pages if len(page) > 2) + ']'
+
+def _iter_paginated_many(base_urls: dict, endpoint_name: str, failed_keys: set = None, checkpoint: str = None, projection: dict = None):
+    keys = list(base_urls)
+    completed = 0
+    checkpoint = checkpoint if checkpoints.enabled() else None
+
+    if checkpoint:
+        keys_by_name = {str(key): key for key in keys}
+        resumed = checkpoints.completed_keys(checkpoint) & set(keys_by_name)
+        if resumed:
+            print(f"  > '{endpoint_name}': {len(resumed)} consulta(s) retomadas do checkpoint.")
+            for name, items in checkpoints.iter_payloads(checkpoint):
+                if name in resumed and items:
+                    yield keys_by_name[name], items
+            keys = [key for key in keys if str(key) not in resumed]
+
+    for batch_start in range(0, len(keys), DETAIL_BATCH_SIZE):
+        batch_keys = keys[batch_start:batch_start + DETAIL_BATCH_SIZE]
+        first_page_urls = {_paginated_url(base_urls[key], 1): key for key in batch_keys}
+        batch_failed, batch_pages, remaining_urls = set(), {}, {}
+
+        def keep(key, items):
+            if checkpoint:
+                batch_pages.setdefault(key, []).append(json.dumps(items))
+
+        def settle(settled_keys):
+            if checkpoint:
+                checkpoints.save_encoded_payloads(checkpoint, {
+                    key: _encoded_pages(batch_pages.pop(key, [])) for key in settled_keys if key not in batch_failed
+                })
+
+        first_urls = list(first_page_urls)
+        for window_start in range(0, len(first_urls), PAGE_FETCH_WINDOW):
+            window = first_urls[window_start:window_start + PAGE_FETCH_WINDOW]
+            first_pages, failed = _fetch_with_retries(window, endpoint_name, verbose=False, transform=_page_projector(projection))
+            for url in failed:
+                print(f"\n  > Falha ao buscar '{endpoint_name}' para {first_page_urls[url]} após {PAGINATION_PAGE_RETRIES} novas tentativas. Registro ignorado.")
+                batch_failed.add(first_page_urls[url])
+
+            for url in window:
+                if url not in first_pages:
+                    continue
+                key, response_data = first_page_urls[url], first_pages.pop(url)
+                items = _page_items(response_data)
+                if items:
+                    keep(key, items)
+                    yield key, items
+                if isinstance(response_data, dict):
+                    for page_num in range(2, (response_data.get('totalPages') or 1) + 1):
+                        remaining_urls[_paginated_url(base_urls[key], page_num)] = key
+                elif len(items) >= PAGE_SIZE:
+                    for page in _iter_paginated_data(base_urls[key], concurrent=False, start_page=2):
+                        page = _projected(page, projection)
+                        keep(key, page)
+                        yield key, page
+
+        pending_pages = {}
+        for key in remaining_urls.values():
+            pending_pages[key] = pending_pages.get(key, 0) + 1
+        settle([key for key in batch_keys if key not in pending_pages])
+
+        remaining = list(remaining_urls)
+        for chunk_start in range(0, len(remaining), PAGE_FETCH_WINDOW):
+            chunk = remaining[chunk_start:chunk_start + PAGE_FETCH_WINDOW]
+            pages, failed = _fetch_with_retries(chunk, endpoint_name, verbose=False, transform=_page_projector(projection))
+            for url in failed:
+                print(f"\n  > Falha ao buscar uma página de '{endpoint_name}' para {remaining_urls[url]}. Página ignorada.")
+                batch_failed.add(remaining_urls[url])
+            settled = []
+            for url in chunk:
+                key = remaining_urls[url]
+                items = _page_items(pages.pop(url, None))
+                if items:
+                    keep(key, items)
+                    yield key, items
+                pending_pages[key] -= 1
+                if not pending_pages[key]:
+                    settled.append(key)
+            settle(settled)
+
+        if failed_keys is not None:
+            failed_keys.update(batch_failed)
+        completed += len(batch_keys)
+        print(f"\r  > '{endpoint_name}': {completed}/{len(keys)} consultas concluídas", end="", flush=True)
+
+    if keys:
+        print()
+
+def _fetch_paginated_data(base_url: str, concurrent: bool = None) -> list:
+    return [item for page in _iter_paginated_data(base_url, concurrent) for item in page]
+
+
+def _iter_checkpoint_batches(checkpoint: str, keys: set):
+    batch = []
+    for key, payload in checkpoints.iter_payloads(checkpoint):
+        if key not in keys:
+            continue
+        batch.append(payload)
+        if len(batch) >= DETAIL_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _iter_details_in_parallel(url_template: str, ids: set, endpoint_name_for_log: str, attach_id_field_name: str = None, suppress_404: bool = False,
+                              checkpoint: str = None, projection: dict = None):
+    valid_ids = [item_id for item_id in ids if item_id]
+    if checkpoint and valid_ids:
+        resumed = checkpoints.completed_keys(checkpoint) & {str(item_id) for item_id in valid_ids}
+        if resumed:
+            print(f"  > '{endpoint_name_for_log}': {len(resumed)} detalhe(s) retomados do checkpoint.")
+            yield from _iter_checkpoint_batches(checkpoint, resumed)
+            valid_ids = [item_id for item_id in valid_ids if str(item_id) not in resumed]
     if not valid_ids:
-        return []
+        return
     
-    processed_details = []
-    MAX_WORKERS = 10
     total_ids = len(valid_ids)
-
-    def fetch_single_detail(item_id):
-        detail_url = url_template.format(id=item_id)
-        return get_api_data(detail_url, suppress_404=suppress_404)
-
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        future_to_id = {executor.submit(fetch_single_detail, item_id): item_id for item_id in valid_ids}
-        for i, future in enumerate(as_completed(future_to_id)):
-            try:
-                result = future.result()
-                if result and isinstance(result, dict):
-                    if attach_id_field_name:
-                        result[attach_id_field_name] = future_to_id[future]
-                    processed_details.append(result)
-            except Exception as exc: 
-                print(f'Um item com ID atrelado a {future_to_id[future]} gerou uma exceção: {exc}')
-            print(f"\r  > Detalhes de '{endpoint_name_for_log}' processados: {i + 1}/{total_ids}", end="", flush=True)
+    completed = 0
+
+    for batch_start in range(0, total_ids, DETAIL_BATCH_SIZE):
+        batch_ids = valid_ids[batch_start:batch_start + DETAIL_BATCH_SIZE]
+        url_to_id = {url_template.format(id=item_id): item_id for item_id in batch_ids}
+        processed_details = {}
+
+        def on_result(detail_url, result):
+            nonlocal completed
+            completed += 1
+            if result and isinstance(result, dict):
+                if attach_id_field_name:
+                    result = {**result, attach_id_field_name: url_to_id[detail_url]}
+                processed_details[url_to_id[detail_url]] = result
+            print(f"\r  > Detalhes de '{endpoint_name_for_log}' processados: {completed}/{total_ids}", end="", flush=True)
+
+        fetch_all(list(url_to_id), suppress_404=suppress_404, on_result=on_result, transform=_detail_projector(projection))
+        if checkpoint:
+            checkpoints.save_payloads(checkpoint, processed_details)
+        if processed_details:
+            yield list(processed_details.values())
 
     print()
-    return processed_details
 
+def _fetch_details_in_parallel(url_template: str, ids: set, endpoint_name_for_log: str, attach_id_field_name: str = None, suppress_404: bool = False,
+                               projection: dict = None) -> list:
+    return [
+        detail
+        for batch in _iter_details_in_parallel(url_template, ids, endpoint_name_for_log, attach_id_field_name, suppress_404, projection=projection)
+        for detail in batch
+    ]
+
+def _matching_items(page: list, wanted: set, required_fields: tuple) -> dict:
+    return {
+        str(item['id']): item for item in page
+        if isinstance(item, dict) and str(item.get('id')) in wanted and all(field in item for field in required_fields)
+    }
+
+def _list_items_by_id(list_url: str, wanted: set, required_fields: tuple, endpoint_name: str, shared: bool = False):
+    first_page = get_api_data(_paginated_url(list_url, 1), suppress_404=True)
+    if isinstance(first_page, dict):
+        total_pages = first_page.get('totalPages') or 1
+    elif isinstance(first_page, list) and len(first_page) < PAGE_SIZE:
+        total_pages = 1
+    else:
+        return None
+
+    found = _matching_items(_page_items(first_page), wanted, required_fields)
+    missing = len(wanted) - len(found)
+    if missing and total_pages - 1 >= missing and not shared:
+        if found:
+            print(f"  > '{endpoint_name}': {len(found)} ID(s) resolvidos pela primeira página da listagem; {missing} buscados individualmente.")
+        return found
+
+    print(f"  > '{endpoint_name}': {len(wanted)} IDs resolvidos pela listagem paginada ({total_pages} página(s)) em vez de {len(wanted)} requisições individuais.")
+    if missing and total_pages > 1:
+        remaining_pages = _fetch_remaining_pages(list_url, list(range(2, total_pages + 1)), endpoint_name)
+        for page_num in sorted(remaining_pages):
+            found.update(_matching_items(_page_items(remaining_pages[page_num]), wanted, required_fields))
+    return found
+
+def _resolve_dimension(ids: set, detail_url_template: str, endpoint_name: str, list_url: str = None, required_fields: tuple = ()) -> list:
+    wanted = {str(item_id) for item_id in ids or () if item_id}
+    if not wanted:
+        return []
+
+    found = {}
+    shared = bool(list_url) and is_shared(list_url)
+    if list_url and (len(wanted) > DIMENSION_DETAIL_MAX_IDS or shared):
+        found = _list_items_by_id(list_url, wanted, required_fields, endpoint_name, shared) or {}
+
+    missing = wanted - set(found)
+    if missing and found:
+        print(f"  > '{endpoint_name}': {len(missing)} ID(s) ausentes da listagem; buscando individualmente.")
+    return list(found.values()) + _fetch_details_in_parallel(detail_url_template, missing, endpoint_name)
+
+def _transform(spec, items, context: dict = None):
+    if TRANSFORM_MODE == 'columnar':
+        return spec.frame(items, context)
+    return spec.rows(items, context)
+
+def _flatten(batches) -> list:
+    return [row for batch in batches for row in schemas.as_rows(batch)]
+
+def collect_ids(batches, columns: list, collected: dict):
+    for column in columns:
+        collected.setdefault(column, set())
+    for batch in batches:
+        if isinstance(batch, list):
+            for row in batch:
+                for column in columns:
+                    value = row.get(column)
+                    if value:
+                        collected[column].add(value)
+        else:
+            for column in columns:
+                collected[column].update(value for value in batch[column].dropna() if value)
+        yield batch
+
+def to_str(v):
+    return str(v) if v is not None else None
+
+@metrics.stage('product_dimensions')
 def process_product_dimensions():
     print("\n--- INICIANDO EXTRAÇÃO DE DIMENSÕES DE PRODUTO ---")
-    to_str = lambda v: str(v) if v is not None else None
     
     brands_raw = _fetch_paginated_data(f"{INVOLVES_BASE_URL}/v3/environments/{INVOLVES_ENVIRONMENT_ID}/brands")
-    brands = [{'IDMARCA': to_str(b.get('id')), 'NOMEMARCA': b.get('name')} for b in brands_raw if isinstance(b, dict)]
+    brands = schemas.BRAND.rows(brands_raw)
     
     supercategories_raw = _fetch_paginated_data(f"{INVOLVES_BASE_URL}/v3/environments/{INVOLVES_ENVIRONMENT_ID}/supercategories")
-    supercategories = [{'IDSUPERCATEGORIA': to_str(sc.get('id')), 'NOMESUPERCATEGORIA': sc.get('name')} for sc in supercategories_raw if isinstance(sc, dict)]
+    supercategories = schemas.SUPERCATEGORY.rows(supercategories_raw)
     
     productlines_raw = _fetch_paginated_data(f"{INVOLVES_BASE_URL}/v3/environments/{INVOLVES_ENVIRONMENT_ID}/productlines")
-    productlines = []
-    for pl in productlines_raw:
-        if not isinstance(pl, dict): continue
-        custom_fields_list = pl.get('customFields', [])
-        row = {
-            'IDLINHAPRODUTO': to_str(pl.get('id')),
-            'NOMELINHAPRODUTO': pl.get('name'),
-            'CODIGOBARRAS': to_str(pl.get('barCode')),
-            'CODIGOEXTERNO': to_str(pl.get('externalCode')),
-            'ISACTIVE': pl.get('active'),
-            'ISAPPROVED': pl.get('approved'),
-            'ORIGEM': pl.get('origin'),
-            'DATAATUALIZACAO': pl.get('updatedAt'),
-            'IDMARCA': to_str(pl['brand'].get('id')) if pl.get('brand') else None,
-            'IDCATEGORIA': to_str(pl['category'].get('id')) if pl.get('category') else None,
-            'CUSTOMFIELDS': json.dumps(custom_fields_list) if custom_fields_list else None
-        }
-        productlines.append(row)
+    productlines = schemas.PRODUCT_LINE.rows(productlines_raw)
 
     return {"brands": brands, "supercategories": supercategories, "productlines": productlines}
 
+@metrics.stage('skus')
+def iter_skus():
+    pages = _iter_paginated_data(f"{INVOLVES_BASE_URL}/v3/environments/{INVOLVES_ENVIRONMENT_ID}/skus", checkpoint='involves_produtos')
+    for page in pages:
+        yield _transform(schemas.SKU, page)
+
 def process_skus() -> list:
-    raw_data = _fetch_paginated_data(f"{INVOLVES_BASE_URL}/v3/environments/{INVOLVES_ENVIRONMENT_ID}/skus")
-    print("\n--- Processando dataset de Produtos para o formato final ---")
-    processed_data = []
-    to_str = lambda v: str(v) if v is not None else None
-    for sku in raw_data:
-        if not isinstance(sku, dict): continue
-        custom_fields_list = sku.get('customFields', [])
-        row = {
-            'IDSKU': to_str(sku.get('id')), 'NOMESKU': sku.get('name'),
-            'ISACTIVE': sku.get('active'), 'EAN': to_str(sku.get('barCode')),
-            'CODPROD': to_str(sku.get('integrationCode')),
-            'IDLINHAPRODUTO': to_str(sku['productLine'].get('id')) if sku.get('productLine') else None,
-            'IDMARCA': to_str(sku['brand'].get('id')) if sku.get('brand') else None,
-            'IDCATEGORIA': to_str(sku['category'].get('id')) if sku.get('category') else None,
-            'IDSUPERCATEGORIA': to_str(sku['supercategory'].get('id')) if sku.get('supercategory') else None,
-            'CUSTOMFIELDS': json.dumps(custom_fields_list) if custom_fields_list else None
-        }
-        processed_data.append(row)
+    processed_data = _flatten(iter_skus())
+    print("\n--- Dataset de Produtos processado para o formato final ---")
     return processed_data
 
-def process_categories_from_skus(all_skus: list) -> list:
+@metrics.stage('categories')
+def process_categories(category_ids: set) -> list:
     print("\n--- INICIANDO EXTRAÇÃO DE DIMENSÃO DE CATEGORias (VIA SKUS) ---")
-    if not all_skus:
+    if not category_ids:
         print("Nenhum SKU encontrado para extrair categorias.")
         return []
-    to_str = lambda v: str(v) if v is not None else None
-    category_ids = {sku.get('IDCATEGORIA') for sku in all_skus if sku.get('IDCATEGORIA')}
     
     url_template = f"{INVOLVES_BASE_URL}/v3/environments/{INVOLVES_ENVIRONMENT_ID}/categories/{{id}}"
-    category_details = _fetch_details_in_parallel(url_template, category_ids, "Categorias")
-
-    processed_data = []
-    for c in category_details:
-        if not isinstance(c, dict): continue
-        row = {
-            'IDCATEGORIA': to_str(c.get('id')), 
-            'NOMECATEGORIA': c.get('name'), 
-            'IDSUPERCATEGORIA': to_str(c['supercategory'].get('id')) if c.get('supercategory') else None
-        }
-        processed_data.append(row)
-    return processed_data
+    list_url = f"{INVOLVES_BASE_URL}/v3/environments/{INVOLVES_ENVIRONMENT_ID}/categories"
+    category_details = _resolve_dimension(category_ids, url_template, "Categorias", list_url, required_fields=('supercategory',))
+
+    return schemas.CATEGORY.rows(category_details)
+
+def process_categories_from_skus(all_skus: list) -> list:
+    return process_categories({sku.get('IDCATEGORIA') for sku in all_skus or [] if sku.get('IDCATEGORIA')})
+
+@metrics.stage('point_of_sales')
+def iter_point_of_sales():
+    pages = _iter_paginated_data(f"{INVOLVES_BASE_URL}/v3/environments/{INVOLVES_ENVIRONMENT_ID}/pointofsales", checkpoint='involves_pdv')
+    for page in pages:
+        yield _transform(schemas.POINT_OF_SALE, page)
 
 def process_point_of_sales() -> list:
-    raw_data = _fetch_paginated_data(f"{INVOLVES_BASE_URL}/v3/environments/{INVOLVES_ENVIRONMENT_ID}/pointofsales")
-    print("\n--- Processando dataset de Pontos de Venda para o formato final ---")
-    processed_data = []
-    to_str = lambda v: str(v) if v is not None else None
-    for pdv in raw_data:
-        if not isinstance(pdv, dict): continue
-        row = {
-            'IDPDV': to_str(pdv.get('id')),
-            'RAZAOSOCIAL': pdv.get('legalBusinessName'), 'FANTASIA': pdv.get('tradeName'),
-            'CODCLI': to_str(pdv.get('code')), 'CNPJ': pdv.get('companyRegistrationNumber'),
-            'ISACTIVE': pdv.get('active'),
-            'IDMACROREGIONAL': to_str(pdv['macroregional'].get('id')) if pdv.get('macroregional') else None,
-            'IDREGIONAL': to_str(pdv['regional'].get('id')) if pdv.get('regional') else None,
-            'IDBANNER': to_str(pdv['banner'].get('id')) if pdv.get('banner') else None,
-            'IDTIPOPDV': to_str(pdv['type'].get('id')) if pdv.get('type') else None,
-            'IDPERFILPDV': to_str(pdv['profile'].get('id')) if pdv.get('profile') else None,
-            'IDCANAL': to_str(pdv['channel'].get('id')) if pdv.get('channel') else None
-        }
-        processed_data.append(row)
+    processed_data = _flatten(iter_point_of_sales())
+    print("\n--- Dataset de Pontos de Venda processado para o formato final ---")
     return processed_data
 
-def process_pdv_dimensions(pdv_data: list):
+PDV_DIMENSION_ID_COLUMNS = ['IDMACROREGIONAL', 'IDREGIONAL', 'IDBANNER']
+
+@metrics.stage('pdv_dimensions')
+def process_pdv_dimensions_by_ids(pdv_dimension_ids: dict):
     print("\n--- INICIANDO EXTRAÇÃO DE DIMENSÕES DE PDV ---")
-    if not pdv_data:
+    if not pdv_dimension_ids or not any(pdv_dimension_ids.values()):
         print("Nenhum dado de PDV fornecido. Impossível extrair dimensões.")
         return {"macroregionals": [], "regionals": [], "chains": [], "banners": [], "pos_types": [], "pos_profiles": [], "channels": []}
     
-    to_str = lambda v: str(v) if v is not None else None
     print("\n- Extraindo dimensões a partir dos dados de PDVs...")
-    macroregional_ids = {d.get('IDMACROREGIONAL') for d in pdv_data if d.get('IDMACROREGIONAL')}
-    regional_ids = {d.get('IDREGIONAL') for d in pdv_data if d.get('IDREGIONAL')}
-    banner_ids = {d.get('IDBANNER') for d in pdv_data if d.get('IDBANNER')}
+    macroregional_ids = pdv_dimension_ids.get('IDMACROREGIONAL', set())
+    regional_ids = pdv_dimension_ids.get('IDREGIONAL', set())
+    banner_ids = pdv_dimension_ids.get('IDBANNER', set())
 
     macroregional_url = f"{INVOLVES_BASE_URL}/v3/environments/{INVOLVES_ENVIRONMENT_ID}/macroregionals/{{id}}"
-    macroregional_details = _fetch_details_in_parallel(macroregional_url, macroregional_ids, "Macrorregionais")
-    macroregionals = [{'IDMACROREGIONAL': to_str(m.get('id')), 'NOMEMACROREGIONAL': m.get('name')} for m in macroregional_details if m]
+    macroregional_details = _resolve_dimension(macroregional_ids, macroregional_url, "Macrorregionais", macroregional_url[:-len('/{id}')])
+    macroregionals = schemas.MACROREGIONAL.rows(macroregional_details)
     
     regional_url = f"{INVOLVES_BASE_URL}/v3/environments/{INVOLVES_ENVIRONMENT_ID}/regionals/{{id}}"
-    regional_details = _fetch_details_in_parallel(regional_url, regional_ids, "Regionais")
-    regionals = [{'IDREGIONAL': to_str(r.get('id')), 'NOMEREGIONAL': r.get('name'), 'IDMACROREGIONAL': to_str(r['macroregional'].get('id')) if r.get('macroregional') else None} for r in regional_details if r]
+    regional_details = _resolve_dimension(regional_ids, regional_url, "Regionais", regional_url[:-len('/{id}')], required_fields=('macroregional',))
+    regionals = schemas.REGIONAL.rows(regional_details)
 
     banner_url = f"{INVOLVES_BASE_URL}/v3/environments/{INVOLVES_ENVIRONMENT_ID}/banners/{{id}}"
-    banner_details = _fetch_details_in_parallel(banner_url, banner_ids, "Banners")
-    banners = [{'IDBANNER': to_str(b.get('id')), 'NOMEBANNER': b.get('name'), 'IDREDE': to_str(b['chain'].get('id')) if b.get('chain') else None} for b in banner_details if b]
+    banner_details = _resolve_dimension(banner_ids, banner_url, "Banners", banner_url[:-len('/{id}')], required_fields=('chain',))
+    banners = schemas.BANNER.rows(banner_details)
 
     chain_ids = {b.get('IDREDE') for b in banners if b.get('IDREDE')}
     chain_url = f"{INVOLVES_BASE_URL}/v3/chains/{{id}}"
-    chain_details = _fetch_details_in_parallel(chain_url, chain_ids, "Redes")
-    chains = [{'IDREDE': to_str(c.get('id')), 'NOMEREDE': c.get('name'), 'CODIGOREDE': c.get('code')} for c in chain_details if c]
+    chain_details = _resolve_dimension(chain_ids, chain_url, "Redes", chain_url[:-len('/{id}')], required_fields=('code',))
+    chains = schemas.CHAIN.rows(chain_details)
 
     print("\n- Extraindo outras dimensões de PDV (Canais, Tipos, Perfis)...")
     channels_raw = _fetch_paginated_data(f"{INVOLVES_BASE_URL}/v3/pointofsalechannels")
-    channels = [{'IDCANAL': to_str(i.get('id')), 'NOMECANAL': i.get('name')} for i in channels_raw]
+    channels = schemas.CHANNEL.rows(channels_raw)
     
     pos_types_raw = get_api_data(f"{INVOLVES_BASE_URL}/v1/pointofsaletype/find")
-    pos_types = [{'IDTIPOPDV': to_str(i.get('id')), 'NOMETIPOPDV': i.get('name')} for i in pos_types_raw if isinstance(i, dict)] if isinstance(pos_types_raw, list) else []
+    pos_types = schemas.POINT_OF_SALE_TYPE.rows(pos_types_raw) if isinstance(pos_types_raw, list) else []
 
     pos_profiles_raw = get_api_data(f"{INVOLVES_BASE_URL}/v1/{INVOLVES_ENVIRONMENT_ID}/pointofsaleprofile/find")
-    pos_profiles = [{'IDPERFILPDV': to_str(i.get('id')), 'NOMEPERFILPDV': i.get('name')} for i in pos_profiles_raw if isinstance(i, dict)] if isinstance(pos_profiles_raw, list) else []
+    pos_profiles = schemas.POINT_OF_SALE_PROFILE.rows(pos_profiles_raw) if isinstance(pos_profiles_raw, list) else []
 
     return {"macroregionals": macroregionals, "regionals": regionals, "banners": banners, "chains": chains, "pos_types": pos_types, "pos_profiles": pos_profiles, "channels": channels}
 
+def prefetch_shared_dimensions():
+    print("\n--- PRÉ-CARREGANDO DIMENSÕES COMPARTILHADAS ENTRE AMBIENTES ---")
+    chains = _fetch_paginated_data(f"{INVOLVES_BASE_URL}/v3/chains")
+    channels = _fetch_paginated_data(f"{INVOLVES_BASE_URL}/v3/pointofsalechannels")
+    pos_types = get_api_data(f"{INVOLVES_BASE_URL}/v1/pointofsaletype/find")
+    print(f"Redes: {len(chains)} | Canais: {len(channels)} | Tipos de PDV: {len(pos_types) if isinstance(pos_types, list) else 0}")
+
+def process_pdv_dimensions(pdv_data: list):
+    pdv_dimension_ids = {}
+    for _ in collect_ids([pdv_data or []], PDV_DIMENSION_ID_COLUMNS, pdv_dimension_ids):
+        pass
+    return process_pdv_dimensions_by_ids(pdv_dimension_ids)
+
+@metrics.stage('employees')
 def process_employees() -> list:
-    raw_data = _fetch_paginated_data(f"{INVOLVES_BASE_URL}/v1/{INVOLVES_ENVIRONMENT_ID}/employeeenvironment")
+    pages = _iter_paginated_data(f"{INVOLVES_BASE_URL}/v1/{INVOLVES_ENVIRONMENT_ID}/employeeenvironment")
+    if TRANSFORM_MODE == 'columnar':
+        processed_data = schemas.as_rows(schemas.EMPLOYEE.frame([emp for page in pages for emp in page]))
+    else:
+        processed_data = [row for page in pages for row in schemas.EMPLOYEE.rows(page)]
     
-    print("\n--- Formatando dataset de Colaboradores ---")
-    processed_data = []
-    to_str = lambda v: str(v) if v is not None else None
-    
-    for emp in raw_data:
-        if not isinstance(emp, dict): continue
-        address, city, state = emp.get('address'), None, None
-        if address: city = address.get('city')
-        if city: state = city.get('state')
-        
-        row = {
-            'IDCOLABORADOR': to_str(emp.get('id')), 'NOME': emp.get('name'), 'CARGO': emp.get('role'), 'LOGIN': emp.get('login'),
-            'EMAIL': emp.get('email'), 'TELEFONE': emp.get('workPhone'), 'RG': to_str(emp.get('nationalIdCard1')), 'CPF': to_str(emp.get('nationalIdCard2')),
-            'NOMEPAI': emp.get('fatherName'), 'NOMEMAE': emp.get('motherName'), 'ISACTIVE': emp.get('enabled'),
-            'IDGRUPOCOLABORADOR': to_str(emp['userGroup'].get('id')) if emp.get('userGroup') else None, 'NOMEGRUPOCOLABORADOR': emp['userGroup'].get('name') if emp.get('userGroup') else None,
-            'IDPERFILCOLABORADOR': to_str(emp['profile'].get('id')) if emp.get('profile') else None, 'NOMEPERFILCOLABORADOR': emp['profile'].get('name') if emp.get('profile') else None,
-            'IDSUPERVISOR': to_str(emp['employeeEnvironmentLeader'].get('id')) if emp.get('employeeEnvironmentLeader') else None,
-            'ENDERECO': address.get('address') if address else None, 'NUMERO': to_str(address.get('number')) if address else None,
-            'COMPLEMENTO': address.get('complement') if address else None, 'BAIRRO': address.get('neighborhood') if address else None,
-            'CEP': to_str(address.get('zipCode')) if address else None, 'CIDADE': city.get('name') if city else None,
-            'ESTADO': state.get('name') if state else None,
-        }
-        processed_data.append(row)
-
+    print("\n--- Dataset de Colaboradores formatado ---")
     if processed_data: 
         processed_data.sort(key=lambda x: int(x['IDCOLABORADOR']) if x.get('IDCOLABORADOR') and x['IDCOLABORADOR'].isdigit() else 0)
     return processed_data
 
+@metrics.stage('supervisors')
 def process_supervisors(all_employees: list) -> list:
     print("\n--- Criando dataset de Supervisores ---")
     if not all_employees: return []
-    to_str = lambda v: str(v) if v is not None else None
     
     supervisors_map = {}
     employee_map = {emp.get('IDCOLABORADOR'): emp.get('NOME') for emp in all_employees}
@@ -270,131 +532,224 @@ def process_supervisors(all_employees: list) -> list:
             leader_name = employee_map.get(supervisor_id, "Não encontrado")
             supervisors_map[supervisor_id] = leader_name
     
-    processed_data = [{'IDSUPERVISOR': to_str(id), 'NOMESUPERVISOR': name} for id, name in supervisors_map.items()]
+    processed_data = schemas.SUPERVISOR.rows({'id': id, 'name': name} for id, name in supervisors_map.items())
     if processed_data:
         processed_data.sort(key=lambda x: int(x['IDSUPERVISOR']) if x.get('IDSUPERVISOR') and x['IDSUPERVISOR'].isdigit() else 0)
     return processed_data
 
-def process_leaves() -> list:
-    raw_data = _fetch_paginated_data(f"{INVOLVES_BASE_URL}/v3/environments/{INVOLVES_ENVIRONMENT_ID}/leaves")
-    processed_data = []
-    to_str = lambda v: str(v) if v is not None else None
-    for leave in raw_data:
-        if not isinstance(leave, dict): continue
-        row = {
-            'IDAFASTAMENTO': to_str(leave.get('id')), 'DATAINICIO': leave.get('startDate'), 'DATAFIM': leave.get('endDate'),
-            'MOTIVO': leave.get('reason'), 'OBSERVACAO': leave.get('note'),
-            'IDCOLABORADOR': to_str(leave['employee'].get('id')) if leave.get('employee') else None,
-            'IDCOLABORADORREGISTRO': to_str(leave['registeredBy'].get('id')) if leave.get('registeredBy') else None,
-            'IDCOLABORADORSUBSTITUTO': to_str(leave['substitute'].get('id')) if leave.get('substitute') else None
-        }
-        processed_data.append(row)
-    return processed_data
+@metrics.stage('leaves')
+def iter_leaves():
+    pages = _iter_paginated_data(f"{INVOLVES_BASE_URL}/v3/environments/{INVOLVES_ENVIRONMENT_ID}/leaves")
+    for page in pages:
+        yield schemas.LEAVE.rows(page)
 
-def process_scheduled_visits(all_employees: list) -> list:
+def process_leaves() -> list:
+    return _flatten(iter_leaves())
+
+def _is_inactive(employee: dict) -> bool:
+    value = employee.get('ISACTIVE')
+    return value is False or str(value).lower() in ('false', '0')
+
+def _employees_to_query(all_employees: list, employee_ids_with_itinerary: set = None) -> list:
+    employees = [employee for employee in all_employees if employee.get('IDCOLABORADOR')]
+    if SCHEDULED_VISITS_SKIP_INACTIVE:
+        active = [employee for employee in employees if not _is_inactive(employee)]
+        print(f"  > {len(employees) - len(active)} colaborador(es) inativo(s) ignorado(s).")
+        employees = active
+    if employee_ids_with_itinerary is not None:
+        with_itinerary_ids = {str(employee_id) for employee_id in employee_ids_with_itinerary}
+        with_itinerary = [employee for employee in employees if str(employee['IDCOLABORADOR']) in with_itinerary_ids]
+        print(f"  > {len(employees) - len(with_itinerary)} colaborador(es) sem roteiro no período ignorado(s).")
+        employees = with_itinerary
+    return employees
+
+def _previous_visits(previous_rows, employee_ids: set, start_date: str):
+    if previous_rows is None or not len(previous_rows) or not employee_ids:
+        return None
+    in_range = (previous_rows['DATAVISITA'].astype('string').str[:10] >= start_date).fillna(False)
+    kept = previous_rows[(previous_rows['IDCOLABORADOR'].astype(str).isin(employee_ids) & in_range).values]
+    return kept.reset_index(drop=True) if len(kept) else None
+
+@metrics.stage('scheduled_visits')
+def iter_scheduled_visits(all_employees: list, employee_ids_with_itinerary: set = None, previous_rows=None):
     print("\n--- INICIANDO EXTRAÇÃO DE VISITAS AGENDADAS (POR COLABORADOR) ---")
     if not all_employees:
         print("Nenhum colaborador encontrado para buscar visitas.")
-        return []
+        return
 
-    all_visits = []
-    to_str = lambda v: str(v) if v is not None else None
+    total_visits = 0
     start_date, end_date = f"{datetime.now().year}-01-01", f"{datetime.now().year + 1}-12-31"
     print(f"Buscando visitas agendadas no período de {start_date} a {end_date}")
 
-    for i, employee in enumerate(all_employees):
-        employee_id = employee.get('IDCOLABORADOR')
-        if not employee_id: continue
-        
-        print(f"\rBuscando visitas para o colaborador {i + 1}/{len(all_employees)} (ID: {employee_id})", end="", flush=True)
-        base_url = f"{INVOLVES_BASE_URL}/v3/environments/{INVOLVES_ENVIRONMENT_ID}/employees/{employee_id}/scheduledvisits?startDate={start_date}&endDate={end_date}"
-        visits_for_employee = _fetch_paginated_data(base_url)
-
-        for visit in visits_for_employee:
-            if not isinstance(visit, dict): continue
-            row = {
-                'IDCOLABORADOR': to_str(employee_id), 'IDPDV': to_str(visit['pointOfSale'].get('id')) if visit.get('pointOfSale') else None,
-                'DATAVISITA': visit.get('visitDate'), 'INICIOESPERADO': visit.get('expectedStart'),
-                'FIMESPERADO': visit.get('expectedEnd'), 'FOIVISITADO': visit.get('visited')
-            }
-            all_visits.append(row)
+    employees = _employees_to_query(all_employees, employee_ids_with_itinerary)
+    skipped = {str(employee['IDCOLABORADOR']) for employee in all_employees if employee.get('IDCOLABORADOR')}
+    skipped -= {str(employee['IDCOLABORADOR']) for employee in employees}
+    kept = _previous_visits(previous_rows, skipped, start_date)
+    if kept is not None:
+        print(f"  > {len(kept)} visita(s) de colaboradores não consultados mantida(s) do dataset anterior.")
+        total_visits += len(kept)
+        yield kept
+    print(f"Consultando visitas de {len(employees)} colaborador(es) em paralelo.")
+    base_urls = {
+        employee['IDCOLABORADOR']: f"{INVOLVES_BASE_URL}/v3/environments/{INVOLVES_ENVIRONMENT_ID}/employees/{employee['IDCOLABORADOR']}/scheduledvisits?startDate={start_date}&endDate={end_date}"
+        for employee in employees
+    }
+    for employee_id, page in _iter_paginated_many(base_urls, 'scheduledvisits', checkpoint='involves_visitas_agendadas',
+                                                  projection=schemas.SCHEDULED_VISIT.projection):
+        rows = schemas.SCHEDULED_VISIT.rows(page, {'employee_id': employee_id})
+        total_visits += len(rows)
+        yield rows
     
-    print(f"\nExtração de visitas agendadas concluída. Total de {len(all_visits)} visitas encontradas.")
-    return all_visits
+    print(f"Extração de visitas agendadas concluída. Total de {total_visits} visitas encontradas.")
 
-def process_surveys_and_answers(existing_survey_ids: set):
-    print("\n--- INICIANDO EXTRAÇÃO INCREMENTAL DE PESQUISAS E RESPOSTAS ---")
-    
+def process_scheduled_visits(all_employees: list, employee_ids_with_itinerary: set = None, previous_rows=None) -> list:
+    return _flatten(iter_scheduled_visits(all_employees, employee_ids_with_itinerary, previous_rows))
+
+def _survey_rows(survey: dict):
+    survey_row = schemas.SURVEY.build(survey)
+    answer_rows = schemas.ANSWER.rows(survey.get('answers') or [], {'survey_id': survey.get('id')})
+    return survey_row, answer_rows, survey_row['IDFORMULARIO']
+
+def _survey_changed_at(summary: dict) -> str:
+    return max((str(summary[field]) for field in ('responseDate', 'updatedAt') if summary.get(field)), default='')
+
+def _survey_fingerprint(summary: dict) -> str:
+    values = json.dumps([summary.get(field) for field in SURVEY_FINGERPRINT_FIELDS], default=str)
+    return hashlib.sha1(values.encode('utf-8')).hexdigest()[:16]
+
+def _iter_survey_summaries(since: str = None):
     surveys_url = f"{INVOLVES_BASE_URL}/v3/environments/{INVOLVES_ENVIRONMENT_ID}/surveys"
-    survey_summaries = get_api_data(surveys_url)
-    if not survey_summaries or not isinstance(survey_summaries, list):
+    if since and SURVEYS_SINCE_PARAM:
+        surveys_url = f"{surveys_url}?{SURVEYS_SINCE_PARAM}={since}"
+    seen = set()
+    for page in _iter_paginated_data(surveys_url):
+        fresh = [summary for summary in page if isinstance(summary, dict) and summary.get('id') is not None and to_str(summary['id']) not in seen]
+        if not fresh:
+            break
+        seen.update(to_str(summary['id']) for summary in fresh)
+        yield from fresh
+
+@metrics.stage('surveys_and_answers')
+def iter_surveys_and_answers(new_form_ids: set, pending_state: dict, existing_survey_ids: set = None):
+    print("\n--- INICIANDO EXTRAÇÃO INCREMENTAL DE PESQUISAS E RESPOSTAS ---")
+
+    has_previous = bool(existing_survey_ids) if existing_survey_ids is not None else key_index.is_indexed(SURVEYS_DATASET)
+    watermark = watermarks.get_watermark(SURVEYS_DATASET) if has_previous else None
+    since = None
+    if watermark and SURVEYS_SINCE_PARAM:
+        since = (datetime.strptime(watermark[:10], '%Y-%m-%d') - timedelta(days=SURVEYS_WATERMARK_OVERLAP_DAYS)).strftime('%Y-%m-%d')
+        print(f"Listando pesquisas respondidas ou alteradas desde {since} (marca d'água: {watermark}).")
+
+    fingerprints, latest = {}, ''
+    for summary in _iter_survey_summaries(since):
+        fingerprints[to_str(summary['id'])] = _survey_fingerprint(summary)
+        latest = max(latest, _survey_changed_at(summary))
+    if not fingerprints:
         print("Nenhuma pesquisa encontrada ou formato de resposta inesperado.")
-        return {"new_surveys": [], "new_answers": [], "new_form_ids": set()}
-    
-    to_str = lambda v: str(v) if v is not None else None
-    all_survey_ids = {to_str(s['id']) for s in survey_summaries if s.get('id')}
-    new_survey_ids = all_survey_ids - existing_survey_ids
-    if not new_survey_ids:
-        print("Nenhuma pesquisa nova para processar.")
-        return {"new_surveys": [], "new_answers": [], "new_form_ids": set()}
-
-    print(f"\n--- Processando detalhes de {len(new_survey_ids)} novas pesquisas (utilizando threads) ---")
+        return
+
+    if existing_survey_ids is None:
+        new_survey_ids = key_index.missing_keys(SURVEYS_DATASET, set(fingerprints))
+    else:
+        new_survey_ids = set(fingerprints) - {to_str(survey_id) for survey_id in existing_survey_ids}
+    previous_fingerprints = row_hashes.load_hashes(SURVEY_FINGERPRINTS)
+    changed_survey_ids = {
+        survey_id for survey_id, fingerprint in fingerprints.items()
+        if survey_id not in new_survey_ids and previous_fingerprints.get(survey_id) not in (None, fingerprint)
+    }
+    to_fetch = new_survey_ids | changed_survey_ids
+    fetched = set()
+
+    if to_fetch:
+        print(f"\n--- Processando detalhes de {len(new_survey_ids)} novas pesquisas e {len(changed_survey_ids)} alteradas (requisições assíncronas) ---")
+    else:
+        print("Nenhuma pesquisa nova ou alterada para processar.")
     detail_url_template = f"{INVOLVES_BASE_URL}/v3/environments/{INVOLVES_ENVIRONMENT_ID}/surveys/{{id}}"
-    survey_details = _fetch_details_in_parallel(detail_url_template, new_survey_ids, "Pesquisas")
-
-    processed_surveys, processed_answers, new_form_ids = [], [], set()
-    for survey in survey_details:
-        if not isinstance(survey, dict): continue
-        survey_id, form = survey.get('id'), survey.get('form')
-        form_id = form.get('id') if form else None
-        if form_id: new_form_ids.add(to_str(form_id))
-        survey_row = {
-            'IDPESQUISA': to_str(survey_id), 'LABEL': survey.get('label'), 'STATUS': survey.get('status'), 'DATAFIM': survey.get('expirationDate'),
-            'DATARESPOSTA': survey.get('responseDate'), 'IDPROJETO': to_str(survey.get('projectId')), 'IDPDV': to_str(survey.get('pointOfSaleId')),
-            'IDCOLABORADOR': to_str(survey.get('ownerId')), 'IDFORMULARIO': to_str(form_id)
-        }
-        processed_surveys.append(survey_row)
-        for answer in survey.get('answers', []):
-            if not isinstance(answer, dict): continue
-            question, item = answer.get('question'), answer.get('item')
-            answer_row = {
-                'IDRESPOSTA': to_str(answer.get('id')), 'IDPESQUISA': to_str(survey_id), 'VALOR': answer.get('value'), 'PONTUACAO': answer.get('score'),
-                'IDPERGUNTA': to_str(question.get('id')) if question else None, 'TIPOPERGUNTA': question.get('type') if question else None,
-                'IDITEM': to_str(item.get('id')) if item else None
-            }
-            processed_answers.append(answer_row)
+    for survey_details in _iter_details_in_parallel(detail_url_template, to_fetch, "Pesquisas", checkpoint=SURVEYS_DATASET,
+                                                    projection=schemas.SURVEY_DETAIL):
+        fetched.update(to_str(survey.get('id')) for survey in survey_details if isinstance(survey, dict))
+        if TRANSFORM_MODE == 'columnar':
+            surveys = schemas.SURVEY.frame(survey_details)
+            new_form_ids.update(form_id for form_id in surveys['IDFORMULARIO'].dropna() if form_id)
+            yield surveys, schemas.ANSWER.explode(survey_details, 'answers', 'survey_id')
+            continue
+        processed_surveys, processed_answers = [], []
+        for survey in survey_details:
+            if not isinstance(survey, dict): continue
+            survey_row, answer_rows, form_id = _survey_rows(survey)
+            if form_id: new_form_ids.add(form_id)
+            processed_surveys.append(survey_row)
+            processed_answers.extend(answer_rows)
+        yield processed_surveys, processed_answers
+
+    pending_state['fingerprints'] = {
+        survey_id: fingerprint for survey_id, fingerprint in fingerprints.items() if survey_id in fetched or survey_id not in to_fetch
+    }
+    failed = to_fetch - fetched
+    if failed:
+        print(f"  > {len(failed)} pesquisa(s) não puderam ser detalhadas; a marca d'água não será avançada.")
+    elif latest and latest > (watermark or ''):
+        pending_state['watermark'] = latest
+
+def commit_survey_state(pending_state: dict):
+    if pending_state.get('fingerprints'):
+        row_hashes.update_hashes(SURVEY_FINGERPRINTS, pending_state['fingerprints'])
+    if pending_state.get('watermark'):
+        watermarks.set_watermark(SURVEYS_DATASET, pending_state['watermark'])
+
+def process_surveys_and_answers(existing_survey_ids: set = None):
+    processed_surveys, processed_answers, new_form_ids, pending_state = [], [], set(), {}
+    for survey_rows, answer_rows in iter_surveys_and_answers(new_form_ids, pending_state, existing_survey_ids):
+        processed_surveys.extend(schemas.as_rows(survey_rows))
+        processed_answers.extend(schemas.as_rows(answer_rows))
+    commit_survey_state(pending_state)
     return {"new_surveys": processed_surveys, "new_answers": processed_answers, "new_form_ids": new_form_ids}
 
+@metrics.stage('forms_and_fields')
 def process_forms_and_fields(form_ids: set):
     print("\n--- INICIANDO EXTRAÇÃO DE FORMULÁRIOS E CAMPOS ---")
+    form_ids = key_index.missing_keys('involves_formularios', form_ids or set())
     if not form_ids:
         print("Nenhum novo ID de formulário para buscar.")
         return {"forms": [], "form_fields": []}
     
     url_template = f"{INVOLVES_BASE_URL}/v1/{INVOLVES_ENVIRONMENT_ID}/form/{{id}}"
-    form_details = _fetch_details_in_parallel(url_template, form_ids, "Formulários")
+    form_details = _fetch_details_in_parallel(url_template, form_ids, "Formulários", projection=schemas.FORM_DETAIL)
+    if TRANSFORM_MODE == 'columnar':
+        return {
+            "forms": schemas.as_rows(schemas.FORM.frame(form_details)),
+            "form_fields": schemas.as_rows(schemas.FORM_FIELD.explode(form_details, 'formFields', 'form_id'))
+        }
     processed_forms, processed_fields = [], []
-    to_str = lambda v: str(v) if v is not None else None
     for form in form_details:
         if not isinstance(form, dict): continue
-        form_id = form.get('id')
-        form_row = {'IDFORMULARIO': to_str(form_id), 'NOME': form.get('name'), 'DESCRICAO': form.get('description'), 'PROPOSITO': form.get('formPurpose'), 'ISACTIVE': form.get('active')}
-        processed_forms.append(form_row)
-        for field in form.get('formFields', []):
-            if not isinstance(field, dict): continue
-            info = field.get('information')
-            field_row = {
-                'IDCAMPO': to_str(field.get('id')), 'IDFORMULARIO': to_str(form_id), 'LABEL': info.get('label') if info else None,
-                'TIPO': info.get('informationType') if info else None, 'ORDEM': field.get('order'), 'OBRIGATORIO': field.get('required'),
-                'OCULTO': field.get('hidden'), 'SISTEMA': field.get('system')
-            }
-            processed_fields.append(field_row)
+        processed_forms.append(schemas.FORM.build(form))
+        processed_fields.extend(schemas.FORM_FIELD.rows(form.get('formFields') or [], {'form_id': form.get('id')}))
     return {"forms": processed_forms, "form_fields": processed_fields}
 
-def process_itineraries_and_noshows():
+def _finalized_days(date_range: list, previous_rows) -> dict:
+    today = datetime.now().date()
+    rows_by_day = {}
+    if previous_rows is not None and len(previous_rows) and 'DATAROTEIRO' in previous_rows.columns:
+        days = previous_rows['DATAROTEIRO'].astype('string').str[:10].fillna('None')
+        rows_by_day = dict(tuple(previous_rows.groupby(days.values, sort=False)))
+
+    finalized = {}
+    for day, (fetched_at, row_count) in watermarks.day_watermarks(ITINERARIES_DATASET).items():
+        date = datetime.strptime(day, '%Y-%m-%d').date()
+        if date not in date_range or date >= today:
+            continue
+        if datetime.fromtimestamp(fetched_at).date() <= date:
+            continue
+        if len(rows_by_day.get(day, ())) != row_count:
+            continue
+        finalized[day] = rows_by_day.get(day)
+    return finalized
+
+@metrics.stage('itineraries')
+def iter_itineraries(visit_ids: set, previous_rows=None):
     print("\n--- INICIANDO EXTRAÇÃO DE ROTEIROS E JUSTIFICATIVAS DE FALTA ---")
     
-    all_itineraries_raw = []
     today = datetime.now().date()
     start_date = today - timedelta(days=today.weekday())
     end_date = today + timedelta(days=90)
@@ -402,52 +757,117 @@ def process_itineraries_and_noshows():
     date_range = [start_date + timedelta(days=x) for x in range((end_date - start_date).days + 1)]
     print(f"Buscando roteiros de {start_date.strftime('%Y-%m-%d')} a {end_date.strftime('%Y-%m-%d')}")
 
+    finalized = _finalized_days(date_range, previous_rows)
+    if finalized:
+        print(f"  > {len(finalized)} dia(s) passado(s) já finalizado(s) reaproveitado(s) do dataset anterior.")
+
     total_itineraries_found = 0
-    for i, date in enumerate(date_range):
-        print(f"\r  > Processando data: {date.strftime('%Y-%m-%d')} ({i + 1}/{len(date_range)})", end="", flush=True)
-        url = f"{INVOLVES_BASE_URL}/v2/environments/{INVOLVES_ENVIRONMENT_ID}/itinerary?date={date.strftime('%Y-%m-%d')}&ignoreInactive=true"
-        daily_itineraries = _fetch_paginated_data(url)
-        if daily_itineraries:
-            total_itineraries_found += len(daily_itineraries)
-            all_itineraries_raw.extend(daily_itineraries)
-    
-    print(f"\nExtração de roteiros finalizada. Total de {total_itineraries_found} visitas encontradas.")
-    if not all_itineraries_raw:
-        return {"itineraries": [], "noshows": []}
+    for day in sorted(finalized):
+        rows = finalized[day]
+        if rows is None or not len(rows):
+            continue
+        visit_ids.update(visit_id for visit_id in rows['IDROTEIROVISITA'].dropna() if visit_id)
+        total_itineraries_found += len(rows)
+        yield rows.reset_index(drop=True)
+
+    base_urls = {
+        date.strftime('%Y-%m-%d'): f"{INVOLVES_BASE_URL}/v2/environments/{INVOLVES_ENVIRONMENT_ID}/itinerary?date={date.strftime('%Y-%m-%d')}&ignoreInactive=true"
+        for date in date_range if date.strftime('%Y-%m-%d') not in finalized
+    }
+    row_counts = dict.fromkeys(base_urls, 0)
+    failed_days = set()
+    fetched_at = time.time()
+    for day, page in _iter_paginated_many(base_urls, 'itinerary', failed_keys=failed_days, checkpoint=ITINERARIES_DATASET,
+                                          projection=schemas.ITINERARY.projection):
+        visit_ids.update(item['itineraryId'] for item in page if item.get('itineraryId'))
+        rows = schemas.ITINERARY.rows(page, {'date': day})
+        row_counts[day] += len(rows)
+        total_itineraries_found += len(rows)
+        yield rows
+
+    watermarks.set_day_watermarks(ITINERARIES_DATASET, {day: count for day, count in row_counts.items() if day not in failed_days}, fetched_at)
+    watermarks.prune_day_watermarks(ITINERARIES_DATASET, start_date.strftime('%Y-%m-%d'))
+    print(f"Extração de roteiros finalizada. Total de {total_itineraries_found} visitas encontradas.")
+
+def _noshows_to_query(visit_ids: set, visit_dates: dict) -> list:
+    known = noshow_state.all_statuses()
+    today = datetime.now().date()
+    recheck_from = (today - timedelta(days=NOSHOW_RECHECK_DAYS)).strftime('%Y-%m-%d')
+    recheck_until = today.strftime('%Y-%m-%d')
+    to_query, resolved = [], {}
+    for visit_id in {str(visit_id) for visit_id in visit_ids if visit_id}:
+        entry = known.get(visit_id)
+        if entry is None:
+            to_query.append(visit_id)
+            continue
+        visit_date, justification_id, status = entry
+        if justification_id is None:
+            visit_date = visit_dates.get(visit_id) or visit_date
+            if not visit_date or recheck_from <= visit_date[:10] <= recheck_until:
+                to_query.append(visit_id)
+        elif str(status).upper() in NOSHOW_OPEN_STATUSES:
+            to_query.append(visit_id)
+        else:
+            resolved[justification_id] = visit_id
+    to_query.extend(resolved[justification_id] for justification_id in key_index.missing_keys(NOSHOWS_DATASET, resolved))
+    return to_query
+
+@metrics.stage('noshows')
+def iter_noshows(visit_ids: set, visit_dates: dict = None):
+    if not visit_ids:
+        return
+    visit_dates = visit_dates or {}
+    to_query = _noshows_to_query(visit_ids, visit_dates)
+    print(f"\n--- Buscando detalhes de 'No Show' para {len(to_query)} de {len(visit_ids)} visitas únicas (demais resolvidas ou fora da janela de reverificação) ---")
+    noshow_url_template = f"{INVOLVES_BASE_URL}/v3/environments/{INVOLVES_ENVIRONMENT_ID}/visits/{{id}}/noshow"
 
-    processed_itineraries, visit_ids = [], set()
-    to_str = lambda v: str(v) if v is not None else None
-    for item in all_itineraries_raw:
-        if not isinstance(item, dict): continue
-        visit_id = item.get('itineraryId')
-        if visit_id: visit_ids.add(visit_id)
-        
-        row = {
-            'IDROTEIROVISITA': to_str(visit_id), 
-            'IDCOLABORADOR': to_str(item.get('employeeId')), 
-            'NOMECOLABORADOR': item.get('employeeName'), 
-            'IDPDV': to_str(item.get('pointOfSaleId')), 
-            'NOMEPDV': item.get('pointOfSaleName'), 
-            'CNPJPDV': item.get('pointOfSaleTaxPayerCode'), 
-            'ORDEMVISITA': item.get('visitOrder')
-        }
-        processed_itineraries.append(row)
+    statuses, completed = [], 0
+
+    def noshow_rows(results: list) -> list:
+        rows = []
+        for visit_id, result in results:
+            visit_date = visit_dates.get(visit_id)
+            if result is _NOT_FOUND:
+                statuses.append((visit_id, visit_date, None, None))
+            elif isinstance(result, dict):
+                row = schemas.NOSHOW.build(result, {'visit_id': visit_id})
+                statuses.append((visit_id, visit_date, row['IDJUSTIFICATIVA'], row['STATUS']))
+                rows.append(row)
+        return rows
+
+    resumed = checkpoints.completed_keys(NOSHOWS_DATASET) & set(to_query)
+    if resumed:
+        print(f"  > {len(resumed)} consulta(s) de 'No Show' retomadas do checkpoint.")
+        rows = noshow_rows(
+            (visit_id, _NOT_FOUND if result is None else result)
+            for visit_id, result in checkpoints.iter_payloads(NOSHOWS_DATASET) if visit_id in resumed
+        )
+        if rows:
+            yield rows
+        to_query = [visit_id for visit_id in to_query if visit_id not in resumed]
+
+    for batch_start in range(0, len(to_query), DETAIL_BATCH_SIZE):
+        batch_ids = to_query[batch_start:batch_start + DETAIL_BATCH_SIZE]
+        url_to_id = {noshow_url_template.format(id=visit_id): visit_id for visit_id in batch_ids}
+        results = fetch_all(list(url_to_id), suppress_404=True, not_found=_NOT_FOUND, transform=_detail_projector(schemas.NOSHOW.projection))
+        batch_results = [(url_to_id[url], result) for url, result in zip(url_to_id, results)]
+        checkpoints.save_payloads(NOSHOWS_DATASET, {
+            visit_id: None if result is _NOT_FOUND else result
+            for visit_id, result in batch_results if result is _NOT_FOUND or isinstance(result, dict)
+        })
+        rows = noshow_rows(batch_results)
+        completed += len(batch_ids)
+        print(f"\r  > Detalhes de 'Justificativas de Falta' processados: {completed}/{len(to_query)}", end="", flush=True)
+        if rows:
+            yield rows
+
+    noshow_state.record_statuses(statuses)
+    print(f"\nStatus de no-show registrado para {len(statuses)} visitas.")
 
-    print(f"\n--- Buscando detalhes de 'No Show' para {len(visit_ids)} visitas únicas ---")
-    noshow_url_template = f"{INVOLVES_BASE_URL}/v3/environments/{INVOLVES_ENVIRONMENT_ID}/visits/{{id}}/noshow"
-    noshow_details = _fetch_details_in_parallel(noshow_url_template, visit_ids, "Justificativas de Falta", attach_id_field_name='IDROTEIROVISITA', suppress_404=True)
-
-    processed_noshows = []
-    for item in noshow_details:
-        if not isinstance(item, dict): continue
-        row = {
-            'IDJUSTIFICATIVA': to_str(item.get('id')),
-            'IDROTEIROVISITA': to_str(item.get('IDROTEIROVISITA')),
-            'IDMOTIVO': to_str(item.get('excuseId')),
-            'DATA': item.get('date'), 'MOTIVO': item.get('excuse'),
-            'OBSERVACAO': item.get('note'), 'STATUS': item.get('status'),
-            'IDCOLABORADOR': to_str(item['employee'].get('id')) if item.get('employee') else None
-        }
-        processed_noshows.append(row)
-        
-    return {"itineraries": processed_itineraries, "noshows": processed_noshows}
\ No newline at end of file
+def process_itineraries_and_noshows():
+    visit_ids = set()
+    processed_itineraries = _flatten(iter_itineraries(visit_ids))
+    if not processed_itineraries:
+        return {"itineraries": [], "noshows": []}
+    processed_noshows = _flatten(iter_noshows(visit_ids))
+    return {"itineraries": processed_itineraries, "noshows": processed_noshows}
@@ -0,0 +1,90 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import OUTPUT_DIR, ENVIRONMENTS, ENVIRONMENTS_FILE, BIGQUERY_DATASET
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+
+SCOPED_FILES = ('INVOLVES_STATE_PATH', 'INVOLVES_CACHE_PATH')
+SCOPED_DIRS = ('INVOLVES_METRICS_DIR', 'INVOLVES_BIGQUERY_LOCAL_DIR')
+
+_print_lock = threading.Lock()
+
+def load_environments(ids: list = None) -> list:
+    if ids:
+        return [{'id': environment_id} for environment_id in ids]
+    if ENVIRONMENTS_FILE:
+        with open(ENVIRONMENTS_FILE, encoding='utf-8') as environments_file:
+            environments = json.load(environments_file)
+        if not isinstance(environments, list) or not all(isinstance(environment, dict) and environment.get('id') for environment in environments):
+            raise ValueError(f"'{ENVIRONMENTS_FILE}' deve conter uma lista de ambientes, cada um com o campo 'id'.")
+        return environments
+    return [{'id': environment_id} for environment_id in ENVIRONMENTS]
+
+def environment_name(environment: dict) -> str:
+    return str(environment.get('name') or f"ambiente_{environment['id']}")
+
+def environment_env(environment: dict, shared_cache_path: str) -> dict:
+    name = environment_name(environment)
+    env = {
+        **{variable: value for variable, value in os.environ.items() if variable not in ('INVOLVES_ENVIRONMENTS', 'INVOLVES_ENVIRONMENTS_FILE')},
+        'INVOLVES_ENVIRONMENT_ID': str(environment['id']),
+        'INVOLVES_OUTPUT_DIR': os.path.join(OUTPUT_DIR, name),
+        'INVOLVES_SHARED_CACHE_PATH': shared_cache_path,
+        'PYTHONUNBUFFERED': '1',
+    }
+    for key, variable in (('username', 'INVOLVES_USERNAME'), ('password', 'INVOLVES_PASSWORD'),
+                          ('base_url', 'INVOLVES_BASE_URL'), ('rate_limit_rps', 'INVOLVES_RATE_LIMIT_RPS')):
+        if environment.get(key) is not None:
+            env[variable] = str(environment[key])
+    for variable in SCOPED_FILES:
+        if os.environ.get(variable):
+            directory, filename = os.path.split(os.environ[variable])
+            env[variable] = os.path.join(directory, name, filename)
+    for variable in SCOPED_DIRS:
+        if os.environ.get(variable):
+            env[variable] = os.path.join(os.environ[variable], name)
+    if BIGQUERY_DATASET:
+        env['INVOLVES_BIGQUERY_DATASET'] = f"{BIGQUERY_DATASET}_{name}"
+    env.update({variable: str(value) for variable, value in (environment.get('env') or {}).items()})
+    return env
+
+def _run_worker(name: str, args: list, env: dict) -> int:
+    process = subprocess.Popen([sys.executable, MAIN, *args], env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               text=True, encoding='utf-8', errors='replace')
+    for line in process.stdout:
+        with _print_lock:
+            print(f"[{name}] {line.rstrip()}", flush=True)
+    return process.wait()
+
+def run_environments(environments: list, etl_args: list, max_parallel: int) -> dict:
+    shared_dir = os.path.join(OUTPUT_DIR, '.shared')
+    os.makedirs(shared_dir, exist_ok=True)
+    shared_cache_path = os.path.join(shared_dir, 'global_cache.sqlite')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(shared_cache_path + suffix):
+            os.remove(shared_cache_path + suffix)
+
+    names = [environment_name(environment) for environment in environments]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Nomes de ambiente repetidos: {', '.join(sorted({name for name in names if names.count(name) > 1}))}.")
+    print(f"--- EXTRAÇÃO DE {len(environments)} AMBIENTE(S) EM PARALELO: {', '.join(names)} ---")
+
+    if _run_worker('compartilhado', ['--prefetch-shared'], environment_env(environments[0], shared_cache_path)) != 0:
+        print("Não foi possível pré-carregar as dimensões compartilhadas; cada ambiente buscará as suas.")
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(environments)))) as executor:
+        futures = {
+            name: executor.submit(_run_worker, name, etl_args, environment_env(environment, shared_cache_path))
+            for name, environment in zip(names, environments)
+        }
+        results = {name: future.result() for name, future in futures.items()}
+
+    print("\n--- RESUMO POR AMBIENTE ---")
+    for name, returncode in results.items():
+        status = "concluído" if returncode == 0 else f"falhou (código {returncode})"
+        print(f"  > {name}: {status} | saída em '{os.path.join(OUTPUT_DIR, name)}'")
+    return results
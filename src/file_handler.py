@@ -1,51 +1,738 @@
 import pandas as pd
+import json
 import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from functools import partial
+import key_index
+import row_hashes
+import metrics
+import writer_pool
+from schemas import DATASET_SPECS, dataset_dtypes, typed_frame, as_rows
+from config import (
+    OUTPUT_DIR, OUTPUT_FORMAT, PARQUET_COMPRESSION, PARQUET_PARTITION_BY_DATE, INCREMENTAL_STORAGE, COMPACTION_MAX_SEGMENTS, STREAM_BATCH_SIZE,
+    CHANGE_DETECTION, DELTA_RETENTION, WRITER_MAX_PENDING
+)
 
-def read_excel_column_as_set(filename: str, column_name: str) -> set:
-    filepath = os.path.join('dataset', f"{filename}.xlsx")
-    if not os.path.exists(filepath):
-        return set()
+DATE_PARTITION_COLUMNS = {
+    'involves_visitas_agendadas': 'DATAVISITA',
+    'involves_afastamentos': 'DATAINICIO',
+    'involves_pesquisas': 'DATARESPOSTA',
+    'involves_justificativas_falta': 'DATA',
+    'involves_roteiros': 'DATAROTEIRO',
+}
+PARTITION_COLUMN = 'DATAPARTICAO'
+SEGMENTS_SUFFIX = '.segments'
+DELTA_SUFFIX = '.delta'
+PRUNED_MARKER = '.pruned'
+
+CHANGE_TRACKED_DATASETS = {
+    'involves_marcas', 'involves_supercategorias', 'involves_linhas_de_produto', 'involves_categorias', 'involves_produtos',
+    'involves_pdv', 'involves_macroregionais', 'involves_regionais', 'involves_redes', 'involves_banners',
+    'involves_tipos_pdv', 'involves_perfis_pdv', 'involves_canais', 'involves_colaboradores', 'involves_supervisores',
+    'involves_afastamentos',
+}
+HASH_COLUMN = 'HASHLINHA'
+OPERATION_COLUMN = 'OPERACAO'
+
+BOOLEAN_COLUMNS = {'ISACTIVE', 'ISAPPROVED', 'FOIVISITADO', 'OBRIGATORIO', 'OCULTO', 'SISTEMA'}
+ARROW_TYPES = {'id': 'string', 'str': 'string', 'json': 'string', 'raw': 'string', 'bool': 'bool_', 'int': 'int64', 'float': 'float64'}
+
+def _with_partition_column(df: pd.DataFrame, partition_column: str) -> pd.DataFrame:
+    return df.assign(**{PARTITION_COLUMN: df[partition_column].astype('string').str[:10].fillna('sem_data')})
+
+class _ExcelStream:
+    def __init__(self, filepath: str):
+        from openpyxl import Workbook
+        self.filepath = filepath
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet('Sheet1')
+        self.columns = None
+
+    def write(self, df: pd.DataFrame):
+        if self.columns is None:
+            self.columns = list(df.columns)
+            self.sheet.append(self.columns)
+        else:
+            df = df.reindex(columns=self.columns)
+        for row in df.itertuples(index=False, name=None):
+            self.sheet.append([None if pd.isna(value) else value for value in row])
+
+    def close(self):
+        self.workbook.save(self.filepath)
+
+def _as_text(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def _text_column(values: pd.Series) -> pd.Series:
+    if values.dtype == object or pd.api.types.is_float_dtype(values.dtype):
+        return values.map(_as_text, na_action='ignore').astype('string')
+    return values.astype('string')
+
+class _ParquetStream:
+    def __init__(self, filepath: str, compression: str, partition_column: str = None, spec=None):
+        self.filepath = filepath
+        self.compression = compression
+        self.partition_column = partition_column
+        self.kinds = {field.column: field.kind for field in spec.fields} if spec else {}
+        self.schema = None
+        self._writer = None
+        self._chunk_number = 0
+
+    def _build_schema(self, df: pd.DataFrame):
+        import pyarrow as pa
+        undeclared = [column for column in df.columns if column not in self.kinds]
+        inferred = pa.Table.from_pandas(df[undeclared], preserve_index=False).schema if undeclared else None
+        fields = []
+        for column in df.columns:
+            if column in self.kinds:
+                fields.append(pa.field(column, getattr(pa, ARROW_TYPES[self.kinds[column]])()))
+                continue
+            field = inferred.field(column)
+            if pa.types.is_null(field.type):
+                field = field.with_type(pa.string())
+            elif pa.types.is_integer(field.type):
+                field = field.with_type(pa.float64())
+            fields.append(field)
+        return pa.schema(fields)
+
+    def _align(self, df: pd.DataFrame) -> pd.DataFrame:
+        import pyarrow as pa
+        df = df.reindex(columns=self.schema.names)
+        for field in self.schema:
+            column = df[field.name]
+            try:
+                if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+                    if column.dtype == object or not pd.api.types.is_string_dtype(column):
+                        df[field.name] = _text_column(column)
+                elif pa.types.is_boolean(field.type):
+                    if not pd.api.types.is_bool_dtype(column):
+                        df[field.name] = column.astype('boolean')
+                elif pa.types.is_integer(field.type):
+                    if not pd.api.types.is_integer_dtype(column):
+                        df[field.name] = pd.to_numeric(column).astype('Int64')
+                elif pa.types.is_floating(field.type) and not pd.api.types.is_numeric_dtype(column):
+                    df[field.name] = pd.to_numeric(column).astype('Float64')
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"Coluna '{field.name}' não pôde ser convertida para {field.type}: {e}") from e
+        return df
+
+    def write(self, df: pd.DataFrame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if self.partition_column:
+            df = _with_partition_column(df, self.partition_column)
+        if self.schema is None:
+            self.schema = self._build_schema(df)
+        table = pa.Table.from_pandas(self._align(df), schema=self.schema, preserve_index=False)
+
+        if self.partition_column:
+            pq.write_to_dataset(
+                table, self.filepath, partition_cols=[PARTITION_COLUMN], compression=self.compression,
+                basename_template=f"part-{self._chunk_number:05d}-{{i}}.parquet"
+            )
+        else:
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.filepath, self.schema, compression=self.compression)
+            self._writer.write_table(table)
+        self._chunk_number += 1
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+def _with_row_hash(df: pd.DataFrame) -> pd.DataFrame:
+    values = df.drop(columns=[HASH_COLUMN], errors='ignore').astype('string').fillna('\x00')
+    return df.assign(**{HASH_COLUMN: pd.util.hash_pandas_object(values, index=False).map('{:016x}'.format).values})
+
+class _ChangeSet:
+    def __init__(self, filename: str, writer):
+        self.filename = filename
+        self.writer = writer
+        self.previous = row_hashes.load_hashes(filename) if dataset_exists(filename, writer.name) else {}
+        self.hashes = {}
+        self.inserted = 0
+        self.updated = 0
+        self._delta_stream = None
+        self.delta_path = None
+        self._delta_temp_path = None
+
+    def _write_delta(self, df: pd.DataFrame):
+        if self._delta_stream is None:
+            delta_dir = os.path.join(OUTPUT_DIR, f"{self.filename}{DELTA_SUFFIX}")
+            os.makedirs(delta_dir, exist_ok=True)
+            timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
+            self.delta_path = os.path.join(delta_dir, f"{timestamp}.{self.writer.extension}")
+            self._delta_temp_path = os.path.join(delta_dir, f"{timestamp}.tmp.{self.writer.extension}")
+            self._delta_stream = self.writer.open_stream(self._delta_temp_path, filename=self.filename)
+        self._delta_stream.write(df)
+
+    def track(self, df: pd.DataFrame, key_column: str):
+        keys = df[key_column].astype(str)
+        self.hashes.update(zip(keys, df[HASH_COLUMN]))
+        if not self.previous:
+            return
+        previous_hashes = keys.map(self.previous)
+        inserted = previous_hashes.isna()
+        updated = ~inserted & (previous_hashes != df[HASH_COLUMN])
+        self.inserted += int(inserted.sum())
+        self.updated += int(updated.sum())
+        if inserted.any() or updated.any():
+            changed = df[inserted | updated]
+            self._write_delta(changed.assign(**{OPERATION_COLUMN: inserted[inserted | updated].map({True: 'INSERT', False: 'UPDATE'}).values}))
+
+    def deleted_keys(self) -> set:
+        return set(self.previous) - set(self.hashes)
+
+    def has_changes(self) -> bool:
+        return not self.previous or bool(self.inserted or self.updated or self.deleted_keys())
+
+    def finish(self, key_column: str):
+        deleted = sorted(self.deleted_keys()) if self.previous else []
+        if deleted:
+            self._write_delta(pd.DataFrame({key_column: deleted, OPERATION_COLUMN: 'DELETE'}))
+        if self._delta_stream is not None:
+            self._delta_stream.close()
+            os.replace(self._delta_temp_path, self.delta_path)
+            print(f"  > Delta de '{self.filename}': {self.inserted} inclusões, {self.updated} alterações e {len(deleted)} exclusões em '{self.delta_path}'.")
+            _prune_deltas(self.filename, self.writer)
+        row_hashes.replace_hashes(self.filename, self.hashes)
+
+    def discard(self):
+        if self._delta_temp_path:
+            _discard_temp(self._delta_temp_path)
+
+def _prune_deltas(filename: str, writer):
+    if DELTA_RETENTION <= 0:
+        return
+    expired = delta_paths(filename, writer.name)[:-DELTA_RETENTION]
+    if not expired:
+        return
+    newest = max(os.path.getmtime(path) for path in expired)
+    for path in expired:
+        os.remove(path)
+    marker = os.path.join(os.path.dirname(expired[0]), PRUNED_MARKER)
+    if os.path.exists(marker):
+        newest = max(newest, os.path.getmtime(marker))
+    else:
+        open(marker, 'w').close()
+    os.utime(marker, (newest, newest))
+    print(f"  > {len(expired)} delta(s) antigo(s) de '{filename}' removido(s); mantidos os {DELTA_RETENTION} mais recentes.")
+
+def _change_set_for(filename: str, writer):
+    if CHANGE_DETECTION and filename in CHANGE_TRACKED_DATASETS:
+        return _ChangeSet(filename, writer)
+    return None
+
+class ExcelWriter:
+    name = 'excel'
+    extension = 'xlsx'
+    supports_partitioning = False
+
+    def read(self, filepath: str, columns: list = None) -> pd.DataFrame:
+        return pd.read_excel(filepath, dtype=str, usecols=columns)
+
+    def write(self, df: pd.DataFrame, filepath: str, partition_column: str = None):
+        df.to_excel(filepath, index=False, engine='openpyxl')
+
+    def prepare(self, df: pd.DataFrame, typed_columns=()) -> pd.DataFrame:
+        for col in df.columns:
+            if col in typed_columns:
+                continue
+            if 'ID' in col.upper():
+                df[col] = df[col].astype(str).replace(r'\.0$', '', regex=True)
+        return df
+
+    def open_stream(self, filepath: str, partition_column: str = None, filename: str = None):
+        return _ExcelStream(filepath)
+
+class ParquetWriter:
+    name = 'parquet'
+    extension = 'parquet'
+    supports_partitioning = True
+
+    def __init__(self, compression: str = PARQUET_COMPRESSION):
+        self.compression = compression
+
+    def read(self, filepath: str, columns: list = None) -> pd.DataFrame:
+        df = pd.read_parquet(filepath, columns=columns, engine='pyarrow')
+        if PARTITION_COLUMN in df.columns:
+            df = df.drop(columns=[PARTITION_COLUMN])
+        return df
+
+    def write(self, df: pd.DataFrame, filepath: str, partition_column: str = None):
+        if partition_column:
+            df = _with_partition_column(df, partition_column)
+            df.to_parquet(filepath, index=False, compression=self.compression, engine='pyarrow', partition_cols=[PARTITION_COLUMN])
+        else:
+            df.to_parquet(filepath, index=False, compression=self.compression, engine='pyarrow')
+
+    def prepare(self, df: pd.DataFrame, typed_columns=()) -> pd.DataFrame:
+        for col in df.columns:
+            if col in typed_columns:
+                continue
+            if 'ID' in col.upper():
+                df[col] = df[col].astype('string').str.replace(r'\.0$', '', regex=True)
+            elif col.upper() in BOOLEAN_COLUMNS:
+                df[col] = df[col].astype('boolean')
+            elif df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True).startswith('mixed'):
+                df[col] = _text_column(df[col])
+        return df
+
+    def open_stream(self, filepath: str, partition_column: str = None, filename: str = None):
+        return _ParquetStream(filepath, self.compression, partition_column, DATASET_SPECS.get(filename))
+
+WRITERS = {
+    ExcelWriter.name: ExcelWriter,
+    ParquetWriter.name: ParquetWriter,
+}
+
+def get_writer(output_format: str = None):
+    output_format = (output_format or OUTPUT_FORMAT).lower()
+    if output_format not in WRITERS:
+        raise ValueError(f"Formato de saída '{output_format}' não suportado. Opções: {', '.join(WRITERS)}.")
+    return WRITERS[output_format]()
+
+def _partition_column_for(filename: str, writer) -> str:
+    if writer.supports_partitioning and PARQUET_PARTITION_BY_DATE:
+        return DATE_PARTITION_COLUMNS.get(filename)
+    return None
+
+def _dataset_path(filename: str, writer, partitioned: bool = False) -> str:
+    if partitioned:
+        return os.path.join(OUTPUT_DIR, filename)
+    return os.path.join(OUTPUT_DIR, f"{filename}.{writer.extension}")
+
+def _existing_dataset_path(filename: str, writer):
+    for partitioned in (False, True):
+        filepath = _dataset_path(filename, writer, partitioned)
+        if os.path.exists(filepath):
+            return filepath
+    return None
+
+def _segments_dir(filename: str) -> str:
+    return os.path.join(OUTPUT_DIR, f"{filename}{SEGMENTS_SUFFIX}")
+
+def _segment_paths(filename: str, writer) -> list:
+    segments_dir = _segments_dir(filename)
+    if not os.path.isdir(segments_dir):
+        return []
+    return [
+        os.path.join(segments_dir, name)
+        for name in sorted(os.listdir(segments_dir))
+        if name.endswith(f".{writer.extension}")
+    ]
+
+def _next_segment_path(filename: str, writer) -> str:
+    segments_dir = _segments_dir(filename)
+    if not os.path.exists(segments_dir):
+        os.makedirs(segments_dir)
+    existing = _segment_paths(filename, writer)
+    next_seq = int(os.path.basename(existing[-1]).split('-')[0]) + 1 if existing else 1
+    segment_name = f"{next_seq:06d}-{datetime.now().strftime('%Y%m%d%H%M%S')}.{writer.extension}"
+    return os.path.join(segments_dir, segment_name)
+
+def _write_segment(df: pd.DataFrame, filename: str, writer) -> str:
+    segment_path = _next_segment_path(filename, writer)
+    _replace_file(df, segment_path, writer)
+    return segment_path
+
+def _remove_dataset(filename: str, writer):
+    for partitioned in (False, True):
+        filepath = _dataset_path(filename, writer, partitioned)
+        if os.path.isdir(filepath):
+            shutil.rmtree(filepath)
+        elif os.path.exists(filepath):
+            os.remove(filepath)
+    for segment_path in _segment_paths(filename, writer):
+        os.remove(segment_path)
+    segments_dir = _segments_dir(filename)
+    if os.path.isdir(segments_dir) and not os.listdir(segments_dir):
+        os.rmdir(segments_dir)
+
+def _replace_file(df: pd.DataFrame, filepath: str, writer):
+    root, extension = os.path.splitext(filepath)
+    temp_path = f"{root}.tmp{extension}"
+    writer.write(df, temp_path)
+    os.replace(temp_path, filepath)
+
+def _replace_dataset(df: pd.DataFrame, filename: str, filepath: str, writer, partition_column: str = None):
+    root, extension = os.path.splitext(filepath)
+    temp_path = f"{root}.tmp{extension}"
+    if os.path.isdir(temp_path):
+        shutil.rmtree(temp_path)
+    writer.write(df, temp_path, partition_column)
+    _remove_dataset(filename, writer)
+    os.replace(temp_path, filepath)
+
+def _read_merged(filename: str, writer) -> pd.DataFrame:
+    frames = []
+    base_path = _existing_dataset_path(filename, writer)
+    if base_path is not None:
+        frames.append(writer.read(base_path))
+    segment_paths = _segment_paths(filename, writer)
+    frames.extend(writer.read(segment_path) for segment_path in segment_paths)
+    if not frames:
+        return None
+    if len(frames) == 1:
+        return frames[0]
+
+    merged_df = pd.concat(frames, ignore_index=True)
+    id_column = merged_df.columns[0]
+    merged_df.drop_duplicates(subset=[id_column], keep='last', inplace=True)
+    return merged_df.reset_index(drop=True)
+
+def read_dataset(filename: str, columns: list = None, output_format: str = None) -> pd.DataFrame:
+    writer = get_writer(output_format)
+    if not _segment_paths(filename, writer):
+        filepath = _existing_dataset_path(filename, writer)
+        if filepath is None:
+            return None
+        return writer.read(filepath, columns=columns)
+
+    merged_df = _read_merged(filename, writer)
+    return merged_df[columns] if columns else merged_df
+
+def compact_dataset(filename: str, output_format: str = None):
+    writer = get_writer(output_format)
+    segment_paths = _segment_paths(filename, writer)
+    if not segment_paths:
+        return
+
+    merged_df = _read_merged(filename, writer)
+    partition_column = _partition_column_for(filename, writer)
+    filepath = _dataset_path(filename, writer, partitioned=partition_column is not None)
+    _replace_dataset(merged_df, filename, filepath, writer, partition_column)
+    print(f"🗜️ Dataset '{filename}' compactado: {len(segment_paths)} segmento(s) incorporados. Total: {len(merged_df)} registros.")
+
+def compact_datasets(output_format: str = None):
+    if not os.path.isdir(OUTPUT_DIR):
+        return
+    for name in sorted(os.listdir(OUTPUT_DIR)):
+        if name.endswith(SEGMENTS_SUFFIX):
+            compact_dataset(name[:-len(SEGMENTS_SUFFIX)], output_format=output_format)
+
+def read_column_as_set(filename: str, column_name: str, output_format: str = None) -> set:
     try:
-        df = pd.read_excel(filepath, dtype={column_name: str})
-        return set(df[column_name].dropna())
+        df = read_dataset(filename, columns=[column_name], output_format=output_format)
+        if df is None:
+            return set()
+        return set(df[column_name].dropna().astype(str))
     except Exception as e:
-        print(f"Erro ao ler a coluna '{column_name}' do arquivo {filepath}: {e}")
+        print(f"Erro ao ler a coluna '{column_name}' do dataset '{filename}': {e}")
         return set()
 
-def save_to_excel(data: list, filename: str, append: bool = False):
-    if not data:
+def dataset_mtime(filename: str, output_format: str = None) -> float:
+    writer = get_writer(output_format)
+    paths = _segment_paths(filename, writer)
+    base_path = _existing_dataset_path(filename, writer)
+    if base_path is not None:
+        paths.append(base_path)
+    return max((os.path.getmtime(path) for path in paths), default=0.0)
+
+def read_dataset_since(filename: str, since: float = None, output_format: str = None) -> pd.DataFrame:
+    writer = get_writer(output_format)
+    paths = _segment_paths(filename, writer)
+    base_path = _existing_dataset_path(filename, writer)
+    if base_path is not None:
+        paths.insert(0, base_path)
+    frames = [writer.read(path) for path in paths if since is None or os.path.getmtime(path) > since]
+    if not frames:
+        return None
+    merged_df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    return merged_df.drop_duplicates(subset=[merged_df.columns[0]], keep='last', ignore_index=True)
+
+def delta_paths(filename: str, output_format: str = None) -> list:
+    writer = get_writer(output_format)
+    delta_dir = os.path.join(OUTPUT_DIR, f"{filename}{DELTA_SUFFIX}")
+    if not os.path.isdir(delta_dir):
+        return []
+    return [
+        os.path.join(delta_dir, name)
+        for name in sorted(os.listdir(delta_dir))
+        if name.endswith(f".{writer.extension}") and '.tmp.' not in name
+    ]
+
+def deltas_pruned_since(filename: str, since: float) -> bool:
+    marker = os.path.join(OUTPUT_DIR, f"{filename}{DELTA_SUFFIX}", PRUNED_MARKER)
+    return os.path.exists(marker) and os.path.getmtime(marker) > since
+
+def read_delta(delta_path: str, output_format: str = None) -> pd.DataFrame:
+    return get_writer(output_format).read(delta_path)
+
+def dataset_exists(filename: str, output_format: str = None) -> bool:
+    writer = get_writer(output_format)
+    return _existing_dataset_path(filename, writer) is not None or bool(_segment_paths(filename, writer))
+
+def ensure_key_index(filename: str, key_column: str, output_format: str = None):
+    if not dataset_exists(filename, output_format):
+        key_index.drop_index(filename)
+        return
+    if key_index.is_indexed(filename):
+        return
+    print(f"Construindo índice de chaves de '{filename}' a partir do dataset existente...")
+    key_index.replace_keys(filename, key_column, read_column_as_set(filename, key_column, output_format=output_format))
+
+def read_excel_column_as_set(filename: str, column_name: str) -> set:
+    return read_column_as_set(filename, column_name, output_format='excel')
+
+def _frame_from_batches(batches: list, filename: str) -> pd.DataFrame:
+    frames = [batch for batch in batches if isinstance(batch, pd.DataFrame)]
+    rows = [row for batch in batches if not isinstance(batch, pd.DataFrame) for row in batch]
+    if rows:
+        frames.append(typed_frame(rows, filename))
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+def _prepare_chunk(batches: list, filename: str, output_format: str, with_hash: bool) -> pd.DataFrame:
+    chunk_df = _frame_from_batches(batches, filename)
+    if with_hash:
+        chunk_df = _with_row_hash(chunk_df)
+    return get_writer(output_format).prepare(chunk_df, dataset_dtypes(filename))
+
+def save_dataset(data, filename: str, append: bool = False, output_format: str = None):
+    if data is None or len(data) == 0:
         print(f"Nenhum dado novo de '{filename}' para salvar.")
         return
 
-    output_dir = 'dataset'
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-        print(f"Diretório '{output_dir}' criado.")
-    
-    filepath = os.path.join(output_dir, f"{filename}.xlsx")
+    if not os.path.exists(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        print(f"Diretório '{OUTPUT_DIR}' criado.")
+
+    writer = get_writer(output_format)
+    partition_column = _partition_column_for(filename, writer)
+    filepath = _dataset_path(filename, writer, partitioned=partition_column is not None)
 
+    changes = None
     try:
-        new_df = pd.DataFrame(data)
-        
-        for col in new_df.columns:
-            if 'ID' in col.upper():
-                new_df[col] = new_df[col].astype(str).replace(r'\.0$', '', regex=True)
+        changes = None if append else _change_set_for(filename, writer)
+        new_df = typed_frame(data, filename)
+        if changes is not None:
+            new_df = _with_row_hash(new_df)
+        new_df = writer.prepare(new_df, dataset_dtypes(filename))
+
+        if changes is not None:
+            changes.track(new_df, new_df.columns[0])
+            if not changes.has_changes():
+                changes.discard()
+                print(f"Dataset '{filename}' sem alterações desde a última execução; gravação ignorada.")
+                return
+
+        if append and INCREMENTAL_STORAGE == 'segments':
+            segment_path = _write_segment(new_df, filename, writer)
+            key_index.add_keys(filename, new_df.columns[0], new_df[new_df.columns[0]])
+            segment_count = len(_segment_paths(filename, writer))
+            print(f"✅ Dataset '{filename}': {len(new_df)} registros gravados no segmento '{segment_path}' ({segment_count} segmento(s) pendentes de compactação).")
+            metrics.inc('etl_rows_written_total', len(new_df), dataset=filename)
+            if segment_count > COMPACTION_MAX_SEGMENTS:
+                compact_dataset(filename, output_format=writer.name)
+            return
+
+        existing_df = _read_merged(filename, writer) if append else None
+        if existing_df is not None:
+            combined_df = pd.concat([existing_df, new_df], ignore_index=True)
 
-        if append and os.path.exists(filepath):
-            try:
-                existing_df = pd.read_excel(filepath, dtype=str)
-                combined_df = pd.concat([existing_df, new_df], ignore_index=True)
-            except FileNotFoundError:
-                combined_df = new_df
-            
             id_column = combined_df.columns[0]
             combined_df.drop_duplicates(subset=[id_column], keep='last', inplace=True)
-            
-            combined_df.to_excel(filepath, index=False, engine='openpyxl')
+
+            _replace_dataset(combined_df, filename, filepath, writer, partition_column)
+            key_index.replace_keys(filename, id_column, combined_df[id_column])
             print(f"✅ Dataset '{filename}' atualizado em '{filepath}'. Adicionados/atualizados {len(new_df)} registros. Total: {len(combined_df)}.")
+            metrics.inc('etl_rows_written_total', len(new_df), dataset=filename)
         else:
-            new_df.to_excel(filepath, index=False, engine='openpyxl')
+            _replace_dataset(new_df, filename, filepath, writer, partition_column)
+            key_index.replace_keys(filename, new_df.columns[0], new_df[new_df.columns[0]])
             print(f"✅ Dataset '{filename}' salvo/sobrescrito com sucesso em '{filepath}' com {len(new_df)} registros.")
+            metrics.inc('etl_rows_written_total', len(new_df), dataset=filename)
+            if changes is not None:
+                changes.finish(new_df.columns[0])
 
     except Exception as e:
-        print(f"Erro ao salvar o arquivo Excel para '{filename}': {e}")
\ No newline at end of file
+        if changes is not None:
+            changes.discard()
+        print(f"Erro ao salvar o dataset '{filename}' em formato {writer.name}: {e}")
+
+def save_to_excel(data: list, filename: str, append: bool = False):
+    save_dataset(data, filename, append=append, output_format='excel')
+
+class DatasetStream:
+    def __init__(self, filename: str, append: bool = False, output_format: str = None):
+        self.filename = filename
+        self.append = append
+        self.writer = get_writer(output_format)
+        self.total_rows = 0
+        self._legacy_rows = [] if append and INCREMENTAL_STORAGE != 'segments' else None
+        self._stream = None
+        self._buffer = []
+        self._buffered_rows = 0
+        self._queue = queue.Queue(maxsize=WRITER_MAX_PENDING)
+        self._thread = None
+        self._writer_error = None
+        self._aborted = False
+        self._keys = set()
+        self._key_column = None
+        self._changes = None
+
+        if self._legacy_rows is not None:
+            return
+        if not os.path.exists(OUTPUT_DIR):
+            os.makedirs(OUTPUT_DIR, exist_ok=True)
+            print(f"Diretório '{OUTPUT_DIR}' criado.")
+        if append:
+            self.partition_column = None
+            self.filepath = _next_segment_path(filename, self.writer)
+        else:
+            self.partition_column = _partition_column_for(filename, self.writer)
+            self.filepath = _dataset_path(filename, self.writer, partitioned=self.partition_column is not None)
+            self._changes = _change_set_for(filename, self.writer)
+        root, extension = os.path.splitext(self.filepath)
+        self.temp_path = f"{root}.tmp{extension}"
+        _discard_temp(self.temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def _flush(self):
+        self._raise_writer_error()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run_writer, name=f"writer-{self.filename}", daemon=True)
+            self._thread.start()
+        args = (self._buffer, self.filename, self.writer.name, self._changes is not None)
+        pool = writer_pool.get_pool()
+        job = pool.submit(_prepare_chunk, *args) if pool is not None else partial(_prepare_chunk, *args)
+        self._buffer = []
+        self._buffered_rows = 0
+        started = time.perf_counter()
+        self._queue.put(job)
+        metrics.inc('etl_writer_wait_seconds_total', time.perf_counter() - started, dataset=self.filename)
+
+    def _run_writer(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            if self._aborted or self._writer_error is not None:
+                _cancel(job)
+                continue
+            try:
+                self._write_chunk(job.result() if isinstance(job, Future) else job())
+            except BaseException as e:
+                self._writer_error = e
+
+    def _stop_writer(self):
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _raise_writer_error(self):
+        if self._writer_error is not None:
+            raise self._writer_error
+
+    def _write_chunk(self, chunk_df: pd.DataFrame):
+        if self._key_column is None:
+            self._key_column = chunk_df.columns[0]
+        self._keys.update(chunk_df[self._key_column].dropna().astype(str))
+        if self._changes is not None:
+            self._changes.track(chunk_df, self._key_column)
+        if self._stream is None:
+            self._stream = self.writer.open_stream(self.temp_path, self.partition_column, self.filename)
+        self._stream.write(chunk_df)
+
+    def write(self, rows):
+        if rows is None or len(rows) == 0:
+            return
+        self.total_rows += len(rows)
+        if self._legacy_rows is not None:
+            self._legacy_rows.extend(as_rows(rows))
+            return
+        self._buffer.append(rows)
+        self._buffered_rows += len(rows)
+        if self._buffered_rows >= STREAM_BATCH_SIZE:
+            self._flush()
+
+    def abort(self):
+        self._aborted = True
+        while True:
+            try:
+                _cancel(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self._stop_writer()
+        if self._legacy_rows is None:
+            _discard_temp(self.temp_path)
+        if self._changes is not None:
+            self._changes.discard()
+
+    def close(self):
+        if self._legacy_rows is not None:
+            save_dataset(self._legacy_rows, self.filename, append=True, output_format=self.writer.name)
+            return
+        try:
+            if self._buffer:
+                self._flush()
+            self._stop_writer()
+            self._raise_writer_error()
+        except Exception:
+            self.abort()
+            raise
+        if self._stream is None:
+            print(f"Nenhum dado novo de '{self.filename}' para salvar.")
+            return
+
+        try:
+            self._stream.close()
+            if self.append:
+                os.replace(self.temp_path, self.filepath)
+                key_index.add_keys(self.filename, self._key_column, self._keys)
+                segment_count = len(_segment_paths(self.filename, self.writer))
+                print(f"✅ Dataset '{self.filename}': {self.total_rows} registros gravados em streaming no segmento '{self.filepath}' ({segment_count} segmento(s) pendentes de compactação).")
+                metrics.inc('etl_rows_written_total', self.total_rows, dataset=self.filename)
+                if segment_count > COMPACTION_MAX_SEGMENTS:
+                    compact_dataset(self.filename, output_format=self.writer.name)
+            elif self._changes is not None and not self._changes.has_changes():
+                self.abort()
+                print(f"Dataset '{self.filename}' sem alterações desde a última execução; arquivo existente mantido.")
+            else:
+                _remove_dataset(self.filename, self.writer)
+                os.replace(self.temp_path, self.filepath)
+                key_index.replace_keys(self.filename, self._key_column, self._keys)
+                print(f"✅ Dataset '{self.filename}' salvo/sobrescrito em streaming em '{self.filepath}' com {self.total_rows} registros.")
+                metrics.inc('etl_rows_written_total', self.total_rows, dataset=self.filename)
+                if self._changes is not None:
+                    self._changes.finish(self._key_column)
+        except Exception as e:
+            self.abort()
+            print(f"Erro ao salvar o dataset '{self.filename}' em formato {self.writer.name}: {e}")
+            raise
+
+def save_dataset_stream(batches, filename: str, append: bool = False, output_format: str = None) -> int:
+    with DatasetStream(filename, append=append, output_format=output_format) as stream:
+        for batch in batches:
+            stream.write(batch)
+    return stream.total_rows
+
+def _cancel(job):
+    if isinstance(job, Future):
+        job.cancel()
+
+def _discard_temp(temp_path: str):
+    if os.path.isdir(temp_path):
+        shutil.rmtree(temp_path)
+    elif os.path.exists(temp_path):
+        os.remove(temp_path)
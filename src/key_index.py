@@ -0,0 +1,80 @@
+import time
+from state_store import transaction
+
+_SCHEMA_READY = False
+
+def _ensure_schema(connection):
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS dataset_keys ("
+        "dataset TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (dataset, key)) WITHOUT ROWID"
+    )
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS indexed_datasets ("
+        "dataset TEXT PRIMARY KEY, key_column TEXT, updated_at REAL)"
+    )
+    _SCHEMA_READY = True
+
+def _normalize(keys) -> set:
+    return {str(key) for key in keys if key is not None and str(key) not in ('', 'nan', 'None', '<NA>')}
+
+def _mark_indexed(connection, dataset: str, key_column: str):
+    connection.execute(
+        "INSERT OR REPLACE INTO indexed_datasets (dataset, key_column, updated_at) VALUES (?, ?, ?)",
+        (dataset, key_column, time.time())
+    )
+
+def is_indexed(dataset: str) -> bool:
+    with transaction() as connection:
+        _ensure_schema(connection)
+        return connection.execute("SELECT 1 FROM indexed_datasets WHERE dataset = ?", (dataset,)).fetchone() is not None
+
+def add_keys(dataset: str, key_column: str, keys):
+    with transaction() as connection:
+        _ensure_schema(connection)
+        connection.executemany(
+            "INSERT OR IGNORE INTO dataset_keys (dataset, key) VALUES (?, ?)",
+            ((dataset, key) for key in _normalize(keys))
+        )
+        _mark_indexed(connection, dataset, key_column)
+
+def replace_keys(dataset: str, key_column: str, keys):
+    with transaction() as connection:
+        _ensure_schema(connection)
+        connection.execute("DELETE FROM dataset_keys WHERE dataset = ?", (dataset,))
+        connection.executemany(
+            "INSERT OR IGNORE INTO dataset_keys (dataset, key) VALUES (?, ?)",
+            ((dataset, key) for key in _normalize(keys))
+        )
+        _mark_indexed(connection, dataset, key_column)
+
+def drop_index(dataset: str):
+    with transaction() as connection:
+        _ensure_schema(connection)
+        connection.execute("DELETE FROM dataset_keys WHERE dataset = ?", (dataset,))
+        connection.execute("DELETE FROM indexed_datasets WHERE dataset = ?", (dataset,))
+
+def known_keys(dataset: str) -> set:
+    with transaction() as connection:
+        _ensure_schema(connection)
+        return {row[0] for row in connection.execute("SELECT key FROM dataset_keys WHERE dataset = ?", (dataset,))}
+
+def missing_keys(dataset: str, keys) -> set:
+    candidates = _normalize(keys)
+    if not candidates:
+        return set()
+    with transaction() as connection:
+        _ensure_schema(connection)
+        connection.execute("CREATE TEMP TABLE IF NOT EXISTS candidate_keys (key TEXT PRIMARY KEY)")
+        connection.execute("DELETE FROM candidate_keys")
+        connection.executemany("INSERT OR IGNORE INTO candidate_keys (key) VALUES (?)", ((key,) for key in candidates))
+        rows = connection.execute(
+            "SELECT c.key FROM candidate_keys c "
+            "LEFT JOIN dataset_keys k ON k.dataset = ? AND k.key = c.key "
+            "WHERE k.key IS NULL",
+            (dataset,)
+        ).fetchall()
+        connection.execute("DELETE FROM candidate_keys")
+        return {row[0] for row in rows}
@@ -1,79 +1,287 @@
 from data_processor import (
     process_product_dimensions,
-    process_skus,
-    process_categories_from_skus,
-    process_point_of_sales,
-    process_pdv_dimensions,
+    iter_skus,
+    process_categories,
+    iter_point_of_sales,
+    process_pdv_dimensions_by_ids,
     process_employees,
     process_supervisors,
-    process_leaves,
-    process_scheduled_visits,
-    process_surveys_and_answers,
+    iter_leaves,
+    iter_scheduled_visits,
+    iter_surveys_and_answers,
+    commit_survey_state,
     process_forms_and_fields,
-    process_itineraries_and_noshows
+    iter_itineraries,
+    iter_noshows,
+    collect_ids,
+    prefetch_shared_dimensions,
+    PDV_DIMENSION_ID_COLUMNS
 )
-from file_handler import save_to_excel, read_excel_column_as_set
+from file_handler import (
+    save_dataset, save_dataset_stream, DatasetStream, ensure_key_index, compact_datasets,
+    dataset_exists, read_dataset, read_column_as_set, WRITERS
+)
+from schemas import apply_dtypes
+from scheduler import Task, run_tasks
+from bigquery_loader import load_datasets
+from config import (
+    OUTPUT_FORMAT, ETL_MAX_PARALLEL_TASKS, SCHEDULED_VISITS_SKIP_INACTIVE, SCHEDULED_VISITS_ONLY_WITH_ITINERARY, BIGQUERY_TARGET, METRICS_DIR, METRICS_PROMETHEUS,
+    ENVIRONMENTS_MAX_PARALLEL
+)
+from functools import partial
+import argparse
+import sys
+import api_client
+import state_store
+import checkpoints
+import metrics
+import concurrency_limiter
+import environments
+import writer_pool
+
+ITINERARY_ID_COLUMNS = ['IDROTEIROVISITA', 'IDCOLABORADOR']
+
+def _load_ids(filename: str, columns: list, output_format: str):
+    if not dataset_exists(filename, output_format):
+        return None
+    return {column: read_column_as_set(filename, column, output_format=output_format) for column in columns}
+
+def _load_records(filename: str, output_format: str):
+    if not dataset_exists(filename, output_format):
+        return None
+    df = read_dataset(filename, output_format=output_format)
+    if df is None:
+        return None
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+def _load_frame(filename: str, output_format: str):
+    if not dataset_exists(filename, output_format):
+        return None
+    df = read_dataset(filename, output_format=output_format)
+    return apply_dtypes(df, filename) if df is not None else None
+
+def _load_visit_dates(output_format: str) -> dict:
+    if not dataset_exists('involves_roteiros', output_format):
+        return {}
+    try:
+        df = read_dataset('involves_roteiros', columns=['IDROTEIROVISITA', 'DATAROTEIRO'], output_format=output_format)
+    except Exception as e:
+        print(f"Não foi possível ler as datas dos roteiros: {e}")
+        return {}
+    if df is None:
+        return {}
+    df = df.dropna()
+    return dict(zip(df['IDROTEIROVISITA'].astype(str), df['DATAROTEIRO'].astype(str)))
+
+def build_tasks(output_format: str) -> list:
+    save = partial(save_dataset, output_format=output_format)
+    save_stream = partial(save_dataset_stream, output_format=output_format)
+
+    def produtos_dimensoes(_):
+        product_dims = process_product_dimensions()
+        save(product_dims.get("brands"), 'involves_marcas')
+        save(product_dims.get("supercategories"), 'involves_supercategorias')
+        save(product_dims.get("productlines"), 'involves_linhas_de_produto')
+
+    def produtos(_):
+        sku_ids = {}
+        save_stream(collect_ids(iter_skus(), ['IDCATEGORIA'], sku_ids), 'involves_produtos')
+        return sku_ids
+
+    def categorias(deps):
+        save(process_categories(deps['produtos'].get('IDCATEGORIA')), 'involves_categorias')
+
+    def pdv(_):
+        pdv_ids = {}
+        save_stream(collect_ids(iter_point_of_sales(), PDV_DIMENSION_ID_COLUMNS, pdv_ids), 'involves_pdv')
+        return pdv_ids
+
+    def pdv_dimensoes(deps):
+        pdv_dims = process_pdv_dimensions_by_ids(deps['pdv'])
+        save(pdv_dims.get("macroregionals"), 'involves_macroregionais')
+        save(pdv_dims.get("regionals"), 'involves_regionais')
+        save(pdv_dims.get("chains"), 'involves_redes')
+        save(pdv_dims.get("banners"), 'involves_banners')
+        save(pdv_dims.get("pos_types"), 'involves_tipos_pdv')
+        save(pdv_dims.get("pos_profiles"), 'involves_perfis_pdv')
+        save(pdv_dims.get("channels"), 'involves_canais')
+
+    def colaboradores(_):
+        colaboradores_data = process_employees()
+        save(colaboradores_data, 'involves_colaboradores')
+        return colaboradores_data
+
+    def supervisores(deps):
+        save(process_supervisors(deps['colaboradores']), 'involves_supervisores')
+
+    def pesquisas(_):
+        ensure_key_index('involves_pesquisas', 'IDPESQUISA', output_format=output_format)
+        new_form_ids, pending_state = set(), {}
+        with DatasetStream("involves_pesquisas", append=True, output_format=output_format) as surveys_stream, \
+                DatasetStream("involves_respostas", append=True, output_format=output_format) as answers_stream:
+            for survey_rows, answer_rows in iter_surveys_and_answers(new_form_ids, pending_state):
+                surveys_stream.write(survey_rows)
+                answers_stream.write(answer_rows)
+        commit_survey_state(pending_state)
+        return new_form_ids
+
+    def formularios(deps):
+        ensure_key_index('involves_formularios', 'IDFORMULARIO', output_format=output_format)
+        form_data = process_forms_and_fields(deps['pesquisas'])
+        save(form_data.get("forms"), "involves_formularios", append=True)
+        save(form_data.get("form_fields"), "involves_formularios_campos", append=True)
+
+    def afastamentos(_):
+        save_stream(iter_leaves(), 'involves_afastamentos')
+
+    def visitas_agendadas(deps):
+        employee_ids_with_itinerary = deps['roteiros'].get('IDCOLABORADOR') if 'roteiros' in deps else None
+        filtered = SCHEDULED_VISITS_SKIP_INACTIVE or employee_ids_with_itinerary is not None
+        previous_rows = _load_frame('involves_visitas_agendadas', output_format) if filtered else None
+        save_stream(iter_scheduled_visits(deps['colaboradores'], employee_ids_with_itinerary, previous_rows), 'involves_visitas_agendadas')
+
+    def roteiros(_):
+        itinerary_ids = {}
+        previous_rows = _load_frame('involves_roteiros', output_format)
+        save_stream(collect_ids(iter_itineraries(set(), previous_rows), ITINERARY_ID_COLUMNS, itinerary_ids), 'involves_roteiros')
+        return itinerary_ids
+
+    def justificativas(deps):
+        ensure_key_index('involves_justificativas_falta', 'IDJUSTIFICATIVA', output_format=output_format)
+        visit_dates = _load_visit_dates(output_format)
+        save_stream(iter_noshows(deps['roteiros'].get('IDROTEIROVISITA'), visit_dates), 'involves_justificativas_falta', append=True)
+
+    def load_form_ids():
+        ids = _load_ids('involves_pesquisas', ['IDFORMULARIO'], output_format)
+        return ids['IDFORMULARIO'] if ids is not None else None
+
+    visit_deps = ('colaboradores', 'roteiros') if SCHEDULED_VISITS_ONLY_WITH_ITINERARY else ('colaboradores',)
+
+    return [
+        Task('produtos_dimensoes', produtos_dimensoes),
+        Task('produtos', produtos, load=lambda: _load_ids('involves_produtos', ['IDCATEGORIA'], output_format)),
+        Task('categorias', categorias, deps=('produtos',)),
+        Task('pdv', pdv, load=lambda: _load_ids('involves_pdv', PDV_DIMENSION_ID_COLUMNS, output_format)),
+        Task('pdv_dimensoes', pdv_dimensoes, deps=('pdv',)),
+        Task('colaboradores', colaboradores, load=lambda: _load_records('involves_colaboradores', output_format)),
+        Task('supervisores', supervisores, deps=('colaboradores',)),
+        Task('pesquisas', pesquisas, load=load_form_ids),
+        Task('formularios', formularios, deps=('pesquisas',)),
+        Task('afastamentos', afastamentos),
+        Task('visitas_agendadas', visitas_agendadas, deps=visit_deps),
+        Task('roteiros', roteiros, load=lambda: _load_ids('involves_roteiros', ITINERARY_ID_COLUMNS, output_format)),
+        Task('justificativas', justificativas, deps=('roteiros',)),
+    ]
+
+ENTITIES = [task.name for task in build_tasks(OUTPUT_FORMAT)]
+
+def run_etl(output_format: str = None, compact: bool = False, only: list = None, max_parallel: int = None,
+            load_target: str = None, full_reload: bool = False, resume: bool = False, prometheus: bool = None):
+    output_format = output_format or OUTPUT_FORMAT
+    max_parallel = max_parallel or ETL_MAX_PARALLEL_TASKS
+    prometheus = METRICS_PROMETHEUS if prometheus is None else prometheus
+    metrics.reset()
 
-def run_etl():
     print("--- INICIANDO PROCESSO DE ETL INVOLVES ---")
+    print(f"Formato de saída: {output_format}")
+    print(f"Entidades: {', '.join(only) if only else 'todas'} | Tarefas em paralelo: {max_parallel}")
+
+    if resume:
+        completed = checkpoints.completed_tasks()
+        print(f"Retomando a execução anterior: {len(completed)} entidade(s) já concluída(s).")
+    else:
+        checkpoints.clear()
+        completed = set()
+
+    try:
+        run_tasks(build_tasks(output_format), max_workers=max_parallel, selected=set(only) if only else None,
+                  completed=completed, on_complete=checkpoints.mark_task_completed)
+        checkpoints.clear()
 
-    print("\n--- EXECUTANDO CARGA COMPLETA (FULL) ---")
-
-    product_dims = process_product_dimensions()
-    save_to_excel(product_dims.get("brands"), 'involves_marcas')
-    save_to_excel(product_dims.get("supercategories"), 'involves_supercategorias')
-    save_to_excel(product_dims.get("productlines"), 'involves_linhas_de_produto')
-    
-    produtos_data = process_skus()
-    save_to_excel(produtos_data, 'involves_produtos')
-
-    categorias_data = process_categories_from_skus(produtos_data)
-    save_to_excel(categorias_data, 'involves_categorias')
-
-    pdv_data = process_point_of_sales()
-    save_to_excel(pdv_data, 'involves_pdv')
-    
-    pdv_dims = process_pdv_dimensions(pdv_data)
-    save_to_excel(pdv_dims.get("macroregionals"), 'involves_macroregionais')
-    save_to_excel(pdv_dims.get("regionals"), 'involves_regionais')
-    save_to_excel(pdv_dims.get("chains"), 'involves_redes')
-    save_to_excel(pdv_dims.get("banners"), 'involves_banners')
-    save_to_excel(pdv_dims.get("pos_types"), 'involves_tipos_pdv')
-    save_to_excel(pdv_dims.get("pos_profiles"), 'involves_perfis_pdv')
-    save_to_excel(pdv_dims.get("channels"), 'involves_canais')
-
-    colaboradores_data = process_employees()
-    save_to_excel(colaboradores_data, 'involves_colaboradores')
-    
-    supervisores_data = process_supervisors(colaboradores_data)
-    save_to_excel(supervisores_data, 'involves_supervisores')
-
-    print("\n--- EXECUTANDO CARGA INCREMENTAL E DADOS TRANSACIONAIS ---")
-
-    existing_survey_ids = read_excel_column_as_set('involves_pesquisas', 'IDPESQUISA')
-    survey_data = process_surveys_and_answers(existing_survey_ids)
-    save_to_excel(survey_data.get("new_surveys"), "involves_pesquisas", append=True)
-    save_to_excel(survey_data.get("new_answers"), "involves_respostas", append=True)
-
-    existing_form_ids = read_excel_column_as_set('involves_formularios', 'IDFORMULARIO')
-    new_form_ids_to_fetch = survey_data.get("new_form_ids") - existing_form_ids
-    form_data = process_forms_and_fields(new_form_ids_to_fetch)
-    save_to_excel(form_data.get("forms"), "involves_formularios", append=True)
-    save_to_excel(form_data.get("form_fields"), "involves_formularios_campos", append=True)
-
-    afastamentos_data = process_leaves()
-    save_to_excel(afastamentos_data, 'involves_afastamentos')
-    
-    visitas_data = process_scheduled_visits(colaboradores_data)
-    save_to_excel(visitas_data, 'involves_visitas_agendadas')
-    
-    itinerary_data = process_itineraries_and_noshows()
-    save_to_excel(itinerary_data.get("itineraries"), 'involves_roteiros')
-    save_to_excel(itinerary_data.get("noshows"), 'involves_justificativas_falta')
+        if compact:
+            print("\n--- COMPACTANDO SEGMENTOS DOS DATASETS INCREMENTAIS ---")
+            compact_datasets(output_format=output_format)
 
+        if load_target:
+            load_datasets(output_format=output_format, target_name=load_target, force=full_reload)
+    finally:
+        metrics.print_summary()
+        concurrency_limiter.print_summary()
+        report_path = metrics.write_report(METRICS_DIR, prometheus=prometheus)
+        print(f"Relatório de métricas da execução salvo em '{report_path}'.")
 
     print("\n--- PROCESSO DE ETL CONCLUÍDO ---")
 
+def _etl_args(args) -> list:
+    etl_args = []
+    if args.output_format:
+        etl_args += ['--format', args.output_format]
+    if args.compact:
+        etl_args.append('--compact')
+    if args.only:
+        etl_args += ['--only', ','.join(args.only)]
+    if args.max_parallel:
+        etl_args += ['--max-parallel', str(args.max_parallel)]
+    if args.load_target:
+        etl_args += ['--load', args.load_target]
+    if args.full_reload:
+        etl_args.append('--full-reload')
+    if args.resume:
+        etl_args.append('--resume')
+    if args.prometheus:
+        etl_args.append('--prometheus')
+    return etl_args
+
+def run_environments(args) -> bool:
+    environment_list = environments.load_environments(args.environments)
+    if not environment_list:
+        print("Nenhum ambiente informado: use --environments 1,2,3, INVOLVES_ENVIRONMENTS ou INVOLVES_ENVIRONMENTS_FILE.")
+        return False
+    results = environments.run_environments(environment_list, _etl_args(args), args.max_environments or ENVIRONMENTS_MAX_PARALLEL)
+    return all(returncode == 0 for returncode in results.values())
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="ETL da API Involves para datasets.")
+    parser.add_argument("--format", dest="output_format", choices=sorted(WRITERS), default=None,
+                        help=f"Formato dos datasets gerados (padrão: {OUTPUT_FORMAT}).")
+    parser.add_argument("--compact", action="store_true",
+                        help="Ao final da execução, incorpora os segmentos incrementais ao arquivo principal de cada dataset.")
+    parser.add_argument("--only", type=lambda value: [name.strip() for name in value.split(",") if name.strip()], default=None,
+                        help=f"Executa apenas as entidades informadas, separadas por vírgula ({', '.join(ENTITIES)}). "
+                             "Pré-requisitos não selecionados são lidos dos datasets já salvos ou executados quando não existirem.")
+    parser.add_argument("--max-parallel", type=int, default=None,
+                        help=f"Número máximo de entidades extraídas em paralelo (padrão: {ETL_MAX_PARALLEL_TASKS}).")
+    parser.add_argument("--load", dest="load_target", nargs="?", const=BIGQUERY_TARGET, choices=["bigquery", "local"], default=None,
+                        help=f"Ao final, carrega os datasets alterados no data warehouse (padrão: {BIGQUERY_TARGET}). "
+                             "'local' grava as tabelas em Parquet no diretório INVOLVES_BIGQUERY_LOCAL_DIR, sem acessar o BigQuery.")
+    parser.add_argument("--full-reload", action="store_true",
+                        help="Com --load, recarrega todas as tabelas por completo em vez de aplicar deltas e MERGE.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Retoma a última execução interrompida: entidades concluídas são puladas e as páginas e detalhes já baixados são lidos do checkpoint.")
+    parser.add_argument("--prometheus", action="store_true", default=None,
+                        help="Além do relatório JSON, grava as métricas da execução no formato de texto do Prometheus.")
+    parser.add_argument("--environments", nargs="?", const=[], default=None,
+                        type=lambda value: [environment_id.strip() for environment_id in value.split(",") if environment_id.strip()],
+                        help="Extrai vários ambientes em paralelo, um processo por ambiente, com a saída em um subdiretório de cada um. "
+                             "Sem valor, usa INVOLVES_ENVIRONMENTS_FILE ou INVOLVES_ENVIRONMENTS.")
+    parser.add_argument("--max-environments", type=int, default=None,
+                        help=f"Número máximo de ambientes extraídos ao mesmo tempo (padrão: {ENVIRONMENTS_MAX_PARALLEL}).")
+    parser.add_argument("--prefetch-shared", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    run_etl()
\ No newline at end of file
+    args = parse_args()
+    if args.environments is not None:
+        sys.exit(0 if run_environments(args) else 1)
+    try:
+        if args.prefetch_shared:
+            prefetch_shared_dimensions()
+            sys.exit(0)
+        run_etl(output_format=args.output_format, compact=args.compact, only=args.only, max_parallel=args.max_parallel,
+                load_target=args.load_target, full_reload=args.full_reload, resume=args.resume,
+                prometheus=args.prometheus)
+    finally:
+        writer_pool.shutdown()
+        api_client.close()
+        state_store.close()
\ No newline at end of file
@@ -0,0 +1,201 @@
+import functools
+import inspect
+import json
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RESERVOIR_SIZE = 10000
+
+_NUMERIC_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_started_at = time.time()
+
+class Histogram:
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._samples = []
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[index] += 1
+                break
+        if len(self._samples) < RESERVOIR_SIZE:
+            self._samples.append(value)
+        else:
+            slot = random.randrange(self.count)
+            if slot < RESERVOIR_SIZE:
+                self._samples[slot] = value
+
+    def percentile(self, fraction: float) -> float:
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count, 'sum': round(self.sum, 6), 'mean': round(self.sum / self.count, 6) if self.count else 0.0,
+            'p50': round(self.percentile(0.50), 6), 'p90': round(self.percentile(0.90), 6),
+            'p99': round(self.percentile(0.99), 6), 'max': round(self.max, 6),
+        }
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def endpoint_label(url: str) -> str:
+    path = url.split('?', 1)[0].split('://', 1)[-1]
+    path = path[path.find('/'):] if '/' in path else '/'
+    return _NUMERIC_SEGMENT.sub('/{id}', path)
+
+def inc(name: str, value: float = 1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name: str, value: float, **labels):
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(value)
+
+def _row_count(result) -> int:
+    if isinstance(result, tuple):
+        return sum(_row_count(item) for item in result)
+    if isinstance(result, dict):
+        return sum(len(value) for value in result.values() if isinstance(value, list))
+    try:
+        return len(result)
+    except TypeError:
+        return 0
+
+def stage(name: str):
+    def decorator(function):
+        if inspect.isgeneratorfunction(function):
+            @functools.wraps(function)
+            def generator_wrapper(*args, **kwargs):
+                generator = function(*args, **kwargs)
+                elapsed = 0.0
+                try:
+                    while True:
+                        started = time.perf_counter()
+                        try:
+                            batch = next(generator)
+                        except StopIteration:
+                            return
+                        finally:
+                            elapsed += time.perf_counter() - started
+                        inc('etl_stage_rows_total', _row_count(batch), stage=name)
+                        yield batch
+                finally:
+                    generator.close()
+                    inc('etl_stage_seconds_total', elapsed, stage=name)
+            return generator_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            finally:
+                inc('etl_stage_seconds_total', time.perf_counter() - started, stage=name)
+            inc('etl_stage_rows_total', _row_count(result), stage=name)
+            return result
+        return wrapper
+    return decorator
+
+def reset():
+    global _started_at
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _started_at = time.time()
+
+def report() -> dict:
+    with _lock:
+        counters = [
+            {'name': name, 'labels': dict(labels), 'value': round(value, 6) if isinstance(value, float) else value}
+            for (name, labels), value in sorted(_counters.items())
+        ]
+        histograms = [
+            {'name': name, 'labels': dict(labels), **histogram.summary()}
+            for (name, labels), histogram in sorted(_histograms.items(), key=lambda item: item[0])
+        ]
+    return {
+        'started_at': datetime.fromtimestamp(_started_at).isoformat(timespec='seconds'),
+        'duration_seconds': round(time.time() - _started_at, 3),
+        'counters': counters,
+        'histograms': histograms,
+    }
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _prometheus_labels(labels, extra: dict = None) -> str:
+    pairs = list(labels) + list((extra or {}).items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+def prometheus_text() -> str:
+    lines = []
+    with _lock:
+        for name in sorted({name for name, _ in _counters}):
+            lines.append(f"# TYPE {name} counter")
+            for (counter_name, labels), value in sorted(_counters.items()):
+                if counter_name == name:
+                    lines.append(f"{name}{_prometheus_labels(labels)} {value}")
+        for name in sorted({name for name, _ in _histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (histogram_name, labels), histogram in sorted(_histograms.items(), key=lambda item: item[0]):
+                if histogram_name != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets, histogram.bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_prometheus_labels(labels, {'le': bound})} {cumulative}")
+                lines.append(f"{name}_bucket{_prometheus_labels(labels, {'le': '+Inf'})} {histogram.count}")
+                lines.append(f"{name}_sum{_prometheus_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{_prometheus_labels(labels)} {histogram.count}")
+    return '\n'.join(lines) + '\n'
+
+def write_report(directory: str, prometheus: bool = False) -> str:
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"run_{datetime.fromtimestamp(_started_at).strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, 'w', encoding='utf-8') as report_file:
+        json.dump(report(), report_file, ensure_ascii=False, indent=2)
+    if prometheus:
+        with open(os.path.join(directory, 'involves_etl.prom'), 'w', encoding='utf-8') as prometheus_file:
+            prometheus_file.write(prometheus_text())
+    return path
+
+def print_summary():
+    with _lock:
+        stages = {}
+        for (name, labels), value in _counters.items():
+            if name in ('etl_stage_seconds_total', 'etl_stage_rows_total'):
+                stages.setdefault(dict(labels)['stage'], {})[name] = value
+        requests = sum(value for (name, _), value in _counters.items() if name == 'http_requests_total')
+        retries = sum(value for (name, _), value in _counters.items() if name == 'http_retries_total')
+        cache_hits = sum(value for (name, _), value in _counters.items() if name == 'http_cache_hits_total')
+        received = sum(value for (name, _), value in _counters.items() if name == 'http_response_bytes_total')
+    print(f"\nRequisições HTTP: {requests} | Retentativas: {retries} | Acertos de cache: {cache_hits} | {received / 1_048_576:.1f} MiB recebidos")
+    for stage_name, values in sorted(stages.items(), key=lambda item: -item[1].get('etl_stage_seconds_total', 0)):
+        print(f"  > {stage_name}: {values.get('etl_stage_seconds_total', 0):.1f}s, {values.get('etl_stage_rows_total', 0)} linhas")
@@ -0,0 +1,29 @@
+import time
+from state_store import transaction
+
+_SCHEMA_READY = False
+
+def _ensure_schema(connection):
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS noshow_status ("
+        "visit_id TEXT PRIMARY KEY, visit_date TEXT, justification_id TEXT, status TEXT, checked_at REAL) WITHOUT ROWID"
+    )
+    _SCHEMA_READY = True
+
+def all_statuses() -> dict:
+    with transaction() as connection:
+        _ensure_schema(connection)
+        rows = connection.execute("SELECT visit_id, visit_date, justification_id, status FROM noshow_status").fetchall()
+        return {visit_id: (visit_date, justification_id, status) for visit_id, visit_date, justification_id, status in rows}
+
+def record_statuses(entries: list, checked_at: float = None):
+    checked_at = checked_at or time.time()
+    with transaction() as connection:
+        _ensure_schema(connection)
+        connection.executemany(
+            "INSERT OR REPLACE INTO noshow_status (visit_id, visit_date, justification_id, status, checked_at) VALUES (?, ?, ?, ?, ?)",
+            ((visit_id, visit_date, justification_id, status, checked_at) for visit_id, visit_date, justification_id, status in entries)
+        )
@@ -0,0 +1,162 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from urllib.parse import urlsplit
+from config import (
+    CACHE_MAX_ENTRIES, CACHE_PATH, CACHE_TTL_DIMENSIONS, CACHE_TTL_DEFAULT, CACHE_TTL_VOLATILE, SHARED_CACHE_PATH, INVOLVES_BASE_URL
+)
+
+CacheEntry = namedtuple('CacheEntry', ['data', 'stored_at', 'etag', 'last_modified'])
+
+RUN_STARTED_AT = time.time()
+
+DIMENSION_FAMILIES = {
+    'brands', 'supercategories', 'productlines', 'categories', 'macroregionals', 'regionals',
+    'banners', 'chains', 'pointofsalechannels', 'pointofsaletype', 'pointofsaleprofile', 'form'
+}
+VOLATILE_FAMILIES = {'itinerary', 'noshow', 'scheduledvisits', 'surveys', 'leaves'}
+ENVIRONMENT_PATH = re.compile(r'^/v\d+/(?:environments/[^/]+|\d+)(?:/|$)')
+BASE_PATH = urlsplit(INVOLVES_BASE_URL or '').path.rstrip('/')
+
+def endpoint_family(url: str) -> str:
+    segments = [segment for segment in urlsplit(url).path.split('/') if segment]
+    for segment in reversed(segments):
+        if segment in DIMENSION_FAMILIES or segment in VOLATILE_FAMILIES:
+            return segment
+    for segment in reversed(segments):
+        if not segment.isdigit() and segment not in ('find', 'environments'):
+            return segment
+    return ''
+
+def _api_path(url: str) -> str:
+    path = urlsplit(url).path
+    if BASE_PATH and (path == BASE_PATH or path.startswith(f"{BASE_PATH}/")):
+        return path[len(BASE_PATH):]
+    return path
+
+def is_global(url: str) -> bool:
+    return not ENVIRONMENT_PATH.match(_api_path(url))
+
+def ttl_for(url: str) -> int:
+    family = endpoint_family(url)
+    if family in DIMENSION_FAMILIES:
+        return CACHE_TTL_DIMENSIONS
+    if family in VOLATILE_FAMILIES:
+        return CACHE_TTL_VOLATILE
+    return CACHE_TTL_DEFAULT
+
+class ResponseCache:
+    def __init__(self, max_entries: int, db_path: str = None, shared_path: str = None):
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._shared = None
+        self._pending_writes = 0
+        if db_path:
+            self._db = self._open_db(db_path)
+            max_ttl = max(CACHE_TTL_DIMENSIONS, CACHE_TTL_DEFAULT, CACHE_TTL_VOLATILE)
+            self._db.execute(
+                "DELETE FROM responses WHERE stored_at < ? AND etag IS NULL AND last_modified IS NULL",
+                (time.time() - max_ttl,)
+            )
+            self._db.commit()
+        if shared_path:
+            self._shared = self._open_db(shared_path)
+
+    @staticmethod
+    def _open_db(db_path: str) -> sqlite3.Connection:
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        db = sqlite3.connect(db_path, check_same_thread=False, timeout=60)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "url TEXT PRIMARY KEY, body TEXT, stored_at REAL, etag TEXT, last_modified TEXT)"
+        )
+        db.commit()
+        return db
+
+    def is_shared(self, url: str) -> bool:
+        return self._shared is not None and is_global(url)
+
+    def _db_for(self, url: str):
+        return self._shared if self.is_shared(url) else self._db
+
+    def _remember(self, url: str, entry: CacheEntry):
+        self._memory[url] = entry
+        self._memory.move_to_end(url)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, url: str):
+        with self._lock:
+            entry = self._memory.get(url)
+            if entry is not None:
+                self._memory.move_to_end(url)
+                return entry
+            db = self._db_for(url)
+            if db is None:
+                return None
+            row = db.execute(
+                "SELECT body, stored_at, etag, last_modified FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            entry = CacheEntry(json.loads(row[0]), row[1], row[2], row[3])
+            self._remember(url, entry)
+            return entry
+
+    def is_fresh(self, url: str, entry: CacheEntry) -> bool:
+        if entry.stored_at >= RUN_STARTED_AT or self.is_shared(url):
+            return True
+        return time.time() - entry.stored_at < ttl_for(url)
+
+    def set(self, url: str, data, etag: str = None, last_modified: str = None):
+        entry = CacheEntry(data, time.time(), etag, last_modified)
+        with self._lock:
+            if ttl_for(url) > 0 or endpoint_family(url) not in VOLATILE_FAMILIES:
+                self._remember(url, entry)
+            if self.is_shared(url):
+                self._shared.execute(
+                    "INSERT OR REPLACE INTO responses (url, body, stored_at, etag, last_modified) VALUES (?, ?, ?, ?, ?)",
+                    (url, json.dumps(data), entry.stored_at, etag, last_modified)
+                )
+                self._shared.commit()
+            elif self._db is not None and (ttl_for(url) > 0 or etag or last_modified):
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (url, body, stored_at, etag, last_modified) VALUES (?, ?, ?, ?, ?)",
+                    (url, json.dumps(data), entry.stored_at, etag, last_modified)
+                )
+                self._pending_writes += 1
+                if self._pending_writes >= 100:
+                    self._db.commit()
+                    self._pending_writes = 0
+        return entry
+
+    def revalidated(self, url: str, entry: CacheEntry):
+        return self.set(url, entry.data, entry.etag, entry.last_modified)
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.commit()
+                self._db.close()
+                self._db = None
+            if self._shared is not None:
+                self._shared.close()
+                self._shared = None
+
+_response_cache = None
+
+def get_response_cache() -> ResponseCache:
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache(CACHE_MAX_ENTRIES, CACHE_PATH or None, SHARED_CACHE_PATH or None)
+    return _response_cache
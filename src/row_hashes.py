@@ -0,0 +1,40 @@
+from state_store import transaction
+
+_SCHEMA_READY = False
+
+def _ensure_schema(connection):
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS row_hashes ("
+        "dataset TEXT NOT NULL, key TEXT NOT NULL, hash TEXT, PRIMARY KEY (dataset, key)) WITHOUT ROWID"
+    )
+    _SCHEMA_READY = True
+
+def load_hashes(dataset: str) -> dict:
+    with transaction() as connection:
+        _ensure_schema(connection)
+        return dict(connection.execute("SELECT key, hash FROM row_hashes WHERE dataset = ?", (dataset,)).fetchall())
+
+def replace_hashes(dataset: str, hashes: dict):
+    with transaction() as connection:
+        _ensure_schema(connection)
+        connection.execute("DELETE FROM row_hashes WHERE dataset = ?", (dataset,))
+        connection.executemany(
+            "INSERT OR REPLACE INTO row_hashes (dataset, key, hash) VALUES (?, ?, ?)",
+            ((dataset, key, row_hash) for key, row_hash in hashes.items())
+        )
+
+def update_hashes(dataset: str, hashes: dict):
+    with transaction() as connection:
+        _ensure_schema(connection)
+        connection.executemany(
+            "INSERT OR REPLACE INTO row_hashes (dataset, key, hash) VALUES (?, ?, ?)",
+            ((dataset, key, row_hash) for key, row_hash in hashes.items())
+        )
+
+def drop_hashes(dataset: str):
+    with transaction() as connection:
+        _ensure_schema(connection)
+        connection.execute("DELETE FROM row_hashes WHERE dataset = ?", (dataset,))
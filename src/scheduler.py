@@ -0,0 +1,122 @@
+import time
+import traceback
+import metrics
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+class Task:
+    def __init__(self, name: str, run, deps: tuple = (), load=None):
+        self.name = name
+        self.run = run
+        self.deps = tuple(deps)
+        self.load = load
+
+def _with_dependencies(tasks: dict, selected: set) -> set:
+    needed, pending = set(), list(selected)
+    while pending:
+        name = pending.pop()
+        if name in needed:
+            continue
+        needed.add(name)
+        pending.extend(tasks[name].deps)
+    return needed
+
+def _validate(tasks: dict):
+    for task in tasks.values():
+        for dep in task.deps:
+            if dep not in tasks:
+                raise ValueError(f"Tarefa '{task.name}' depende de '{dep}', que não foi declarada.")
+    visiting, visited = set(), set()
+
+    def visit(name):
+        if name in visited:
+            return
+        if name in visiting:
+            raise ValueError(f"Dependência circular envolvendo a tarefa '{name}'.")
+        visiting.add(name)
+        for dep in tasks[name].deps:
+            visit(dep)
+        visiting.discard(name)
+        visited.add(name)
+
+    for name in tasks:
+        visit(name)
+
+def run_tasks(task_list: list, max_workers: int, selected: set = None, completed: set = None, on_complete=None) -> dict:
+    tasks = {task.name: task for task in task_list}
+    _validate(tasks)
+
+    unknown = set(selected or ()) - set(tasks)
+    if unknown:
+        raise ValueError(f"Entidades desconhecidas: {', '.join(sorted(unknown))}. Opções: {', '.join(tasks)}.")
+
+    results, failed, durations = {}, set(), {}
+    to_run = set(tasks) if not selected else set(selected)
+
+    if selected:
+        for name in sorted(_with_dependencies(tasks, selected) - to_run):
+            task = tasks[name]
+            loaded = task.load() if task.load else None
+            if loaded is not None:
+                print(f"[DAG] '{name}' não foi selecionada; reaproveitando o resultado salvo da última execução.")
+                results[name] = loaded
+            else:
+                print(f"[DAG] '{name}' não foi selecionada, mas é pré-requisito sem resultado salvo; será executada.")
+                to_run.add(name)
+
+    for name in sorted(to_run & set(completed or ())):
+        task = tasks[name]
+        loaded = task.load() if task.load else None
+        if task.load and loaded is None:
+            print(f"[DAG] '{name}' foi concluída na execução anterior, mas não tem resultado salvo; será executada novamente.")
+            continue
+        print(f"[DAG] '{name}' foi concluída na execução anterior; retomando a partir do checkpoint.")
+        results[name] = loaded
+        to_run.discard(name)
+
+    remaining = set(to_run)
+    running = {}
+
+    def is_ready(name):
+        return all(dep in results for dep in tasks[name].deps)
+
+    def blocked(name):
+        return any(dep in failed for dep in tasks[name].deps)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="etl-task") as executor:
+        while remaining or running:
+            for name in [name for name in tasks if name in remaining]:
+                if blocked(name):
+                    print(f"\n[DAG] '{name}' ignorada porque uma dependência falhou.")
+                    failed.add(name)
+                    remaining.discard(name)
+                elif is_ready(name) and len(running) < max_workers:
+                    task = tasks[name]
+                    dep_results = {dep: results[dep] for dep in task.deps}
+                    print(f"\n[DAG] Iniciando '{name}'.")
+                    running[executor.submit(task.run, dep_results)] = (name, time.monotonic())
+                    remaining.discard(name)
+
+            if not running:
+                if remaining:
+                    raise RuntimeError(f"Nenhuma tarefa pronta para executar: {', '.join(sorted(remaining))}.")
+                break
+
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                name, started_at = running.pop(future)
+                durations[name] = time.monotonic() - started_at
+                try:
+                    results[name] = future.result()
+                    metrics.inc('etl_task_seconds_total', durations[name], task=name, status='ok')
+                    print(f"\n[DAG] '{name}' concluída em {durations[name]:.1f}s.")
+                    if on_complete:
+                        on_complete(name)
+                except Exception as exc:
+                    failed.add(name)
+                    metrics.inc('etl_task_seconds_total', durations[name], task=name, status='failed')
+                    print(f"\n[DAG] '{name}' falhou após {durations[name]:.1f}s: {exc}")
+                    traceback.print_exc()
+
+    if failed:
+        raise RuntimeError(f"Tarefas com falha ou ignoradas: {', '.join(sorted(failed))}.")
+    return results
@@ -0,0 +1,305 @@
+import json
+import pandas as pd
+
+DTYPES = {
+    'id': 'string',
+    'str': 'string',
+    'json': 'string',
+    'bool': 'boolean',
+    'int': 'Int64',
+    'float': 'Float64',
+    'raw': None,
+}
+
+def _to_id(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value) if value is not None else None
+
+def _to_json(value):
+    return json.dumps(value) if value else None
+
+CONVERTERS = {'id': _to_id, 'json': _to_json}
+_EMPTY = {}
+
+class Field:
+    def __init__(self, column: str, path: str, kind: str = 'str'):
+        if kind not in DTYPES:
+            raise ValueError(f"Tipo de campo '{kind}' inválido para a coluna '{column}'. Opções: {', '.join(DTYPES)}.")
+        self.column = column
+        self.path = path
+        self.kind = kind
+
+def _compile_getter(path: str):
+    if path.startswith('$'):
+        key = path[1:]
+        return lambda item, context: context.get(key)
+    first, *rest = path.split('.')
+    if not rest:
+        return lambda item, context: item.get(first)
+
+    def get(item, context):
+        value = item.get(first)
+        for key in rest:
+            value = (value or _EMPTY).get(key)
+        return value
+    return get
+
+def _compile_field(field: Field):
+    getter = _compile_getter(field.path)
+    converter = CONVERTERS.get(field.kind)
+    if converter is None:
+        return getter
+    return lambda item, context: converter(getter(item, context))
+
+def _compile(fields: tuple):
+    extractors = [(field.column, _compile_field(field)) for field in fields]
+
+    def build(item, context=_EMPTY):
+        return {column: extract(item, context) for column, extract in extractors}
+    return build
+
+def _to_bool(value):
+    if isinstance(value, str):
+        return {'true': True, '1': True, 'false': False, '0': False}.get(value.strip().lower())
+    return bool(value)
+
+def _string_column(values: pd.Series) -> pd.Series:
+    if pd.api.types.is_float_dtype(values.dtype):
+        present = values.dropna()
+        if (present == present.round()).all():
+            return values.astype('Int64').astype('string')
+    if values.dtype == object:
+        values = values.map(lambda value: int(value) if isinstance(value, float) and value.is_integer() else value)
+    return values.astype('string')
+
+def _numeric_column(values: pd.Series, dtype: str, column: str = None) -> pd.Series:
+    numeric = pd.to_numeric(values, errors='coerce')
+    if dtype == 'Int64':
+        numeric = numeric.where(numeric.isna() | (numeric == numeric.round()))
+    coerced = values[values.notna() & numeric.isna()]
+    if len(coerced):
+        examples = ', '.join(repr(value) for value in coerced.head(3))
+        print(f"  > Coluna '{column or values.name}': {len(coerced)} valor(es) não numérico(s) convertido(s) em nulo (ex.: {examples}).")
+    return numeric.astype(dtype)
+
+def _typed_column(values: pd.Series, kind: str, column: str = None) -> pd.Series:
+    dtype = DTYPES[kind]
+    if dtype == 'string':
+        return _string_column(values)
+    if dtype in ('Int64', 'Float64'):
+        return _numeric_column(values, dtype, column)
+    if dtype == 'boolean':
+        if pd.api.types.is_bool_dtype(values.dtype):
+            return values.astype(dtype)
+        return values.map(_to_bool, na_action='ignore').astype(dtype)
+    return values
+
+def _project(value, tree: dict):
+    if not tree:
+        return value
+    if isinstance(value, dict):
+        return {key: _project(value[key], subtree) if subtree else value[key] for key, subtree in tree.items() if key in value}
+    if isinstance(value, list):
+        return [_project(item, tree) for item in value]
+    return value
+
+class RowSpec:
+    def __init__(self, *fields: Field):
+        self.fields = fields
+        self.columns = [field.column for field in fields]
+        self.dtypes = {field.column: DTYPES[field.kind] for field in fields if DTYPES[field.kind]}
+        self.build = _compile(fields)
+
+        self._getters = {field.column: _compile_getter(field.path) for field in fields if not field.path.startswith('$')}
+        self.projection = {}
+        for field in fields:
+            if field.path.startswith('$'): continue
+            node = self.projection
+            for key in field.path.split('.'):
+                node = node.setdefault(key, {})
+
+    def nest(self, **children) -> dict:
+        return {**self.projection, **{key: child.projection for key, child in children.items()}}
+
+    def rows(self, items, context: dict = None) -> list:
+        context = context or {}
+        return [self.build(item, context) for item in items if isinstance(item, dict)]
+
+    def frame(self, items, context: dict = None) -> pd.DataFrame:
+        records = [item for item in items if isinstance(item, dict)]
+        context = context or {}
+        flat = pd.json_normalize(records) if records else pd.DataFrame()
+        columns = {}
+        for field in self.fields:
+            if field.path.startswith('$'):
+                values = pd.Series(context.get(field.path[1:]), index=flat.index, dtype=object)
+            elif field.kind == 'json':
+                getter = self._getters[field.column]
+                values = pd.Series([_to_json(getter(record, context)) for record in records], index=flat.index, dtype=object)
+            elif field.kind == 'raw' or field.path not in flat.columns:
+                getter = self._getters[field.column]
+                values = pd.Series([getter(record, context) for record in records], index=flat.index, dtype=object)
+            else:
+                values = flat[field.path]
+            columns[field.column] = _typed_column(values, field.kind, field.column)
+        return pd.DataFrame(columns, index=flat.index, columns=self.columns)
+
+    def explode(self, parents, list_key: str, context_key: str, parent_path: str = 'id') -> pd.DataFrame:
+        children, parent_keys = [], []
+        for parent in parents:
+            if not isinstance(parent, dict): continue
+            for child in parent.get(list_key) or []:
+                if isinstance(child, dict):
+                    children.append(child)
+                    parent_keys.append(parent.get(parent_path))
+        return self.frame(children, {context_key: parent_keys})
+
+BRAND = RowSpec(Field('IDMARCA', 'id', 'id'), Field('NOMEMARCA', 'name'))
+SUPERCATEGORY = RowSpec(Field('IDSUPERCATEGORIA', 'id', 'id'), Field('NOMESUPERCATEGORIA', 'name'))
+PRODUCT_LINE = RowSpec(
+    Field('IDLINHAPRODUTO', 'id', 'id'), Field('NOMELINHAPRODUTO', 'name'),
+    Field('CODIGOBARRAS', 'barCode', 'id'), Field('CODIGOEXTERNO', 'externalCode', 'id'),
+    Field('ISACTIVE', 'active', 'bool'), Field('ISAPPROVED', 'approved', 'bool'),
+    Field('ORIGEM', 'origin'), Field('DATAATUALIZACAO', 'updatedAt'),
+    Field('IDMARCA', 'brand.id', 'id'), Field('IDCATEGORIA', 'category.id', 'id'),
+    Field('CUSTOMFIELDS', 'customFields', 'json'),
+)
+SKU = RowSpec(
+    Field('IDSKU', 'id', 'id'), Field('NOMESKU', 'name'),
+    Field('ISACTIVE', 'active', 'bool'), Field('EAN', 'barCode', 'id'), Field('CODPROD', 'integrationCode', 'id'),
+    Field('IDLINHAPRODUTO', 'productLine.id', 'id'), Field('IDMARCA', 'brand.id', 'id'),
+    Field('IDCATEGORIA', 'category.id', 'id'), Field('IDSUPERCATEGORIA', 'supercategory.id', 'id'),
+    Field('CUSTOMFIELDS', 'customFields', 'json'),
+)
+CATEGORY = RowSpec(Field('IDCATEGORIA', 'id', 'id'), Field('NOMECATEGORIA', 'name'), Field('IDSUPERCATEGORIA', 'supercategory.id', 'id'))
+
+POINT_OF_SALE = RowSpec(
+    Field('IDPDV', 'id', 'id'),
+    Field('RAZAOSOCIAL', 'legalBusinessName'), Field('FANTASIA', 'tradeName'),
+    Field('CODCLI', 'code', 'id'), Field('CNPJ', 'companyRegistrationNumber'),
+    Field('ISACTIVE', 'active', 'bool'),
+    Field('IDMACROREGIONAL', 'macroregional.id', 'id'), Field('IDREGIONAL', 'regional.id', 'id'),
+    Field('IDBANNER', 'banner.id', 'id'), Field('IDTIPOPDV', 'type.id', 'id'),
+    Field('IDPERFILPDV', 'profile.id', 'id'), Field('IDCANAL', 'channel.id', 'id'),
+)
+MACROREGIONAL = RowSpec(Field('IDMACROREGIONAL', 'id', 'id'), Field('NOMEMACROREGIONAL', 'name'))
+REGIONAL = RowSpec(Field('IDREGIONAL', 'id', 'id'), Field('NOMEREGIONAL', 'name'), Field('IDMACROREGIONAL', 'macroregional.id', 'id'))
+BANNER = RowSpec(Field('IDBANNER', 'id', 'id'), Field('NOMEBANNER', 'name'), Field('IDREDE', 'chain.id', 'id'))
+CHAIN = RowSpec(Field('IDREDE', 'id', 'id'), Field('NOMEREDE', 'name'), Field('CODIGOREDE', 'code'))
+CHANNEL = RowSpec(Field('IDCANAL', 'id', 'id'), Field('NOMECANAL', 'name'))
+POINT_OF_SALE_TYPE = RowSpec(Field('IDTIPOPDV', 'id', 'id'), Field('NOMETIPOPDV', 'name'))
+POINT_OF_SALE_PROFILE = RowSpec(Field('IDPERFILPDV', 'id', 'id'), Field('NOMEPERFILPDV', 'name'))
+
+EMPLOYEE = RowSpec(
+    Field('IDCOLABORADOR', 'id', 'id'), Field('NOME', 'name'), Field('CARGO', 'role'), Field('LOGIN', 'login'),
+    Field('EMAIL', 'email'), Field('TELEFONE', 'workPhone'),
+    Field('RG', 'nationalIdCard1', 'id'), Field('CPF', 'nationalIdCard2', 'id'),
+    Field('NOMEPAI', 'fatherName'), Field('NOMEMAE', 'motherName'), Field('ISACTIVE', 'enabled', 'bool'),
+    Field('IDGRUPOCOLABORADOR', 'userGroup.id', 'id'), Field('NOMEGRUPOCOLABORADOR', 'userGroup.name'),
+    Field('IDPERFILCOLABORADOR', 'profile.id', 'id'), Field('NOMEPERFILCOLABORADOR', 'profile.name'),
+    Field('IDSUPERVISOR', 'employeeEnvironmentLeader.id', 'id'),
+    Field('ENDERECO', 'address.address'), Field('NUMERO', 'address.number', 'id'),
+    Field('COMPLEMENTO', 'address.complement'), Field('BAIRRO', 'address.neighborhood'),
+    Field('CEP', 'address.zipCode', 'id'), Field('CIDADE', 'address.city.name'),
+    Field('ESTADO', 'address.city.state.name'),
+)
+SUPERVISOR = RowSpec(Field('IDSUPERVISOR', 'id', 'id'), Field('NOMESUPERVISOR', 'name'))
+LEAVE = RowSpec(
+    Field('IDAFASTAMENTO', 'id', 'id'), Field('DATAINICIO', 'startDate'), Field('DATAFIM', 'endDate'),
+    Field('MOTIVO', 'reason'), Field('OBSERVACAO', 'note'),
+    Field('IDCOLABORADOR', 'employee.id', 'id'), Field('IDCOLABORADORREGISTRO', 'registeredBy.id', 'id'),
+    Field('IDCOLABORADORSUBSTITUTO', 'substitute.id', 'id'),
+)
+SCHEDULED_VISIT = RowSpec(
+    Field('IDCOLABORADOR', '$employee_id', 'id'), Field('IDPDV', 'pointOfSale.id', 'id'),
+    Field('DATAVISITA', 'visitDate'), Field('INICIOESPERADO', 'expectedStart'),
+    Field('FIMESPERADO', 'expectedEnd'), Field('FOIVISITADO', 'visited', 'bool'),
+)
+
+SURVEY = RowSpec(
+    Field('IDPESQUISA', 'id', 'id'), Field('LABEL', 'label'), Field('STATUS', 'status'), Field('DATAFIM', 'expirationDate'),
+    Field('DATARESPOSTA', 'responseDate'), Field('IDPROJETO', 'projectId', 'id'), Field('IDPDV', 'pointOfSaleId', 'id'),
+    Field('IDCOLABORADOR', 'ownerId', 'id'), Field('IDFORMULARIO', 'form.id', 'id'),
+)
+ANSWER = RowSpec(
+    Field('IDRESPOSTA', 'id', 'id'), Field('IDPESQUISA', '$survey_id', 'id'), Field('VALOR', 'value', 'raw'),
+    Field('PONTUACAO', 'score', 'float'), Field('IDPERGUNTA', 'question.id', 'id'), Field('TIPOPERGUNTA', 'question.type'),
+    Field('IDITEM', 'item.id', 'id'),
+)
+FORM = RowSpec(
+    Field('IDFORMULARIO', 'id', 'id'), Field('NOME', 'name'), Field('DESCRICAO', 'description'),
+    Field('PROPOSITO', 'formPurpose'), Field('ISACTIVE', 'active', 'bool'),
+)
+FORM_FIELD = RowSpec(
+    Field('IDCAMPO', 'id', 'id'), Field('IDFORMULARIO', '$form_id', 'id'), Field('LABEL', 'information.label'),
+    Field('TIPO', 'information.informationType'), Field('ORDEM', 'order', 'int'), Field('OBRIGATORIO', 'required', 'bool'),
+    Field('OCULTO', 'hidden', 'bool'), Field('SISTEMA', 'system', 'bool'),
+)
+
+ITINERARY = RowSpec(
+    Field('IDROTEIROVISITA', 'itineraryId', 'id'), Field('DATAROTEIRO', '$date'),
+    Field('IDCOLABORADOR', 'employeeId', 'id'), Field('NOMECOLABORADOR', 'employeeName'),
+    Field('IDPDV', 'pointOfSaleId', 'id'), Field('NOMEPDV', 'pointOfSaleName'),
+    Field('CNPJPDV', 'pointOfSaleTaxPayerCode'), Field('ORDEMVISITA', 'visitOrder', 'int'),
+)
+NOSHOW = RowSpec(
+    Field('IDJUSTIFICATIVA', 'id', 'id'), Field('IDROTEIROVISITA', '$visit_id', 'id'), Field('IDMOTIVO', 'excuseId', 'id'),
+    Field('DATA', 'date'), Field('MOTIVO', 'excuse'), Field('OBSERVACAO', 'note'), Field('STATUS', 'status'),
+    Field('IDCOLABORADOR', 'employee.id', 'id'),
+)
+
+SURVEY_DETAIL = SURVEY.nest(answers=ANSWER)
+FORM_DETAIL = FORM.nest(formFields=FORM_FIELD)
+
+DATASET_SPECS = {
+    'involves_marcas': BRAND,
+    'involves_supercategorias': SUPERCATEGORY,
+    'involves_linhas_de_produto': PRODUCT_LINE,
+    'involves_produtos': SKU,
+    'involves_categorias': CATEGORY,
+    'involves_pdv': POINT_OF_SALE,
+    'involves_macroregionais': MACROREGIONAL,
+    'involves_regionais': REGIONAL,
+    'involves_banners': BANNER,
+    'involves_redes': CHAIN,
+    'involves_canais': CHANNEL,
+    'involves_tipos_pdv': POINT_OF_SALE_TYPE,
+    'involves_perfis_pdv': POINT_OF_SALE_PROFILE,
+    'involves_colaboradores': EMPLOYEE,
+    'involves_supervisores': SUPERVISOR,
+    'involves_afastamentos': LEAVE,
+    'involves_visitas_agendadas': SCHEDULED_VISIT,
+    'involves_pesquisas': SURVEY,
+    'involves_respostas': ANSWER,
+    'involves_formularios': FORM,
+    'involves_formularios_campos': FORM_FIELD,
+    'involves_roteiros': ITINERARY,
+    'involves_justificativas_falta': NOSHOW,
+}
+
+def dataset_dtypes(filename: str) -> dict:
+    spec = DATASET_SPECS.get(filename)
+    return spec.dtypes if spec else {}
+
+def apply_dtypes(df: pd.DataFrame, filename: str) -> pd.DataFrame:
+    spec = DATASET_SPECS.get(filename)
+    if spec is None:
+        return df
+    for field in spec.fields:
+        if field.column in df.columns and DTYPES[field.kind]:
+            df[field.column] = _typed_column(df[field.column], field.kind, field.column)
+    return df
+
+def typed_frame(data, filename: str) -> pd.DataFrame:
+    if isinstance(data, pd.DataFrame):
+        return data
+    return apply_dtypes(pd.DataFrame(data, dtype=object if filename in DATASET_SPECS else None), filename)
+
+def project(items, projection: dict) -> list:
+    return [_project(item, projection) for item in items if isinstance(item, dict)]
+
+def as_rows(batch) -> list:
+    if not isinstance(batch, pd.DataFrame):
+        return batch
+    return batch.astype(object).where(batch.notna(), None).to_dict('records')
@@ -0,0 +1,41 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from config import STATE_PATH
+
+_connection = None
+_connection_pid = None
+_lock = threading.RLock()
+
+def get_connection() -> sqlite3.Connection:
+    global _connection, _connection_pid
+    with _lock:
+        if _connection is None or _connection_pid != os.getpid():
+            directory = os.path.dirname(STATE_PATH)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            _connection = sqlite3.connect(STATE_PATH, check_same_thread=False, timeout=60)
+            _connection.execute("PRAGMA journal_mode=WAL")
+            _connection.execute("PRAGMA synchronous=NORMAL")
+            _connection_pid = os.getpid()
+        return _connection
+
+@contextmanager
+def transaction():
+    with _lock:
+        connection = get_connection()
+        try:
+            yield connection
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+def close():
+    global _connection, _connection_pid
+    with _lock:
+        if _connection is not None and _connection_pid == os.getpid():
+            _connection.close()
+        _connection = None
+        _connection_pid = None
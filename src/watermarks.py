@@ -0,0 +1,58 @@
+import time
+from state_store import transaction
+
+_SCHEMA_READY = False
+
+def _ensure_schema(connection):
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS date_watermarks ("
+        "dataset TEXT NOT NULL, day TEXT NOT NULL, fetched_at REAL, row_count INTEGER, "
+        "PRIMARY KEY (dataset, day)) WITHOUT ROWID"
+    )
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS dataset_watermarks (dataset TEXT PRIMARY KEY, value TEXT, updated_at REAL) WITHOUT ROWID"
+    )
+    _SCHEMA_READY = True
+
+def day_watermarks(dataset: str) -> dict:
+    with transaction() as connection:
+        _ensure_schema(connection)
+        rows = connection.execute(
+            "SELECT day, fetched_at, row_count FROM date_watermarks WHERE dataset = ?", (dataset,)
+        ).fetchall()
+        return {day: (fetched_at, row_count) for day, fetched_at, row_count in rows}
+
+def set_day_watermarks(dataset: str, row_counts: dict, fetched_at: float = None):
+    fetched_at = fetched_at or time.time()
+    with transaction() as connection:
+        _ensure_schema(connection)
+        connection.executemany(
+            "INSERT OR REPLACE INTO date_watermarks (dataset, day, fetched_at, row_count) VALUES (?, ?, ?, ?)",
+            ((dataset, day, fetched_at, row_count) for day, row_count in row_counts.items())
+        )
+
+def prune_day_watermarks(dataset: str, before_day: str):
+    with transaction() as connection:
+        _ensure_schema(connection)
+        connection.execute("DELETE FROM date_watermarks WHERE dataset = ? AND day < ?", (dataset, before_day))
+
+def get_watermark(dataset: str):
+    with transaction() as connection:
+        _ensure_schema(connection)
+        row = connection.execute("SELECT value FROM dataset_watermarks WHERE dataset = ?", (dataset,)).fetchone()
+        return row[0] if row else None
+
+def set_watermark(dataset: str, value: str):
+    with transaction() as connection:
+        _ensure_schema(connection)
+        connection.execute(
+            "INSERT OR REPLACE INTO dataset_watermarks (dataset, value, updated_at) VALUES (?, ?, ?)", (dataset, value, time.time())
+        )
+
+def drop_watermark(dataset: str):
+    with transaction() as connection:
+        _ensure_schema(connection)
+        connection.execute("DELETE FROM dataset_watermarks WHERE dataset = ?", (dataset,))
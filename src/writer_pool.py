@@ -0,0 +1,39 @@
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from config import WRITER_PROCESSES
+
+_pool = None
+_lock = threading.Lock()
+
+def _context():
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['file_handler'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+def get_pool():
+    global _pool
+    with _lock:
+        if _pool is None and WRITER_PROCESSES > 0:
+            _pool = ProcessPoolExecutor(max_workers=WRITER_PROCESSES, mp_context=_context())
+        return _pool
+
+def submit(function, *args) -> Future:
+    pool = get_pool()
+    if pool is not None:
+        return pool.submit(function, *args)
+    future = Future()
+    try:
+        future.set_result(function(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def shutdown():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
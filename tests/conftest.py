@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+
+_OUTPUT_DIR = tempfile.mkdtemp(prefix='involves-tests-')
+os.environ.update({
+    'INVOLVES_BASE_URL': 'https://tenant.involves.com/webservices/api',
+    'INVOLVES_ENVIRONMENT_ID': '42',
+    'INVOLVES_OUTPUT_DIR': _OUTPUT_DIR,
+    'INVOLVES_STATE_PATH': os.path.join(_OUTPUT_DIR, '.state', 'etl_state.sqlite'),
+    'INVOLVES_WRITER_PROCESSES': '0',
+})
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
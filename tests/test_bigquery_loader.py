@@ -0,0 +1,167 @@
+import shutil
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+import bigquery_loader
+import file_handler
+from bigquery_loader import BigQueryTarget, load_dataset, merge_sql
+from file_handler import save_dataset
+from state_store import transaction
+
+class NotFound(Exception):
+    pass
+
+class LoadJobConfig:
+    def __init__(self, **kwargs):
+        self.time_partitioning = None
+        self.clustering_fields = None
+        self.__dict__.update(kwargs)
+
+FAKE_BIGQUERY = SimpleNamespace(
+    LoadJobConfig=LoadJobConfig,
+    SourceFormat=SimpleNamespace(PARQUET='PARQUET'),
+    WriteDisposition=SimpleNamespace(WRITE_TRUNCATE='WRITE_TRUNCATE'),
+    SchemaField=lambda name, field_type: (name, field_type),
+    TimePartitioning=lambda type_, field: (type_, field),
+    TimePartitioningType=SimpleNamespace(DAY='DAY'),
+)
+
+class FakeJob:
+    def result(self):
+        return None
+
+class FakeClient:
+    project = 'projeto'
+
+    def __init__(self):
+        self.tables = set()
+        self.loads = []
+        self.queries = []
+        self.deleted = []
+
+    def get_table(self, table_id):
+        if table_id not in self.tables:
+            raise NotFound(table_id)
+
+    def load_table_from_file(self, source, table_id, job_config):
+        self.tables.add(table_id)
+        self.loads.append((table_id, job_config, pd.read_parquet(source)))
+        return FakeJob()
+
+    def query(self, sql):
+        self.queries.append(sql)
+        return FakeJob()
+
+    def delete_table(self, table_id, not_found_ok=False):
+        self.tables.discard(table_id)
+        self.deleted.append(table_id)
+
+@pytest.fixture
+def output_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_handler, 'OUTPUT_DIR', str(tmp_path))
+    monkeypatch.setattr(bigquery_loader, 'OUTPUT_DIR', str(tmp_path))
+    with transaction() as connection:
+        bigquery_loader._ensure_schema(connection)
+        connection.execute("DELETE FROM bigquery_loads")
+    yield tmp_path
+    shutil.rmtree(tmp_path, ignore_errors=True)
+
+@pytest.fixture
+def target():
+    return BigQueryTarget('projeto', 'involves', client=FakeClient(), bigquery=FAKE_BIGQUERY, not_found=NotFound)
+
+def _noshow(identifier, status):
+    return {'IDJUSTIFICATIVA': str(identifier), 'IDROTEIROVISITA': '9', 'IDMOTIVO': '1', 'DATA': '2024-03-01',
+            'MOTIVO': 'Chuva', 'OBSERVACAO': None, 'STATUS': status, 'IDCOLABORADOR': '7'}
+
+def test_merge_sql_with_delete_column():
+    sql = merge_sql('p.d.t', 'p.d.t__staging', 'ID', ['ID', 'NOME', 'OPERACAO'], delete_column='OPERACAO')
+    assert sql == (
+        "MERGE `p.d.t` T USING `p.d.t__staging` S ON T.`ID` = S.`ID`\n"
+        "WHEN MATCHED AND S.`OPERACAO` = 'DELETE' THEN DELETE\n"
+        "WHEN MATCHED THEN UPDATE SET `NOME` = S.`NOME`\n"
+        "WHEN NOT MATCHED AND S.`OPERACAO` != 'DELETE' THEN INSERT (`ID`, `NOME`) VALUES (S.`ID`, S.`NOME`)"
+    )
+
+def test_merge_sql_key_only_table_skips_update():
+    assert merge_sql('t', 's', 'ID', ['ID']) == (
+        "MERGE `t` T USING `s` S ON T.`ID` = S.`ID`\n"
+        "WHEN NOT MATCHED THEN INSERT (`ID`) VALUES (S.`ID`)"
+    )
+
+def test_first_load_truncates_with_explicit_schema(output_dir, target):
+    save_dataset([_noshow(1, 'PENDING'), _noshow(2, 'OPEN')], 'involves_justificativas_falta', append=True, output_format='parquet')
+
+    load_dataset(target, 'involves_justificativas_falta', output_format='parquet')
+
+    table_id, job_config, staged = target.client.loads[0]
+    assert table_id == 'projeto.involves.involves_justificativas_falta'
+    assert job_config.source_format == 'PARQUET'
+    assert job_config.write_disposition == 'WRITE_TRUNCATE'
+    assert ('DATA', 'DATE') in job_config.schema and ('IDJUSTIFICATIVA', 'STRING') in job_config.schema
+    assert job_config.time_partitioning == ('DAY', 'DATA')
+    assert job_config.clustering_fields == ['IDJUSTIFICATIVA']
+    assert len(staged) == 2
+    assert target.client.queries == []
+
+def test_incremental_load_merges_only_new_segments(output_dir, target):
+    save_dataset([_noshow(1, 'PENDING'), _noshow(2, 'OPEN')], 'involves_justificativas_falta', append=True, output_format='parquet')
+    load_dataset(target, 'involves_justificativas_falta', output_format='parquet')
+    save_dataset([_noshow(2, 'APPROVED'), _noshow(3, 'OPEN')], 'involves_justificativas_falta', append=True, output_format='parquet')
+
+    load_dataset(target, 'involves_justificativas_falta', output_format='parquet')
+
+    table_id, job_config, staged = target.client.loads[1]
+    assert table_id == 'projeto.involves.involves_justificativas_falta__staging'
+    assert job_config.write_disposition == 'WRITE_TRUNCATE'
+    assert job_config.time_partitioning is None
+    assert sorted(staged['IDJUSTIFICATIVA']) == ['2', '3']
+    assert staged.set_index('IDJUSTIFICATIVA').loc['2', 'STATUS'] == 'APPROVED'
+    assert target.client.queries == [merge_sql(
+        'projeto.involves.involves_justificativas_falta', 'projeto.involves.involves_justificativas_falta__staging',
+        'IDJUSTIFICATIVA', list(staged.columns)
+    )]
+    assert target.client.deleted == ['projeto.involves.involves_justificativas_falta__staging']
+
+def test_incremental_load_without_new_segments_runs_no_job(output_dir, target):
+    save_dataset([_noshow(1, 'PENDING')], 'involves_justificativas_falta', append=True, output_format='parquet')
+    load_dataset(target, 'involves_justificativas_falta', output_format='parquet')
+
+    load_dataset(target, 'involves_justificativas_falta', output_format='parquet')
+
+    assert len(target.client.loads) == 1
+    assert target.client.queries == []
+
+def test_pruned_unloaded_delta_forces_full_load(output_dir, target, monkeypatch):
+    monkeypatch.setattr(file_handler, 'DELTA_RETENTION', 1)
+    brands = [{'IDMARCA': '1', 'NOMEMARCA': 'A'}, {'IDMARCA': '2', 'NOMEMARCA': 'B'}]
+    save_dataset(brands, 'involves_marcas', output_format='parquet')
+    load_dataset(target, 'involves_marcas', output_format='parquet')
+
+    save_dataset(brands + [{'IDMARCA': '3', 'NOMEMARCA': 'C'}], 'involves_marcas', output_format='parquet')
+    save_dataset(brands[:1] + [{'IDMARCA': '3', 'NOMEMARCA': 'C2'}], 'involves_marcas', output_format='parquet')
+    assert len(file_handler.delta_paths('involves_marcas', 'parquet')) == 1
+
+    load_dataset(target, 'involves_marcas', output_format='parquet')
+
+    table_id, job_config, staged = target.client.loads[1]
+    assert table_id == 'projeto.involves.involves_marcas'
+    assert job_config.write_disposition == 'WRITE_TRUNCATE'
+    assert sorted(staged['IDMARCA']) == ['1', '3']
+    assert target.client.queries == []
+    assert file_handler.delta_paths('involves_marcas', 'parquet') == []
+
+def test_retained_deltas_are_merged(output_dir, target):
+    brands = [{'IDMARCA': '1', 'NOMEMARCA': 'A'}, {'IDMARCA': '2', 'NOMEMARCA': 'B'}]
+    save_dataset(brands, 'involves_marcas', output_format='parquet')
+    load_dataset(target, 'involves_marcas', output_format='parquet')
+    save_dataset(brands[:1], 'involves_marcas', output_format='parquet')
+
+    load_dataset(target, 'involves_marcas', output_format='parquet')
+
+    table_id, _, staged = target.client.loads[1]
+    assert table_id == 'projeto.involves.involves_marcas__staging'
+    assert list(staged['OPERACAO']) == ['DELETE']
+    assert "WHEN MATCHED AND S.`OPERACAO` = 'DELETE' THEN DELETE" in target.client.queries[0]
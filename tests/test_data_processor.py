@@ -0,0 +1,185 @@
+import pandas as pd
+import pytest
+
+import checkpoints
+import data_processor
+import row_hashes
+import watermarks
+from data_processor import commit_survey_state, iter_scheduled_visits, iter_surveys_and_answers
+
+EMPLOYEES = [{'IDCOLABORADOR': '1'}, {'IDCOLABORADOR': '2'}, {'IDCOLABORADOR': '3'}]
+
+def _fake_pages(base_urls, endpoint_name, **kwargs):
+    for employee_id in base_urls:
+        yield employee_id, [{'pointOfSale': {'id': 50}, 'visitDate': '2099-01-01', 'visited': False}]
+
+def test_skipped_employees_keep_previous_visits(monkeypatch):
+    monkeypatch.setattr(data_processor, '_iter_paginated_many', _fake_pages)
+    this_year = pd.Timestamp.now().year
+    previous = pd.DataFrame({
+        'IDCOLABORADOR': ['1', '2', '2', '3'],
+        'IDPDV': ['10', '20', '21', '30'],
+        'DATAVISITA': [f'{this_year}-02-01', f'{this_year}-02-01', f'{this_year - 1}-12-31', f'{this_year}-03-01'],
+    })
+
+    batches = list(iter_scheduled_visits(EMPLOYEES, {'1'}, previous))
+
+    kept = batches[0]
+    assert sorted(zip(kept['IDCOLABORADOR'], kept['IDPDV'])) == [('2', '20'), ('3', '30')]
+    fetched = [row for batch in batches[1:] for row in batch]
+    assert [row['IDCOLABORADOR'] for row in fetched] == ['1']
+
+def test_without_previous_dataset_only_queried_employees_are_written(monkeypatch):
+    monkeypatch.setattr(data_processor, '_iter_paginated_many', _fake_pages)
+
+    batches = list(iter_scheduled_visits(EMPLOYEES, {'1', '3'}))
+
+    assert sorted(row['IDCOLABORADOR'] for batch in batches for row in batch) == ['1', '3']
+
+SUMMARIES = [
+    {'id': 1, 'status': 'ANSWERED', 'responseDate': '2024-03-01T10:00:00'},
+    {'id': 2, 'status': 'ANSWERED', 'responseDate': '2024-03-09T10:00:00'},
+    {'id': 3, 'status': 'PENDING', 'updatedAt': '2024-03-10T08:00:00'},
+]
+
+@pytest.fixture
+def surveys_api(monkeypatch):
+    requests = {'listings': [], 'details': []}
+
+    def fake_listing(url, *args, **kwargs):
+        requests['listings'].append(url)
+        yield [dict(summary) for summary in SUMMARIES]
+
+    def fake_details(url_template, ids, *args, **kwargs):
+        requests['details'].append(set(ids))
+        yield [{'id': survey_id, 'form': {'id': 70}, 'answers': [{'id': f'{survey_id}0', 'value': 'sim'}]}
+               for survey_id in sorted(ids) if survey_id not in requests.get('fail', ())]
+
+    monkeypatch.setattr(data_processor, '_iter_paginated_data', fake_listing)
+    monkeypatch.setattr(data_processor, '_iter_details_in_parallel', fake_details)
+    row_hashes.replace_hashes(data_processor.SURVEY_FINGERPRINTS, {})
+    watermarks.drop_watermark(data_processor.SURVEYS_DATASET)
+    return requests
+
+def _run_surveys(existing_ids):
+    pending_state = {}
+    batches = list(iter_surveys_and_answers(set(), pending_state, existing_ids))
+    return batches, pending_state
+
+def test_survey_listing_uses_watermark_minus_overlap_when_enabled(surveys_api, monkeypatch):
+    monkeypatch.setattr(data_processor, 'SURVEYS_SINCE_PARAM', 'startDate')
+    monkeypatch.setattr(data_processor, 'SURVEYS_WATERMARK_OVERLAP_DAYS', 2)
+    watermarks.set_watermark(data_processor.SURVEYS_DATASET, '2024-03-10T08:00:00')
+
+    _run_surveys({'1', '2', '3'})
+
+    assert surveys_api['listings'] == [f"{data_processor.INVOLVES_BASE_URL}/v3/environments/42/surveys?startDate=2024-03-08"]
+
+def test_survey_listing_is_unfiltered_by_default(surveys_api):
+    watermarks.set_watermark(data_processor.SURVEYS_DATASET, '2024-03-10T08:00:00')
+
+    _run_surveys({'1', '2', '3'})
+
+    assert surveys_api['listings'] == [f"{data_processor.INVOLVES_BASE_URL}/v3/environments/42/surveys"]
+
+def test_only_new_and_changed_surveys_are_detailed(surveys_api):
+    fingerprints = {str(summary['id']): data_processor._survey_fingerprint(summary) for summary in SUMMARIES}
+    row_hashes.replace_hashes(data_processor.SURVEY_FINGERPRINTS, {'1': fingerprints['1'], '2': 'antigo'})
+
+    batches, pending_state = _run_surveys({'1', '2'})
+
+    assert surveys_api['details'] == [{'2', '3'}]
+    assert sum(len(surveys) for surveys, _ in batches) == 2
+    assert pending_state == {'fingerprints': fingerprints, 'watermark': '2024-03-10T08:00:00'}
+    assert row_hashes.load_hashes(data_processor.SURVEY_FINGERPRINTS)['2'] == 'antigo'
+
+    commit_survey_state(pending_state)
+
+    assert row_hashes.load_hashes(data_processor.SURVEY_FINGERPRINTS) == fingerprints
+    assert watermarks.get_watermark(data_processor.SURVEYS_DATASET) == '2024-03-10T08:00:00'
+
+def test_failed_details_keep_fingerprint_and_watermark(surveys_api):
+    surveys_api['fail'] = {'3'}
+
+    _, pending_state = _run_surveys(set())
+
+    assert '3' not in pending_state['fingerprints']
+    assert 'watermark' not in pending_state
+
+def _fake_listing_api(monkeypatch, total_pages: int, per_page: dict):
+    calls = {'pages': [], 'details': []}
+
+    def fake_get(url, suppress_404=False):
+        calls['pages'].append(1)
+        return {'totalPages': total_pages, 'items': [{'id': item_id, 'name': f'n{item_id}'} for item_id in per_page.get(1, [])]}
+
+    def fake_remaining(list_url, page_numbers, endpoint_name):
+        calls['pages'].extend(page_numbers)
+        return {page: {'items': [{'id': item_id, 'name': f'n{item_id}'} for item_id in per_page.get(page, [])]} for page in page_numbers}
+
+    def fake_details(url_template, ids, endpoint_name, *args, **kwargs):
+        calls['details'].append(set(ids))
+        return [{'id': item_id, 'name': f'd{item_id}'} for item_id in ids]
+
+    monkeypatch.setattr(data_processor, 'get_api_data', fake_get)
+    monkeypatch.setattr(data_processor, '_fetch_remaining_pages', fake_remaining)
+    monkeypatch.setattr(data_processor, '_fetch_details_in_parallel', fake_details)
+    monkeypatch.setattr(data_processor, 'DIMENSION_DETAIL_MAX_IDS', 1)
+    return calls
+
+def test_dimension_reuses_first_list_page_when_listing_is_not_cheaper(monkeypatch):
+    calls = _fake_listing_api(monkeypatch, total_pages=50, per_page={1: [1, 2]})
+
+    items = data_processor._resolve_dimension({'1', '2', '3'}, 'detail/{id}', 'regionals', list_url='list')
+
+    assert calls['pages'] == [1]
+    assert calls['details'] == [{'3'}]
+    assert sorted(str(item['id']) for item in items) == ['1', '2', '3']
+
+def test_dimension_resolved_from_listing_when_cheaper(monkeypatch):
+    calls = _fake_listing_api(monkeypatch, total_pages=2, per_page={1: [1], 2: [2, 3]})
+
+    items = data_processor._resolve_dimension({'1', '2', '3'}, 'detail/{id}', 'regionals', list_url='list')
+
+    assert calls['pages'] == [1, 2]
+    assert calls['details'] == [set()]
+    assert sorted(item['name'] for item in items) == ['n1', 'n2', 'n3']
+
+def _fake_paging_api(monkeypatch, total_pages: int, crash_at: set):
+    fetched = []
+
+    def page(page_num):
+        return {'totalPages': total_pages, 'items': [{'id': page_num}]}
+
+    def fake_get(url, suppress_404=False):
+        page_num = int(url.split('page=')[1].split('&')[0])
+        fetched.append(page_num)
+        return page(page_num)
+
+    def fake_remaining(base_url, page_numbers, endpoint_name):
+        if crash_at & set(page_numbers):
+            raise KeyboardInterrupt
+        fetched.extend(page_numbers)
+        return {page_num: page(page_num) for page_num in page_numbers}
+
+    monkeypatch.setattr(data_processor, 'get_api_data', fake_get)
+    monkeypatch.setattr(data_processor, '_fetch_remaining_pages', fake_remaining)
+    monkeypatch.setattr(data_processor, 'PAGINATION_MODE', 'concurrent')
+    monkeypatch.setattr(data_processor, 'PAGE_FETCH_WINDOW', 2)
+    return fetched
+
+def test_listing_resumes_from_settled_page_windows(monkeypatch):
+    checkpoints.clear()
+    _fake_paging_api(monkeypatch, total_pages=5, crash_at={4})
+    seen = []
+    with pytest.raises(KeyboardInterrupt):
+        for items in data_processor._iter_paginated_data('skus', checkpoint='involves_produtos'):
+            seen.extend(item['id'] for item in items)
+    assert seen == [1, 2, 3]
+
+    fetched = _fake_paging_api(monkeypatch, total_pages=5, crash_at=set())
+    resumed = [item['id'] for items in data_processor._iter_paginated_data('skus', checkpoint='involves_produtos') for item in items]
+
+    assert fetched == [4, 5]
+    assert sorted(resumed) == [1, 2, 3, 4, 5]
+    checkpoints.clear()
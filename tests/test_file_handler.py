@@ -0,0 +1,49 @@
+import os
+import shutil
+
+import pytest
+
+import file_handler
+from file_handler import DatasetStream, read_dataset
+
+ANSWERS = [
+    {'IDRESPOSTA': '1', 'IDPESQUISA': '9', 'VALOR': 12, 'PONTUACAO': 1.0},
+    {'IDRESPOSTA': '2', 'IDPESQUISA': '9', 'VALOR': 40, 'PONTUACAO': None},
+    {'IDRESPOSTA': '3', 'IDPESQUISA': '9', 'VALOR': 'sim', 'PONTUACAO': None},
+    {'IDRESPOSTA': '4', 'IDPESQUISA': '9', 'VALOR': 'não', 'PONTUACAO': 2.5},
+    {'IDRESPOSTA': '5', 'IDPESQUISA': '9', 'VALOR': ['a', 'b'], 'PONTUACAO': None},
+    {'IDRESPOSTA': '6', 'IDPESQUISA': '9', 'VALOR': {'opção': 'não'}, 'PONTUACAO': None},
+]
+
+@pytest.fixture
+def output_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_handler, 'OUTPUT_DIR', str(tmp_path))
+    monkeypatch.setattr(file_handler, 'STREAM_BATCH_SIZE', 2)
+    yield tmp_path
+    shutil.rmtree(tmp_path, ignore_errors=True)
+
+def test_parquet_stream_keeps_free_form_values(output_dir):
+    with DatasetStream('involves_respostas', append=True, output_format='parquet') as stream:
+        for row in ANSWERS:
+            stream.write([row])
+
+    df = read_dataset('involves_respostas', output_format='parquet')
+    assert list(df['VALOR']) == ['12', '40', 'sim', 'não', '["a", "b"]', '{"opção": "não"}']
+    assert list(df['PONTUACAO'].isna()) == [False, True, True, False, True, True]
+
+def test_writer_errors_reach_the_task_and_discard_the_file(output_dir, monkeypatch):
+    prepare_chunk = file_handler._prepare_chunk
+
+    def failing_prepare(batches, *args):
+        if any(row['IDRESPOSTA'] == '3' for batch in batches for row in batch):
+            raise ValueError('falha simulada')
+        return prepare_chunk(batches, *args)
+    monkeypatch.setattr(file_handler, '_prepare_chunk', failing_prepare)
+
+    with pytest.raises(ValueError, match='falha simulada'):
+        with DatasetStream('involves_respostas', append=True, output_format='parquet') as stream:
+            for row in ANSWERS:
+                stream.write([row])
+
+    segments_dir = os.path.join(output_dir, 'involves_respostas.segments')
+    assert os.listdir(segments_dir) == []
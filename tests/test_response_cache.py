@@ -0,0 +1,36 @@
+import pytest
+
+import response_cache
+from response_cache import is_global
+
+BASE_URL = 'https://tenant.involves.com/webservices/api'
+
+@pytest.fixture(autouse=True)
+def base_path(monkeypatch):
+    monkeypatch.setattr(response_cache, 'BASE_PATH', '/webservices/api')
+
+@pytest.mark.parametrize('path', [
+    '/v1/42/employeeenvironment',
+    '/v1/42/pointofsaleprofile/find',
+    '/v1/42/form/77',
+    '/v2/42/itinerary',
+    '/v3/environments/42/surveys',
+    '/v3/environments/42/employees/5/scheduledvisits?startDate=2024-03-01',
+    '/v1/42',
+])
+def test_environment_urls_are_not_global(path):
+    assert not is_global(f"{BASE_URL}{path}")
+
+@pytest.mark.parametrize('path', [
+    '/v3/brands',
+    '/v3/productlines?page=2',
+    '/v3/chains/12',
+    '/v1/pointofsalechannels',
+])
+def test_tenant_urls_are_global(path):
+    assert is_global(f"{BASE_URL}{path}")
+
+def test_urls_without_base_path_prefix(monkeypatch):
+    monkeypatch.setattr(response_cache, 'BASE_PATH', '')
+    assert not is_global('https://tenant.involves.com/v1/42/form')
+    assert is_global('https://tenant.involves.com/v3/brands')
@@ -0,0 +1,84 @@
+import itertools
+
+import pytest
+
+import schemas
+
+SAMPLES = {
+    'id': [101, 102.0, '103', None, 104.5],
+    'str': ['texto', 7, 8.0, None, True],
+    'json': [{'a': 1}, [1, 2], None, {}, 'x'],
+    'bool': [True, False, 'true', None, 0],
+    'int': [1, 2.0, None, '3', 4.5, 'x'],
+    'float': [1, 2.5, None, '3', 4.0],
+    'raw': [12, 'sim', [1, 2], {'k': 1}, None, 2.5],
+}
+MISSING = object()
+
+CHILD_SPECS = {
+    'involves_respostas': (schemas.SURVEY, 'answers', 'survey_id'),
+    'involves_formularios_campos': (schemas.FORM, 'formFields', 'form_id'),
+}
+
+def _set_path(item: dict, path: str, value):
+    keys = path.split('.')
+    for key in keys[:-1]:
+        item = item.setdefault(key, {})
+    item[keys[-1]] = value
+
+def _payload(spec, count: int = 12) -> list:
+    items = []
+    for index in range(count):
+        item = {}
+        for offset, field in enumerate(spec.fields):
+            if field.path.startswith('$'):
+                continue
+            values = SAMPLES[field.kind] + [MISSING]
+            value = values[(index + offset) % len(values)]
+            if value is not MISSING:
+                _set_path(item, field.path, value)
+        items.append(item)
+    return items
+
+def _context(spec) -> dict:
+    return {field.path[1:]: 55.0 for field in spec.fields if field.path.startswith('$')}
+
+@pytest.mark.parametrize('filename', sorted(schemas.DATASET_SPECS))
+def test_row_and_columnar_paths_match(filename):
+    spec = schemas.DATASET_SPECS[filename]
+    if filename in CHILD_SPECS:
+        parent_spec, list_key, context_key = CHILD_SPECS[filename]
+        parents = [{**parent, 'id': 900 + index, list_key: _payload(spec, 4 + index)}
+                   for index, parent in enumerate(_payload(parent_spec, 3))]
+        parents.append({'id': 999})
+        rows = list(itertools.chain.from_iterable(
+            spec.rows(parent.get(list_key) or [], {context_key: parent.get('id')}) for parent in parents
+        ))
+        columnar = spec.explode(parents, list_key, context_key)
+    else:
+        items = _payload(spec)
+        rows = spec.rows(items, _context(spec))
+        columnar = spec.frame(items, _context(spec))
+
+    expected = schemas.as_rows(schemas.typed_frame(rows, filename))
+    assert schemas.as_rows(schemas.typed_frame(columnar, filename)) == expected
+    assert list(columnar.columns) == spec.columns
+    assert len(expected) == len(rows) > 0
+
+def test_integral_floats_in_mixed_columns_are_written_as_integers():
+    rows = schemas.SKU.rows([{'id': 1}, {'id': 2.0}, {'id': 'abc'}])
+    columnar = schemas.SKU.frame([{'id': 1}, {'id': 2.0}, {'id': 'abc'}])
+    assert [row['IDSKU'] for row in schemas.as_rows(columnar)] == ['1', '2', 'abc']
+    assert [row['IDSKU'] for row in schemas.as_rows(schemas.typed_frame(rows, 'involves_produtos'))] == ['1', '2', 'abc']
+
+def test_int_fields_keep_integers_and_report_coerced_values(capsys):
+    frame = schemas.ITINERARY.frame([{'visitOrder': 3}, {'visitOrder': 4.0}, {'visitOrder': 'x'}, {}], {'date': '2024-03-01'})
+    assert str(frame['ORDEMVISITA'].dtype) == 'Int64'
+    assert [row['ORDEMVISITA'] for row in schemas.as_rows(frame)] == [3, 4, None, None]
+    assert "Coluna 'ORDEMVISITA': 1 valor(es) não numérico(s)" in capsys.readouterr().out
+
+def test_nested_paths_and_context_are_extracted():
+    row = schemas.SKU.build({'id': 5.0, 'brand': {'id': 7}, 'category': None, 'customFields': [{'a': 1}]})
+    assert row['IDSKU'] == '5' and row['IDMARCA'] == '7' and row['IDCATEGORIA'] is None
+    assert row['CUSTOMFIELDS'] == '[{"a": 1}]'
+    assert schemas.ANSWER.build({'id': 1}, {'survey_id': 9})['IDPESQUISA'] == '9'